@@ -7,6 +7,7 @@ class FicheAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'category', 'difficulty_level', 'is_published', 'views_count', 'created_at']
     list_filter = ['is_published', 'difficulty_level', 'category', 'created_at']
     search_fields = ['title', 'description', 'content', 'author__username']
+    list_select_related = ['author']
     prepopulated_fields = {}
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
@@ -0,0 +1,86 @@
+"""
+Cached fiche cards.
+
+The card of a fiche is rendered once and stored in the cache, then reused
+by every page listing it: ``card`` on the home page and the fiche list,
+``compact`` on the student dashboard, ``row`` on the teacher dashboard.
+Card keys hold the fiche's ``updated_at`` and the volatile values the
+variant displays (view count, question count, ``FicheStats`` attempt
+count), so any change to what a card shows renders a new one. All the
+cards of a page are read with one ``get_many``.
+
+Search results carry a per-query snippet and are rendered without the
+cache. ``FICHE_CARD_CACHE = False`` disables the cache altogether.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from souklou_project.metrics import record_cache
+
+FICHE_CARD_CACHE_TIMEOUT = getattr(settings, 'FICHE_CARD_CACHE_TIMEOUT', 60 * 60 * 24)
+
+# variant: (template, volatile attributes it displays)
+VARIANTS = {
+    'card': ('fiches/includes/fiche_card.html', ('views_count',)),
+    'compact': ('fiches/includes/fiche_card_compact.html', ()),
+    'row': ('fiches/includes/fiche_card_row.html', ('views_count', 'question_count', 'attempt_count')),
+}
+
+
+def fiche_card_cache_key(fiche, variant):
+    volatile = VARIANTS[variant][1]
+    version = ':'.join(str(getattr(fiche, name)) for name in volatile)
+    return f'fiche_card:{variant}:{fiche.pk}:{fiche.updated_at.timestamp()}:{version}'
+
+
+def _render(fiche, variant):
+    return render_to_string(VARIANTS[variant][0], {'fiche': fiche})
+
+
+def _cacheable(fiche):
+    return not getattr(fiche, 'search_snippet', None)
+
+
+def _prepare(fiches):
+    if not getattr(settings, 'FICHE_CARD_CACHE', True):
+        return []
+    return [fiche for fiche in fiches if _cacheable(fiche)]
+
+
+def _fill(fiches, variant, keys, cached):
+    """Attach the cached or freshly rendered cards and return the new ones to cache."""
+    missing = {}
+    for fiche in fiches:
+        key = keys.get(fiche.pk)
+        card = cached.get(key) if key else None
+        if key:
+            record_cache('fiche_card', card is not None)
+        if card is None:
+            card = _render(fiche, variant)
+            if key:
+                missing[key] = card
+        fiche.card = mark_safe(card)
+    return missing
+
+
+def attach_cards(fiches, variant):
+    """Set ``fiche.card`` to the rendered ``variant`` card of each fiche and return ``fiches``."""
+    keys = {fiche.pk: fiche_card_cache_key(fiche, variant) for fiche in _prepare(fiches)}
+    cached = cache.get_many(keys.values()) if keys else {}
+    missing = _fill(fiches, variant, keys, cached)
+    if missing:
+        cache.set_many(missing, FICHE_CARD_CACHE_TIMEOUT)
+    return fiches
+
+
+async def aattach_cards(fiches, variant):
+    """Async version of ``attach_cards``."""
+    keys = {fiche.pk: fiche_card_cache_key(fiche, variant) for fiche in _prepare(fiches)}
+    cached = await cache.aget_many(keys.values()) if keys else {}
+    missing = _fill(fiches, variant, keys, cached)
+    if missing:
+        await cache.aset_many(missing, FICHE_CARD_CACHE_TIMEOUT)
+    return fiches
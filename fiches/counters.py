@@ -0,0 +1,183 @@
+"""
+Write-behind view counter.
+
+Hits on ``fiches:detail`` are accumulated in one cache counter per fiche and
+written back to ``Fiche.views_count`` with ``F('views_count') + n`` updates,
+either by a background thread running in each process every
+``VIEW_COUNT_FLUSH_INTERVAL`` seconds or by ``manage.py flush_view_counts``.
+A crash or a cache eviction loses at most the hits counted since the last
+flush; increments are never lost to concurrent read-modify-write races.
+
+The buffer needs a cache shared by every process (Redis, Memcached...).
+With a per-process cache (``locmem://``, ``dummy://``), the counts of a
+worker would be invisible to the other processes and to
+``flush_view_counts``, and lost with the worker if it is killed, so views
+are then written directly with ``F()`` updates.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+
+from .models import Fiche
+
+logger = logging.getLogger(__name__)
+
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+VIEW_COUNT_BUFFER = (
+    getattr(settings, 'VIEW_COUNT_BUFFER', True)
+    and settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+)
+VIEW_COUNT_FLUSH_INTERVAL = getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 30)
+
+SWEEP_CHUNK_SIZE = 500
+
+# Fiches this process counted views for since its last flush
+_touched = set()
+_lock = threading.Lock()
+_flusher = None
+_flusher_pid = None
+
+
+def view_count_key(fiche_pk):
+    return f'fiche_views:{fiche_pk}'
+
+
+def _fiches():
+    # Counting a view must not pin the client's next reads to the primary
+    return Fiche.objects.db_manager(hints={'counter': True})
+
+
+def record_view(fiche_pk):
+    """Count one view of a fiche and return the number of views not yet flushed."""
+    if not VIEW_COUNT_BUFFER:
+        _fiches().filter(pk=fiche_pk).update(views_count=F('views_count') + 1)
+        return 1
+
+    key = view_count_key(fiche_pk)
+    try:
+        pending = cache.incr(key)
+    except ValueError:
+        pending = 1
+        if not cache.add(key, 1, timeout=None):
+            pending = cache.incr(key)
+    _touch(fiche_pk)
+    return pending
+
+
+async def arecord_view(fiche_pk):
+    """Async version of ``record_view``."""
+    if not VIEW_COUNT_BUFFER:
+        await _fiches().filter(pk=fiche_pk).aupdate(views_count=F('views_count') + 1)
+        return 1
+
+    key = view_count_key(fiche_pk)
+    try:
+        pending = await cache.aincr(key)
+    except ValueError:
+        pending = 1
+        if not await cache.aadd(key, 1, timeout=None):
+            pending = await cache.aincr(key)
+    _touch(fiche_pk)
+    return pending
+
+
+def _touch(fiche_pk):
+    with _lock:
+        _touched.add(fiche_pk)
+    _ensure_flusher()
+
+
+def pending_view_counts(fiche_pks=None):
+    """Return the buffered views per fiche, for the fiches this process touched by default."""
+    if fiche_pks is None:
+        with _lock:
+            fiche_pks = list(_touched)
+    keys = {view_count_key(pk): pk for pk in fiche_pks}
+    return {keys[key]: count for key, count in cache.get_many(keys).items() if count}
+
+
+def flush_view_counts(fiche_pks=None):
+    """
+    Write the buffered views back to the database.
+
+    Flushes the fiches this process touched by default. Returns the number
+    of views written.
+    """
+    if fiche_pks is None:
+        with _lock:
+            fiche_pks = list(_touched)
+            _touched.clear()
+
+    by_count = defaultdict(list)
+    for pk, count in pending_view_counts(fiche_pks).items():
+        # Take the counted views out of the buffer before writing them, so
+        # a concurrent flush cannot write them twice; views counted in the
+        # meantime stay in the buffer for the next flush.
+        try:
+            cache.decr(view_count_key(pk), count)
+        except ValueError:
+            continue
+        by_count[count].append(pk)
+
+    for count, pks in by_count.items():
+        _fiches().filter(pk__in=pks).update(views_count=F('views_count') + count)
+    return sum(count * len(pks) for count, pks in by_count.items())
+
+
+def sweep_view_counts():
+    """Flush the buffered views of every fiche, including those left by dead processes."""
+    flushed = 0
+    pks = Fiche.objects.values_list('pk', flat=True).order_by('pk')
+    chunk = []
+    for pk in pks.iterator(chunk_size=SWEEP_CHUNK_SIZE):
+        chunk.append(pk)
+        if len(chunk) == SWEEP_CHUNK_SIZE:
+            flushed += flush_view_counts(chunk)
+            chunk = []
+    if chunk:
+        flushed += flush_view_counts(chunk)
+    return flushed
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(VIEW_COUNT_FLUSH_INTERVAL)
+        try:
+            flush_view_counts()
+        except Exception:
+            logger.exception('Flushing the fiche view counts failed')
+        finally:
+            connection.close()
+
+
+def _ensure_flusher():
+    """Start this process's background flusher, once per process (forks included)."""
+    global _flusher, _flusher_pid
+    if VIEW_COUNT_FLUSH_INTERVAL <= 0:
+        return
+    pid = os.getpid()
+    if _flusher_pid == pid and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher_pid == pid and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(target=_flush_periodically, name='fiche-views-flusher', daemon=True)
+        _flusher_pid = pid
+        _flusher.start()
+
+
+# Write back what is left in the buffer when the process exits cleanly.
+atexit.register(flush_view_counts)
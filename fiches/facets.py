@@ -0,0 +1,115 @@
+"""
+Category facets of the fiche list.
+
+``CategoryFacet`` counts the published fiches of every normalized category
+per difficulty level. The rows of a category are recomputed from the
+``(category_key, -created_at)`` index whenever one of its fiches is saved
+or deleted, and the whole facet list is served from the cache, so building
+the category dropdown never touches the fiche table. The process saving the
+fiche drops the cached list; with a per-process cache (locmem), the other
+workers pick the change up within ``FACETS_CACHE_TIMEOUT`` seconds.
+"""
+
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Trim
+
+from souklou_project.metrics import record_cache
+from .models import Fiche, CategoryFacet, DIFFICULTY_CHOICES
+
+FACETS_CACHE_KEY = 'category_facets'
+FACETS_CACHE_TIMEOUT = getattr(settings, 'FACETS_CACHE_TIMEOUT', 60)
+
+# Fields whose changes move a fiche between facets
+FACET_FIELDS = {'category', 'category_key', 'difficulty_level', 'is_published'}
+
+
+class Facet(NamedTuple):
+    key: str
+    label: str
+    count: int
+    # [(difficulty label, count)] in difficulty order
+    by_difficulty: list
+
+
+def refresh_category_facets(keys=None):
+    """Recompute the facets of the given category keys (all of them by default)."""
+    fiches = Fiche.objects.filter(is_published=True).exclude(category_key='').order_by()
+    facets = CategoryFacet.objects.all()
+    if keys is not None:
+        keys = {key for key in keys if key}
+        if not keys:
+            return 0
+        fiches = fiches.filter(category_key__in=keys)
+        facets = facets.filter(key__in=keys)
+
+    # The most used spelling of a category is its label
+    labels = {}
+    spellings = (
+        fiches.values_list('category_key', Trim('category'))
+        .annotate(uses=Count('id'))
+        .order_by('category_key', '-uses', Trim('category'))
+    )
+    for key, category, _ in spellings:
+        labels.setdefault(key, category)
+
+    rows = [
+        CategoryFacet(key=key, difficulty_level=difficulty, label=labels[key], fiche_count=count)
+        for key, difficulty, count in fiches.values_list('category_key', 'difficulty_level').annotate(Count('id'))
+    ]
+    with transaction.atomic():
+        facets.delete()
+        CategoryFacet.objects.bulk_create(rows)
+        transaction.on_commit(lambda: cache.delete(FACETS_CACHE_KEY))
+    return len(rows)
+
+
+def _build_facets(rows):
+    """Group ``(key, label, difficulty, count)`` facet rows into ``Facet``s sorted by label."""
+    difficulty_labels = dict(DIFFICULTY_CHOICES)
+    grouped = {}
+    for key, label, difficulty, count in rows:
+        grouped.setdefault(key, (label, {}))[1][difficulty] = count
+    return sorted(
+        (
+            Facet(
+                key=key,
+                label=label,
+                count=sum(counts.values()),
+                by_difficulty=[
+                    (difficulty_labels[level], counts[level])
+                    for level, _ in DIFFICULTY_CHOICES if level in counts
+                ],
+            )
+            for key, (label, counts) in grouped.items()
+        ),
+        key=lambda facet: facet.label.lower(),
+    )
+
+
+def _facet_rows():
+    return CategoryFacet.objects.values_list('key', 'label', 'difficulty_level', 'fiche_count')
+
+
+def get_category_facets():
+    """Return the category facets sorted by label, from the cache when possible."""
+    facets = cache.get(FACETS_CACHE_KEY)
+    record_cache('category_facets', facets is not None)
+    if facets is None:
+        facets = _build_facets(_facet_rows())
+        cache.set(FACETS_CACHE_KEY, facets, FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+async def aget_category_facets():
+    """Async version of ``get_category_facets``."""
+    facets = await cache.aget(FACETS_CACHE_KEY)
+    record_cache('category_facets', facets is not None)
+    if facets is None:
+        facets = _build_facets([row async for row in _facet_rows()])
+        await cache.aset(FACETS_CACHE_KEY, facets, FACETS_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,37 @@
+"""
+Validators of the public fiche pages, for ``souklou_project.pagecache``.
+
+The home page and the fiche list change when a published fiche is saved
+(``updated_at``), published, unpublished or deleted (the count); a fiche
+page when the fiche is saved, its quiz changes (``quiz_version``) or its
+content is re-rendered by a new renderer (``content_renderer_version``).
+"""
+
+from django.db.models import Count, Max
+
+from .counters import arecord_view
+from .models import Fiche
+
+
+async def published_fiches_state(request, *args, **kwargs):
+    """Validator of the pages listing published fiches."""
+    state = await Fiche.objects.filter(is_published=True).aaggregate(latest=Max('updated_at'), count=Count('id'))
+    return state['count'], state['latest']
+
+
+async def fiche_state(request, pk):
+    """Validator of a fiche page, ``None`` if the fiche is not published."""
+    state = await (
+        Fiche.objects.filter(pk=pk, is_published=True)
+        .values_list('updated_at', 'quiz_version', 'content_renderer_version')
+        .afirst()
+    )
+    if state is None:
+        return None
+    updated_at, *versions = state
+    return tuple(versions), updated_at
+
+
+async def count_view(request, pk):
+    """Count a view of a fiche page answered without running the view."""
+    await arecord_view(pk)
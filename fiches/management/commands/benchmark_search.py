@@ -0,0 +1,81 @@
+import json
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from fiches.models import Fiche
+from fiches.search import BasicSearchBackend, get_search_backend, reset_search_backends
+from souklou_project.benchmarking import throwaway_database, summarize, timed
+
+WORDS = (
+    'algèbre équation fonction dérivée intégrale géométrie théorème probabilité statistique '
+    'électricité énergie mécanique optique chimie molécule réaction atome cellule génétique '
+    'évolution écosystème histoire révolution empire république guerre traité géographie '
+    'climat population économie littérature poésie roman théâtre grammaire conjugaison '
+    'vocabulaire philosophie morale liberté vérité conscience élève méthode exercice résumé'
+).split()
+
+CATEGORIES = ['Mathématiques', 'Physique', 'Chimie', 'SVT', 'Histoire', 'Géographie', 'Français', 'Philosophie']
+
+# Plain, accent-free, prefix and misspelled queries
+QUERIES = [
+    'équation', 'equation', 'théorème pythagore', 'electricite', 'révolution française',
+    'cellule', 'probab', 'géo', 'molecule reaction', 'philosphie', 'integarle', 'conjugaison verbe',
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the fiche search against unindexed icontains filters on a throwaway database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fiches', type=int, default=100000, help='Number of fiches to seed.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs of each query per backend.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic fiches.')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            reset_search_backends()
+            try:
+                report = self._run(options)
+            finally:
+                reset_search_backends()
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+
+    def _run(self, options):
+        rng = random.Random(options['seed'])
+        author = get_user_model().objects.create_user('benchmark', password=None, role='teacher')
+
+        def text(words):
+            return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+        Fiche.objects.bulk_create(
+            (
+                Fiche(
+                    title=text(4).capitalize(),
+                    description=text(20),
+                    content=text(200),
+                    category=rng.choice(CATEGORIES),
+                    author=author,
+                )
+                for _ in range(options['fiches'])
+            ),
+            batch_size=1000,
+        )
+
+        indexed = get_search_backend()
+        index_time, _ = timed(indexed.rebuild)
+        report = {
+            'fiches': options['fiches'],
+            'backend': type(indexed).__name__,
+            'index_build_s': round(index_time, 3),
+        }
+        for name, backend in (('indexed', indexed), ('icontains', BasicSearchBackend())):
+            samples, hits = [], {}
+            for query in QUERIES:
+                for _ in range(options['repeat']):
+                    elapsed, results = timed(backend.search, query)
+                    samples.append(elapsed)
+                hits[query] = len(results)
+            report[name] = {**summarize(samples), 'hits': hits}
+        return report
@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from fiches.counters import sweep_view_counts, pending_view_counts
+from fiches.models import Fiche
+
+
+class Command(BaseCommand):
+    help = "Write the buffered fiche view counts back to the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pending', action='store_true', help='Only report the buffered counts, as JSON.')
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            pending = pending_view_counts(Fiche.objects.values_list('pk', flat=True))
+            self.stdout.write(json.dumps({
+                'fiches': len(pending),
+                'views': sum(pending.values()),
+                'per_fiche': pending,
+            }, indent=2))
+            return
+
+        flushed = sweep_view_counts()
+        self.stdout.write(self.style.SUCCESS(f"{flushed} vue(s) enregistrée(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from fiches.facets import refresh_category_facets
+
+
+class Command(BaseCommand):
+    help = "Rebuild the category facets of the fiche list."
+
+    def handle(self, *args, **options):
+        count = refresh_category_facets()
+        self.stdout.write(self.style.SUCCESS(f"{count} facette(s) de catégorie recalculée(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from fiches.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of the fiches."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} fiche(s) indexée(s) ({type(backend).__name__})."
+        ))
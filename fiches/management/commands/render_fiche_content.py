@@ -0,0 +1,61 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fiches.markup import RENDERER_VERSION, render_chunk
+from fiches.models import Fiche
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the Markdown content of the fiches whose stored HTML comes from an older "
+        "renderer version, in chunks spread over worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render every fiche, even the up-to-date ones.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes.')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Fiches rendered per chunk.')
+
+    def handle(self, *args, **options):
+        fiches = Fiche.objects.order_by('pk')
+        if not options['all']:
+            fiches = fiches.exclude(content_renderer_version=RENDERER_VERSION)
+        pks = list(fiches.values_list('pk', flat=True))
+        size = options['chunk_size']
+
+        # Workers only render; this process reads the sources and writes the
+        # HTML, a chunk being written while the next ones are rendered.
+        rendered = stale = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            pending = set()
+            for start in range(0, len(pks), size):
+                chunk = list(Fiche.objects.filter(pk__in=pks[start:start + size]).values_list('pk', 'content'))
+                pending.add(executor.submit(render_chunk, chunk))
+                if len(pending) >= 2 * options['workers']:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    rendered, stale = self._save(done, rendered, stale)
+            rendered, stale = self._save(pending, rendered, stale)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{rendered} fiche(s) rendue(s) (version {RENDERER_VERSION})."
+        ))
+        if stale:
+            self.stdout.write(f"{stale} fiche(s) modifiée(s) ou supprimée(s) pendant le rendu, laissée(s) telle(s) quelle(s).")
+
+    @staticmethod
+    def _save(futures, rendered, stale):
+        """Store the HTML of the rendered chunks, unless the content changed in the meantime."""
+        for future in futures:
+            with transaction.atomic():
+                for pk, source, html in future.result():
+                    # A fiche saved meanwhile was rendered by its own save().
+                    if Fiche.objects.filter(pk=pk, content=source).update(
+                        content_html=html, content_renderer_version=RENDERER_VERSION
+                    ):
+                        rendered += 1
+                    else:
+                        stale += 1
+        return rendered, stale
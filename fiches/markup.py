@@ -0,0 +1,72 @@
+"""
+Markdown rendering of the fiche content.
+
+Teachers write the content of a fiche in Markdown, with fenced code blocks
+(highlighted by Pygments) and math between ``$...$`` or ``$$...$$`` (left
+as ``\\(...\\)``/``\\[...\\]`` for KaTeX in the browser). The HTML is rendered
+and sanitized once, when the fiche is saved, and stored in
+``Fiche.content_html`` next to the source; the fiche page only prints it.
+
+``RENDERER_VERSION`` is stored with the HTML: bump it whenever the output
+of ``render_content`` changes (extensions, allowed tags...) and run
+``manage.py render_fiche_content`` to re-render the stale fiches.
+
+This module does not touch the database, so it can run in worker processes.
+"""
+
+import markdown
+import nh3
+from pygments.formatters import HtmlFormatter
+from pygments.token import STANDARD_TYPES
+from django.utils.safestring import mark_safe
+
+RENDERER_VERSION = 1
+
+EXTENSIONS = ['extra', 'sane_lists', 'nl2br', 'codehilite', 'pymdownx.arithmatex']
+EXTENSION_CONFIGS = {
+    'codehilite': {'css_class': 'codehilite', 'guess_lang': False},
+    'pymdownx.arithmatex': {'generic': True},
+}
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'dd', 'del', 'div', 'dl', 'dt', 'em',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'ins', 'kbd', 'li', 'mark',
+    'ol', 'p', 'pre', 'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot',
+    'th', 'thead', 'tr', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'abbr': {'title'},
+    'img': {'src', 'alt', 'title'},
+    'th': {'style'},
+    'td': {'style'},
+}
+# Only the classes of code blocks and math: the pages are styled with
+# Tailwind utility classes, which must not be usable from the content.
+ALLOWED_CLASSES = {
+    'div': {'codehilite', 'arithmatex'},
+    'span': {'arithmatex', *filter(None, STANDARD_TYPES.values())},
+}
+STYLE_PROPERTIES = {'text-align'}
+URL_SCHEMES = {'http', 'https', 'mailto'}
+
+CODE_CSS = mark_safe(HtmlFormatter().get_style_defs('.codehilite'))
+
+
+def render_content(source):
+    """Return the sanitized HTML of the Markdown ``source``."""
+    html = markdown.markdown(source, extensions=EXTENSIONS, extension_configs=EXTENSION_CONFIGS)
+    return nh3.clean(
+        html,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        allowed_classes=ALLOWED_CLASSES,
+        filter_style_properties=STYLE_PROPERTIES,
+        url_schemes=URL_SCHEMES,
+        link_rel='noopener noreferrer nofollow',
+    )
+
+
+def render_chunk(rows):
+    """Render ``(pk, source)`` rows into ``(pk, source, html)`` rows."""
+    return [(pk, source, render_content(source)) for pk, source in rows]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fiches", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fiche",
+            name="quiz_version",
+            field=models.PositiveIntegerField(
+                default=1,
+                editable=False,
+                help_text="Incrémentée à chaque modification des questions ou des réponses",
+                verbose_name="Version du quiz",
+            ),
+        ),
+    ]
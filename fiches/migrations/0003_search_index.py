@@ -0,0 +1,64 @@
+from django.db import migrations
+
+SQLITE_SQL = [
+    "CREATE VIRTUAL TABLE fiches_fiche_fts USING fts5("
+    "title, description, category, content, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE fiches_fiche_fts_vocab USING fts5vocab(fiches_fiche_fts, 'row')",
+    "INSERT INTO fiches_fiche_fts (rowid, title, description, category, content) "
+    "SELECT id, title, description, category, content FROM fiches_fiche",
+]
+
+SQLITE_REVERSE_SQL = [
+    "DROP TABLE IF EXISTS fiches_fiche_fts_vocab",
+    "DROP TABLE IF EXISTS fiches_fiche_fts",
+]
+
+POSTGRES_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE TEXT SEARCH CONFIGURATION souklou_fr (COPY = french)",
+    "ALTER TEXT SEARCH CONFIGURATION souklou_fr "
+    "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem",
+    "CREATE TABLE fiches_fiche_search ("
+    "fiche_id bigint PRIMARY KEY REFERENCES fiches_fiche (id) ON DELETE CASCADE "
+    "DEFERRABLE INITIALLY DEFERRED, "
+    "document tsvector NOT NULL, "
+    "title text NOT NULL)",
+    "CREATE INDEX fiches_fiche_search_document ON fiches_fiche_search USING GIN (document)",
+    "CREATE INDEX fiches_fiche_search_title ON fiches_fiche_search USING GIN (title gin_trgm_ops)",
+    "INSERT INTO fiches_fiche_search (fiche_id, document, title) "
+    "SELECT id, "
+    "setweight(to_tsvector('souklou_fr', title), 'A') || "
+    "setweight(to_tsvector('souklou_fr', description), 'B') || "
+    "setweight(to_tsvector('souklou_fr', category), 'B') || "
+    "setweight(to_tsvector('souklou_fr', content), 'D'), "
+    "lower(unaccent(title)) FROM fiches_fiche",
+]
+
+POSTGRES_REVERSE_SQL = [
+    "DROP TABLE IF EXISTS fiches_fiche_search",
+    "DROP TEXT SEARCH CONFIGURATION IF EXISTS souklou_fr",
+]
+
+
+def run(statements_by_vendor):
+    def operation(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fiches", "0002_fiche_quiz_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({"sqlite": SQLITE_SQL, "postgresql": POSTGRES_SQL}),
+            run({"sqlite": SQLITE_REVERSE_SQL, "postgresql": POSTGRES_REVERSE_SQL}),
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:29
+
+from django.db import migrations, models
+from django.db.models.functions import Trim
+from django.utils.text import slugify
+
+
+def backfill_category_facets(apps, schema_editor):
+    Fiche = apps.get_model("fiches", "Fiche")
+    CategoryFacet = apps.get_model("fiches", "CategoryFacet")
+    fiches = list(Fiche.objects.only("pk", "category"))
+    for fiche in fiches:
+        fiche.category_key = slugify(fiche.category)[:100]
+    Fiche.objects.bulk_update(fiches, ["category_key"], batch_size=500)
+
+    published = Fiche.objects.filter(is_published=True).exclude(category_key="")
+    labels = {}
+    for key, category, _ in (
+        published.values_list("category_key", Trim("category"))
+        .annotate(uses=models.Count("id"))
+        .order_by("category_key", "-uses", Trim("category"))
+    ):
+        labels.setdefault(key, category)
+    CategoryFacet.objects.bulk_create(
+        [
+            CategoryFacet(
+                key=key,
+                difficulty_level=difficulty,
+                label=labels[key],
+                fiche_count=count,
+            )
+            for key, difficulty, count in published.order_by()
+            .values_list("category_key", "difficulty_level")
+            .annotate(models.Count("id"))
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fiches", "0003_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryFacet",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.SlugField(max_length=100, verbose_name="Clé")),
+                (
+                    "difficulty_level",
+                    models.CharField(
+                        choices=[
+                            ("beginner", "Débutant"),
+                            ("intermediate", "Intermédiaire"),
+                            ("advanced", "Avancé"),
+                        ],
+                        max_length=20,
+                        verbose_name="Niveau de difficulté",
+                    ),
+                ),
+                ("label", models.CharField(max_length=100, verbose_name="Libellé")),
+                (
+                    "fiche_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Fiches publiées"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Facette de catégorie",
+                "verbose_name_plural": "Facettes de catégorie",
+            },
+        ),
+        migrations.AddField(
+            model_name="fiche",
+            name="category_key",
+            field=models.SlugField(
+                blank=True,
+                editable=False,
+                max_length=100,
+                verbose_name="Clé de catégorie",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="fiche",
+            index=models.Index(
+                fields=["category_key", "-created_at"],
+                name="fiches_fich_categor_265ec6_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="categoryfacet",
+            unique_together={("key", "difficulty_level")},
+        ),
+        migrations.RunPython(backfill_category_facets, migrations.RunPython.noop),
+    ]
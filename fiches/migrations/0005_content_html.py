@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fiches", "0004_category_facets"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fiche",
+            name="content_html",
+            field=models.TextField(
+                blank=True,
+                editable=False,
+                help_text="Rendu du contenu, mis à jour à chaque enregistrement",
+                verbose_name="Contenu (HTML)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="fiche",
+            name="content_renderer_version",
+            field=models.PositiveSmallIntegerField(
+                default=0, editable=False, verbose_name="Version du rendu du contenu"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="fiche",
+            name="content",
+            field=models.TextField(
+                help_text="Le résumé complet du cours, en Markdown",
+                verbose_name="Contenu",
+            ),
+        ),
+    ]
@@ -1,6 +1,25 @@
 from django.db import models
 from django.conf import settings
 from django.urls import reverse
+from django.utils.text import slugify
+
+
+DIFFICULTY_CHOICES = [
+    ('beginner', 'Débutant'),
+    ('intermediate', 'Intermédiaire'),
+    ('advanced', 'Avancé'),
+]
+
+# Large columns only the fiche page needs, deferred by the pages listing fiches
+CONTENT_FIELDS = ('content', 'content_html')
+# Counters only ever changed in the database with F() expressions; saving
+# an instance must not write back the (possibly stale) values it holds.
+COUNTER_FIELDS = ('views_count', 'quiz_version')
+
+
+def normalize_category(category):
+    """Return the key grouping spellings of a category ("Mathématiques ", "mathematiques"...)."""
+    return slugify(category)[:100]
 
 
 class Fiche(models.Model):
@@ -16,7 +35,18 @@ class Fiche(models.Model):
     )
     content = models.TextField(
         verbose_name='Contenu',
-        help_text='Le résumé complet du cours'
+        help_text='Le résumé complet du cours, en Markdown'
+    )
+    content_html = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Contenu (HTML)',
+        help_text='Rendu du contenu, mis à jour à chaque enregistrement'
+    )
+    content_renderer_version = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Version du rendu du contenu'
     )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -30,13 +60,15 @@ class Fiche(models.Model):
         verbose_name='Catégorie',
         help_text='Ex: Mathématiques, Physique, Histoire...'
     )
+    category_key = models.SlugField(
+        max_length=100,
+        blank=True,
+        editable=False,
+        verbose_name='Clé de catégorie'
+    )
     difficulty_level = models.CharField(
         max_length=20,
-        choices=[
-            ('beginner', 'Débutant'),
-            ('intermediate', 'Intermédiaire'),
-            ('advanced', 'Avancé'),
-        ],
+        choices=DIFFICULTY_CHOICES,
         default='intermediate',
         verbose_name='Niveau de difficulté'
     )
@@ -48,6 +80,12 @@ class Fiche(models.Model):
         default=0,
         verbose_name='Nombre de vues'
     )
+    quiz_version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name='Version du quiz',
+        help_text='Incrémentée à chaque modification des questions ou des réponses'
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Date de création'
@@ -64,15 +102,74 @@ class Fiche(models.Model):
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['category']),
+            models.Index(fields=['category_key', '-created_at']),
         ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.category_key = normalize_category(self.category)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = update_fields = {
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred and field.name not in COUNTER_FIELDS
+            }
+        if update_fields is not None and 'category' in update_fields:
+            kwargs['update_fields'] = update_fields = {*update_fields, 'category_key'}
+        if update_fields is None or 'content' in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_html', 'content_renderer_version'}
+        super().save(*args, **kwargs)
+
+    def render_content(self):
+        """Render the Markdown ``content`` into ``content_html``."""
+        from .markup import RENDERER_VERSION, render_content
+        self.content_html = render_content(self.content)
+        self.content_renderer_version = RENDERER_VERSION
+
     def get_absolute_url(self):
         return reverse('fiches:detail', kwargs={'pk': self.pk})
 
     def increment_views(self):
-        """Increment the view count."""
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+        """Count a view; it is buffered and written back to the database later."""
+        from .counters import record_view
+        self.views_count += record_view(self.pk)
+
+    async def aincrement_views(self):
+        """Async version of ``increment_views``."""
+        from .counters import arecord_view
+        self.views_count += await arecord_view(self.pk)
+
+
+class CategoryFacet(models.Model):
+    """Model counting the published fiches of a category per difficulty level, maintained on save."""
+
+    key = models.SlugField(
+        max_length=100,
+        verbose_name='Clé'
+    )
+    difficulty_level = models.CharField(
+        max_length=20,
+        choices=DIFFICULTY_CHOICES,
+        verbose_name='Niveau de difficulté'
+    )
+    label = models.CharField(
+        max_length=100,
+        verbose_name='Libellé'
+    )
+    fiche_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Fiches publiées'
+    )
+
+    class Meta:
+        verbose_name = 'Facette de catégorie'
+        verbose_name_plural = 'Facettes de catégorie'
+        unique_together = ['key', 'difficulty_level']
+
+    def __str__(self):
+        return f"{self.label} ({self.get_difficulty_level_display()}) - {self.fiche_count}"
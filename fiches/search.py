@@ -0,0 +1,296 @@
+"""
+Full-text search over fiches.
+
+The index covers the title, description, category and content of every
+fiche and is kept in sync by the ``Fiche`` save/delete signals.
+
+* SQLite: an FTS5 table (``fiches_fiche_fts``) with a diacritics-folding
+  tokenizer, ranked with ``bm25`` and highlighted with ``snippet``. When a
+  query matches nothing, its terms are corrected against the index
+  vocabulary (``fiches_fiche_fts_vocab``).
+* PostgreSQL: a ``tsvector`` table (``fiches_fiche_search``) with a GIN
+  index, built with the ``souklou_fr`` text search configuration (French
+  stemming after ``unaccent``), ranked with ``ts_rank`` and highlighted with
+  ``ts_headline``. When a query matches nothing, titles are matched by
+  trigram similarity.
+* Any other backend falls back to ``icontains`` filters.
+
+``filters`` (``{'is_published': True, 'category_key': ...}``) are equality
+conditions on fiche columns, applied in the search query itself so that
+the ``limit`` best hits all match them.
+"""
+
+import difflib
+import re
+import unicodedata
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Fiche
+
+SEARCH_RESULTS_LIMIT = getattr(settings, 'FICHE_SEARCH_RESULTS_LIMIT', 100)
+
+# Private-use characters marking highlighted terms in snippets, replaced by
+# <mark> tags once the snippet has been escaped.
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_STOP = '\ue001'
+
+SQLITE_TABLE = 'fiches_fiche_fts'
+SQLITE_VOCAB_TABLE = 'fiches_fiche_fts_vocab'
+POSTGRES_TABLE = 'fiches_fiche_search'
+POSTGRES_CONFIG = 'souklou_fr'
+
+INDEXED_FIELDS = ('title', 'description', 'category', 'content')
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchHit(NamedTuple):
+    fiche_id: int
+    rank: float
+    snippet: str
+
+
+def fold(text):
+    """Lowercase ``text`` and strip its accents, like the search index does."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def query_terms(query):
+    """Split a user query into folded search terms."""
+    return [fold(term) for term in TERM_RE.findall(query)]
+
+
+def highlight(snippet):
+    """Escape a snippet and turn its highlight markers into ``<mark>`` tags."""
+    return mark_safe(
+        escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_STOP, '</mark>')
+    )
+
+
+class BasicSearchBackend:
+    """Unindexed search with ``icontains`` filters, for databases without full-text support."""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def index(self, fiche):
+        pass
+
+    def remove(self, fiche_id):
+        pass
+
+    def rebuild(self):
+        return 0
+
+    def _where(self, filters, alias):
+        """Return the SQL conditions and parameters of ``filters`` on the fiche table aliased ``alias``."""
+        quote = connections[self.using].ops.quote_name
+        sql = ''.join(
+            f' AND {alias}.{quote(Fiche._meta.get_field(name).column)} = %s' for name in filters
+        )
+        return sql, list(filters.values())
+
+    def search(self, query, limit=SEARCH_RESULTS_LIMIT, filters=None):
+        condition = Q(**(filters or {}))
+        for term in TERM_RE.findall(query):
+            condition &= (
+                Q(title__icontains=term) |
+                Q(description__icontains=term) |
+                Q(category__icontains=term) |
+                Q(content__icontains=term)
+            )
+        fiches = (
+            Fiche.objects.using(self.using).filter(condition)
+            .order_by('-created_at', '-pk')
+            .values_list('pk', 'description')[:limit]
+        )
+        return [SearchHit(pk, 0.0, escape(description)) for pk, description in fiches]
+
+
+class SqliteSearchBackend(BasicSearchBackend):
+    """FTS5 search for SQLite."""
+
+    # bm25 weights of title, description, category and content
+    WEIGHTS = (10.0, 4.0, 4.0, 1.0)
+
+    def index(self, fiche):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [fiche.pk])
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, title, description, category, content) '
+                f'VALUES (%s, %s, %s, %s, %s)',
+                [fiche.pk, *(getattr(fiche, field) for field in INDEXED_FIELDS)],
+            )
+
+    def remove(self, fiche_id):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [fiche_id])
+
+    def rebuild(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, title, description, category, content) '
+                f'SELECT id, title, description, category, content FROM {Fiche._meta.db_table}'
+            )
+            indexed = cursor.rowcount
+            cursor.execute(f"INSERT INTO {SQLITE_TABLE} ({SQLITE_TABLE}) VALUES ('optimize')")
+            return indexed
+
+    def search(self, query, limit=SEARCH_RESULTS_LIMIT, filters=None):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        hits = self._match(' '.join(f'"{term}"*' for term in terms), limit, filters or {})
+        if not hits:
+            corrected = self._corrected_match(terms)
+            if corrected:
+                hits = self._match(corrected, limit, filters or {})
+        return hits
+
+    def _match(self, match, limit, filters):
+        weights = ', '.join(str(weight) for weight in self.WEIGHTS)
+        where, params = self._where(filters, 'f')
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT {SQLITE_TABLE}.rowid, bm25({SQLITE_TABLE}, {weights}) AS rank, '
+                f"snippet({SQLITE_TABLE}, -1, %s, %s, '…', 16) "
+                f'FROM {SQLITE_TABLE} JOIN {Fiche._meta.db_table} f ON f.id = {SQLITE_TABLE}.rowid '
+                f'WHERE {SQLITE_TABLE} MATCH %s{where} '
+                f'ORDER BY rank, {SQLITE_TABLE}.rowid DESC LIMIT %s',
+                [HIGHLIGHT_START, HIGHLIGHT_STOP, match, *params, limit],
+            )
+            return [SearchHit(pk, -rank, highlight(snippet)) for pk, rank, snippet in cursor.fetchall()]
+
+    def _corrected_match(self, terms):
+        """Build a MATCH expression where each term also matches its closest indexed spellings."""
+        groups = []
+        with connections[self.using].cursor() as cursor:
+            for term in terms:
+                # Typos rarely hit the first letter: only compare with the
+                # indexed terms sharing it.
+                cursor.execute(
+                    f'SELECT term FROM {SQLITE_VOCAB_TABLE} WHERE term >= %s AND term < %s',
+                    [term[0], chr(ord(term[0]) + 1)],
+                )
+                vocabulary = [row[0] for row in cursor.fetchall()]
+                candidates = difflib.get_close_matches(term, vocabulary, n=3, cutoff=0.75)
+                if not candidates:
+                    return None
+                groups.append('(' + ' OR '.join(f'"{candidate}"' for candidate in candidates) + ')')
+        return ' AND '.join(groups)
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    """tsvector/GIN search for PostgreSQL."""
+
+    DOCUMENT_SQL = (
+        f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'A') || "
+        f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B') || "
+        f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B') || "
+        f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'D')"
+    )
+
+    def index(self, fiche):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (fiche_id, document, title) '
+                f'VALUES (%s, {self.DOCUMENT_SQL}, lower(unaccent(%s))) '
+                f'ON CONFLICT (fiche_id) DO UPDATE '
+                f'SET document = EXCLUDED.document, title = EXCLUDED.title',
+                [fiche.pk, *(getattr(fiche, field) for field in INDEXED_FIELDS), fiche.title],
+            )
+
+    def remove(self, fiche_id):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {POSTGRES_TABLE} WHERE fiche_id = %s', [fiche_id])
+
+    def rebuild(self):
+        document = self.DOCUMENT_SQL % ('title', 'description', 'category', 'content')
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'TRUNCATE {POSTGRES_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (fiche_id, document, title) '
+                f'SELECT id, {document}, lower(unaccent(title)) FROM {Fiche._meta.db_table}'
+            )
+            return cursor.rowcount
+
+    def search(self, query, limit=SEARCH_RESULTS_LIMIT, filters=None):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        hits = self._match(' & '.join(f'{term}:*' for term in terms), limit, filters or {})
+        if not hits:
+            hits = self._similar_titles(' '.join(terms), limit, filters or {})
+        return hits
+
+    def _match(self, tsquery, limit, filters):
+        where, params = self._where(filters, 'c')
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT ranked.fiche_id, ranked.rank, "
+                f"ts_headline('{POSTGRES_CONFIG}', f.description || ' ' || f.content, ranked.query, %s) "
+                f"FROM ("
+                f"  SELECT s.fiche_id, ts_rank(s.document, q) AS rank, q AS query "
+                f"  FROM {POSTGRES_TABLE} s JOIN {Fiche._meta.db_table} c ON c.id = s.fiche_id, "
+                f"  to_tsquery('{POSTGRES_CONFIG}', %s) q "
+                f"  WHERE s.document @@ q{where} ORDER BY rank DESC, s.fiche_id DESC LIMIT %s"
+                f") ranked JOIN {Fiche._meta.db_table} f ON f.id = ranked.fiche_id "
+                f"ORDER BY ranked.rank DESC, ranked.fiche_id DESC",
+                [
+                    f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=30, MinWords=10',
+                    tsquery,
+                    *params,
+                    limit,
+                ],
+            )
+            return [SearchHit(pk, rank, highlight(snippet)) for pk, rank, snippet in cursor.fetchall()]
+
+    def _similar_titles(self, text, limit, filters):
+        where, params = self._where(filters, 'f')
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT s.fiche_id, similarity(s.title, %s) AS rank, f.description '
+                f'FROM {POSTGRES_TABLE} s JOIN {Fiche._meta.db_table} f ON f.id = s.fiche_id '
+                f'WHERE s.title %% %s{where} ORDER BY rank DESC, s.fiche_id DESC LIMIT %s',
+                [text, text, *params, limit],
+            )
+            return [SearchHit(pk, rank, escape(description)) for pk, rank, description in cursor.fetchall()]
+
+
+_backends = {}
+
+
+def get_search_backend(using=DEFAULT_DB_ALIAS):
+    """Return the search backend matching the database behind ``using``."""
+    backend = _backends.get(using)
+    if backend is None:
+        connection = connections[using]
+        tables = connection.introspection.table_names()
+        if connection.vendor == 'sqlite' and SQLITE_TABLE in tables:
+            backend = SqliteSearchBackend(using)
+        elif connection.vendor == 'postgresql' and POSTGRES_TABLE in tables:
+            backend = PostgresSearchBackend(using)
+        else:
+            backend = BasicSearchBackend(using)
+        _backends[using] = backend
+    return backend
+
+
+def reset_search_backends():
+    """Forget the detected backends, e.g. after switching to other databases."""
+    _backends.clear()
+
+
+def search_fiches(query, limit=SEARCH_RESULTS_LIMIT, filters=None):
+    """Return the ranked search hits of ``query`` among the fiches matching ``filters``."""
+    return get_search_backend().search(query, limit, filters)
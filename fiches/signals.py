@@ -0,0 +1,43 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .facets import refresh_category_facets, FACET_FIELDS
+from .models import Fiche
+from .search import get_search_backend, INDEXED_FIELDS
+
+
+@receiver(post_save, sender=Fiche)
+def index_fiche(sender, instance, raw=False, update_fields=None, using=None, **kwargs):
+    """Keep the search index in sync with the fiche."""
+    if raw or (update_fields is not None and not set(update_fields) & set(INDEXED_FIELDS)):
+        return
+    get_search_backend(using).index(instance)
+
+
+@receiver(post_delete, sender=Fiche)
+def unindex_fiche(sender, instance, using=None, **kwargs):
+    """Remove a deleted fiche from the search index."""
+    get_search_backend(using).remove(instance.pk)
+
+
+@receiver(pre_save, sender=Fiche)
+def remember_fiche_category(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Remember the category a fiche had before it is saved."""
+    if raw or instance._state.adding or (update_fields is not None and not set(update_fields) & FACET_FIELDS):
+        return
+    instance._previous_category_key = (
+        Fiche.objects.filter(pk=instance.pk).values_list('category_key', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Fiche)
+def update_category_facets(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Recompute the facets of the fiche's category (and of its previous one)."""
+    if raw or (update_fields is not None and not set(update_fields) & FACET_FIELDS):
+        return
+    refresh_category_facets({instance.category_key, getattr(instance, '_previous_category_key', None)})
+
+
+@receiver(post_delete, sender=Fiche)
+def remove_from_category_facets(sender, instance, **kwargs):
+    """Recompute the facets of a deleted fiche's category."""
+    refresh_category_facets({instance.category_key})
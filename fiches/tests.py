@@ -1,3 +1,66 @@
+import re
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+
+from souklou_project import routers
+from .models import Fiche
+
+
+class ReplicaPinTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        teacher = get_user_model().objects.create_user('teacher', password='x', role='teacher')
+        cls.fiche = Fiche.objects.create(title='Fiche', description='d', content='c', author=teacher)
+
+    def test_counting_a_view_does_not_pin_to_the_primary(self):
+        with mock.patch.object(routers, 'REPLICAS', ['default']):
+            response = self.client.get(reverse('fiches:detail', args=[self.fiche.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        self.fiche.refresh_from_db()
+        self.assertEqual(self.fiche.views_count, 1)
+
+    def test_other_writes_pin_to_the_primary(self):
+        state = routers.RoutingState('default')
+        token = routers._state.set(state)
+        try:
+            Fiche.objects.filter(pk=self.fiche.pk).update(title='Autre')
+        finally:
+            routers._state.reset(token)
+        self.assertTrue(state.wrote)
+
+
+class SearchPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        teacher = get_user_model().objects.create_user('teacher', password='x', role='teacher')
+        for index in range(25):
+            Fiche.objects.create(title=f'Algèbre {index}', description='d', content='c', author=teacher)
+        Fiche.objects.create(title='Géométrie', description='d', content='c', author=teacher)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        titles = re.findall(r'Algèbre \d+', response.content.decode())
+        links = dict(
+            (rel, href.replace('&amp;', '&'))
+            for href, rel in re.findall(r'<a href="([^"]+)" rel="(next|prev)"', response.content.decode())
+        )
+        return titles, links
+
+    def test_every_hit_is_reachable(self):
+        url = reverse('fiches:list')
+        pages = [self.get(f'{url}?search=algebre&per_page=10')]
+        while 'next' in pages[-1][1]:
+            pages.append(self.get(url + pages[-1][1]['next']))
+
+        self.assertEqual([len(titles) for titles, _ in pages], [10, 10, 5])
+        seen = [title for titles, _ in pages for title in titles]
+        self.assertEqual(len(set(seen)), 25)
+        self.assertNotIn('prev', pages[0][1])
 
-# Create your tests here.
+        titles, _ = self.get(url + pages[2][1]['prev'])
+        self.assertEqual(titles, pages[1][0])
@@ -1,64 +1,97 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count
-from .models import Fiche
+from django.db.models import Count
+from .cards import aattach_cards
+from .facets import aget_category_facets
+from .freshness import count_view, fiche_state, published_fiches_state
+from .markup import CODE_CSS
+from .models import CONTENT_FIELDS, Fiche, normalize_category
+from .search import search_fiches
+from souklou_project.asyncutils import aget_user, arender
+from souklou_project.pagecache import public_page
+from souklou_project.pagination import RankedPaginator, apaginate
 from .forms import FicheForm
 
 
-def fiche_list(request):
+@public_page(published_fiches_state)
+async def fiche_list(request):
     """View to list all published fiches."""
-    fiches = Fiche.objects.filter(is_published=True).select_related('author').annotate(
+    fiches = Fiche.objects.filter(is_published=True).defer(*CONTENT_FIELDS).select_related('author').annotate(
         quiz_count=Count('questions')
     )
 
-    # Search functionality
+    # Filter by category (older links carry the label, which normalizes to the same key)
+    category = normalize_category(request.GET.get('category', ''))
+    if category:
+        fiches = fiches.filter(category_key=category)
+
+    # Search functionality, among the fiches listed
     search_query = request.GET.get('search', '')
     if search_query:
-        fiches = fiches.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(category__icontains=search_query)
-        )
-
-    # Filter by category
-    category = request.GET.get('category', '')
-    if category:
-        fiches = fiches.filter(category=category)
+        # Most relevant first, with the matching passage highlighted
+        paginator = RankedPaginator()
+        start, limit = paginator.window(request)
+        filters = {'is_published': True, **({'category_key': category} if category else {})}
+        hits = await sync_to_async(search_fiches)(search_query, limit=limit, filters=filters)
+        page = paginator.page(request, hits, start)
+        found = {fiche.pk: fiche async for fiche in fiches.filter(pk__in=[hit.fiche_id for hit in page])}
+        results = []
+        for hit in page:
+            fiche = found.get(hit.fiche_id)
+            if fiche is not None:
+                fiche.search_snippet = hit.snippet
+                results.append(fiche)
+        page.object_list = results
+        fiches = page
+    else:
+        fiches = page = await apaginate(fiches, request, ('-created_at', '-pk'))
+    await aattach_cards(fiches, 'card')
 
-    # Get all unique categories for filter
-    categories = Fiche.objects.filter(is_published=True).values_list('category', flat=True).distinct()
+    # Categories with their published fiche counts, for the filter
+    categories = await aget_category_facets()
 
     context = {
         'fiches': fiches,
+        'page': page,
         'search_query': search_query,
         'selected_category': category,
         'categories': categories,
     }
-    return render(request, 'fiches/fiche_list.html', context)
+    return await arender(request, 'fiches/fiche_list.html', context)
 
 
-def fiche_detail(request, pk):
+@public_page(fiche_state, on_hit=count_view)
+async def fiche_detail(request, pk):
     """View to display a single fiche."""
-    fiche = get_object_or_404(Fiche, pk=pk, is_published=True)
-    fiche.increment_views()
+    try:
+        fiche = await Fiche.objects.defer('content').select_related('author').aget(pk=pk, is_published=True)
+    except Fiche.DoesNotExist:
+        raise Http404('No Fiche matches the given query.')
+    await fiche.aincrement_views()
 
     # Get quiz info
-    questions = fiche.questions.all().prefetch_related('answers')
-    has_quiz = questions.exists()
+    question_count = await fiche.questions.acount()
 
     # Get user's previous attempts if logged in
     user_attempts = None
-    if request.user.is_authenticated:
-        user_attempts = fiche.attempts.filter(student=request.user).order_by('-completed_at')[:5]
+    user = await aget_user(request)
+    if user.is_authenticated:
+        user_attempts = [
+            attempt async for attempt in
+            fiche.attempts.filter(student=user).order_by('-completed_at')[:5]
+        ]
 
     context = {
         'fiche': fiche,
-        'has_quiz': has_quiz,
-        'question_count': questions.count(),
+        'has_quiz': question_count > 0,
+        'question_count': question_count,
         'user_attempts': user_attempts,
+        'code_css': CODE_CSS,
     }
-    return render(request, 'fiches/fiche_detail.html', context)
+    return await arender(request, 'fiches/fiche_detail.html', context)
 
 
 @login_required
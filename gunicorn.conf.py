@@ -0,0 +1,115 @@
+"""
+Gunicorn configuration of SOUKLOU (``gunicorn -c gunicorn.conf.py``, see production.sh).
+
+Every setting can be overridden from the environment or the ``.env`` file:
+
+* ``GUNICORN_BIND`` (``0.0.0.0:8000``);
+* ``WEB_CONCURRENCY``: worker processes, by default sized from the CPUs
+  (``2 × CPU + 1``, one per CPU for async workers) and capped so that
+  ``GUNICORN_WORKER_MEMORY_MB`` fits for each in the available memory;
+* ``GUNICORN_THREADS``: threads per worker (``gthread`` workers above 1);
+* ``GUNICORN_WORKER_CLASS``: ``sync`` by default, or
+  ``uvicorn.workers.UvicornWorker`` to serve the ASGI application;
+* ``GUNICORN_MAX_REQUESTS`` / ``GUNICORN_MAX_REQUESTS_JITTER``: workers are
+  recycled after about that many requests, staggered by the jitter;
+* ``GUNICORN_TIMEOUT``, ``GUNICORN_GRACEFUL_TIMEOUT``, ``GUNICORN_PIDFILE``.
+
+The application is preloaded in the master, which then warms it up
+(templates, URLconfs, caches: see ``souklou_project/warmup.py``) before
+forking the workers; each worker opens its database connections before it
+accepts requests.
+"""
+
+import os
+
+import decouple
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'souklou_project.settings')
+os.environ.setdefault('DATABASE_ROLE', 'web')
+
+
+def _cpu_count():
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    # Containers limited by a CPU quota (cgroup v2)
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as stream:
+            quota, period = stream.read().split()
+        if quota != 'max':
+            count = min(count, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+def _memory_mb():
+    limits = []
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as stream:
+                limits.append(int(stream.read()) // 2**20)
+        except (OSError, ValueError):
+            pass
+    try:
+        limits.append(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2**20)
+    except (ValueError, OSError):
+        pass
+    return min(limits) if limits else None
+
+
+bind = decouple.config('GUNICORN_BIND', default='0.0.0.0:8000')
+worker_class = decouple.config('GUNICORN_WORKER_CLASS', default='sync')
+threads = decouple.config('GUNICORN_THREADS', default=1, cast=int)
+asynchronous = 'uvicorn' in worker_class.lower()
+
+wsgi_app = 'souklou_project.asgi:application' if asynchronous else 'souklou_project.wsgi:application'
+
+cpus = _cpu_count()
+workers = cpus if asynchronous else 2 * cpus + 1
+memory = _memory_mb()
+if memory:
+    workers = min(workers, max(1, memory // decouple.config('GUNICORN_WORKER_MEMORY_MB', default=200, cast=int)))
+workers = decouple.config('WEB_CONCURRENCY', default=workers, cast=int)
+
+preload_app = True
+max_requests = decouple.config('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = decouple.config('GUNICORN_MAX_REQUESTS_JITTER', default=100, cast=int)
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = decouple.config('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+keepalive = 5
+pidfile = decouple.config('GUNICORN_PIDFILE', default='/tmp/souklou-gunicorn.pid')
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    # The application is loaded (preload_app) and no worker is forked yet
+    from django.core.cache import caches
+    from django.db import connections
+
+    from souklou_project import metrics
+    from souklou_project.warmup import warm_up
+
+    report = warm_up()
+    server.log.info('Warm-up: %s', report)
+    # Forked workers must not share the master's database and cache (Redis,
+    # Memcached) sockets, nor report the warm-up's cache lookups as their own
+    connections.close_all()
+    caches.close_all()
+    metrics.reset()
+
+
+def post_worker_init(worker):
+    # Async and threaded workers query from other threads than this one
+    if worker_class == 'sync' and threads == 1:
+        from souklou_project.warmup import open_connections
+
+        open_connections()
+
+
+def child_exit(server, worker):
+    from souklou_project import metrics
+
+    metrics.mark_process_dead(worker.pid)
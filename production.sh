@@ -0,0 +1,55 @@
+#!/bin/bash
+#
+# Serveur de production : gunicorn avec gunicorn.conf.py.
+#
+#   ./production.sh          démarre le serveur (collectstatic puis gunicorn)
+#   ./production.sh reload   recharge le code sans couper les connexions
+#   ./production.sh stop     arrête le serveur après les requêtes en cours
+
+set -e
+cd "$(dirname "$0")"
+
+if [ -d "venv" ]; then
+    source venv/bin/activate
+fi
+
+PIDFILE="${GUNICORN_PIDFILE:-/tmp/souklou-gunicorn.pid}"
+
+case "${1:-start}" in
+    start)
+        python manage.py collectstatic --noinput --verbosity 0
+        exec gunicorn -c gunicorn.conf.py
+        ;;
+    reload)
+        if [ ! -f "$PIDFILE" ]; then
+            echo "❌ Aucun serveur en cours ($PIDFILE introuvable)."
+            exit 1
+        fi
+        old=$(cat "$PIDFILE")
+        # L'application étant préchargée, HUP ne relirait pas le code : on
+        # démarre un nouveau maître (USR2, il écrit son pid dans $PIDFILE.2)
+        # et, une fois préchauffé et ses workers lancés, on arrête proprement
+        # l'ancien.
+        kill -USR2 "$old"
+        for _ in $(seq 120); do
+            new=$(cat "$PIDFILE.2" 2>/dev/null || true)
+            if [ -n "$new" ] && pgrep -P "$new" > /dev/null; then
+                kill -QUIT "$old"
+                echo "✅ Serveur rechargé (maître $new)."
+                exit 0
+            fi
+            sleep 0.5
+        done
+        echo "❌ Le nouveau maître n'a pas démarré ; l'ancien continue de servir."
+        exit 1
+        ;;
+    stop)
+        if [ -f "$PIDFILE" ]; then
+            kill -TERM "$(cat "$PIDFILE")"
+        fi
+        ;;
+    *)
+        echo "Usage : $0 [start|reload|stop]"
+        exit 1
+        ;;
+esac
@@ -13,6 +13,7 @@ class QuestionAdmin(admin.ModelAdmin):
     list_display = ['text_short', 'fiche', 'order', 'points', 'created_at']
     list_filter = ['fiche', 'created_at']
     search_fields = ['text', 'fiche__title']
+    list_select_related = ['fiche']
     ordering = ['fiche', 'order']
     inlines = [AnswerInline]
 
@@ -32,6 +33,7 @@ class AnswerAdmin(admin.ModelAdmin):
     list_display = ['text_short', 'question_short', 'is_correct', 'order']
     list_filter = ['is_correct', 'created_at']
     search_fields = ['text', 'question__text']
+    list_select_related = ['question']
     ordering = ['question', 'order']
 
     def text_short(self, obj):
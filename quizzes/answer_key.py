@@ -0,0 +1,121 @@
+"""
+Compiled answer keys.
+
+An answer key holds everything grading needs to know about a fiche's quiz:
+its questions in display order with their points, and every answer with its
+correctness. Keys are compiled once per ``Fiche.quiz_version`` and kept in a
+process-local LRU in front of the Django cache, so a hot fiche is graded
+without reading the answer table.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+
+from fiches.models import Fiche
+from souklou_project.metrics import record_cache
+from .models import Question, Answer
+
+ANSWER_FIELDS = ('id', 'question_id', 'text', 'is_correct', 'order')
+
+LOCAL_CACHE_SIZE = getattr(settings, 'ANSWER_KEY_LOCAL_CACHE_SIZE', 256)
+CACHE_TIMEOUT = getattr(settings, 'ANSWER_KEY_CACHE_TIMEOUT', 60 * 60 * 24)
+
+_local_keys = OrderedDict()
+_local_lock = threading.Lock()
+
+
+class AnswerKey:
+    """Correct answers, points and order of every question of a fiche."""
+
+    def __init__(self, fiche_id, version, questions, answers):
+        self.fiche_id = fiche_id
+        self.version = version
+        # [(question_id, points, order)] in display order
+        self.questions = questions
+        # {answer_id: (question_id, text, is_correct, order)} in display order
+        self.answers = answers
+        self.correct = {question_id: [] for question_id, _, _ in questions}
+        for answer_id, (question_id, _, is_correct, _) in answers.items():
+            if is_correct:
+                self.correct[question_id].append(answer_id)
+
+    def __len__(self):
+        return len(self.questions)
+
+    @property
+    def question_ids(self):
+        return [question_id for question_id, _, _ in self.questions]
+
+    def resolve(self, question_id, answer_id):
+        """Return whether ``answer_id`` is correct, or ``None`` if it is not an answer of ``question_id``."""
+        row = self.answers.get(answer_id)
+        if row is None or row[0] != question_id:
+            return None
+        return row[2]
+
+    def answer(self, answer_id):
+        """Return an ``Answer`` instance built from the key, without a query."""
+        row = self.answers.get(answer_id)
+        if row is None:
+            return None
+        return Answer.from_db(DEFAULT_DB_ALIAS, ANSWER_FIELDS, (answer_id, *row))
+
+    def correct_answer(self, question_id):
+        """Return the first correct ``Answer`` of ``question_id``, like ``Question.get_correct_answer``."""
+        correct = self.correct.get(question_id)
+        return self.answer(correct[0]) if correct else None
+
+
+def compile_answer_key(fiche_id, version):
+    """Build the answer key of a fiche from the database."""
+    questions = list(
+        Question.objects.filter(fiche_id=fiche_id)
+        .order_by('order', 'created_at', 'id')
+        .values_list('id', 'points', 'order')
+    )
+    answers = OrderedDict(
+        (answer_id, tuple(rest))
+        for answer_id, *rest in Answer.objects.filter(question__fiche_id=fiche_id)
+        .order_by('order', 'created_at', 'id')
+        .values_list(*ANSWER_FIELDS)
+    )
+    return AnswerKey(fiche_id, version, questions, answers)
+
+
+def answer_key_cache_key(fiche_id, version):
+    return f'answer_key:{fiche_id}:{version}'
+
+
+def get_answer_key(fiche):
+    """Return the answer key of ``fiche`` at its current ``quiz_version``."""
+    cache_key = answer_key_cache_key(fiche.pk, fiche.quiz_version)
+    with _local_lock:
+        key = _local_keys.get(cache_key)
+        if key is not None:
+            _local_keys.move_to_end(cache_key)
+    if key is not None:
+        record_cache('answer_key_local', True)
+        return key
+    record_cache('answer_key_local', False)
+
+    key = cache.get(cache_key)
+    record_cache('answer_key', key is not None)
+    if key is None:
+        key = compile_answer_key(fiche.pk, fiche.quiz_version)
+        cache.set(cache_key, key, CACHE_TIMEOUT)
+
+    with _local_lock:
+        _local_keys[cache_key] = key
+        while len(_local_keys) > LOCAL_CACHE_SIZE:
+            _local_keys.popitem(last=False)
+    return key
+
+
+def bump_quiz_version(**filters):
+    """Invalidate the answer keys of the fiches matching ``filters``."""
+    Fiche.objects.filter(**filters).update(quiz_version=F('quiz_version') + 1)
@@ -0,0 +1,37 @@
+"""
+Cached quiz fragments.
+
+The body of the quiz form (every question with its answers) is identical
+for every student, so it is rendered once per ``Fiche.quiz_version`` and
+stored in the cache. Only the surrounding page, with its CSRF token and
+per-user parts, is rendered per request.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from souklou_project.metrics import record_cache
+
+QUIZ_BODY_CACHE_TIMEOUT = getattr(settings, 'QUIZ_BODY_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def quiz_body_cache_key(fiche_id, version):
+    return f'quiz_body:{fiche_id}:{version}'
+
+
+def get_quiz_body(fiche):
+    """Return the rendered questions and answers of ``fiche``'s quiz."""
+    cache_key = quiz_body_cache_key(fiche.pk, fiche.quiz_version)
+    body = cache.get(cache_key)
+    record_cache('quiz_body', body is not None)
+    if body is None:
+        questions = (
+            fiche.questions.all()
+            .prefetch_related('answers')
+            .order_by('order', 'created_at', 'id')
+        )
+        body = render_to_string('quizzes/take_quiz_body.html', {'questions': questions})
+        cache.set(cache_key, body, QUIZ_BODY_CACHE_TIMEOUT)
+    return mark_safe(body)
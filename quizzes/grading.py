@@ -0,0 +1,109 @@
+"""
+Set-based grading of quiz submissions.
+
+A submission is resolved against the fiche's compiled answer key, graded in
+memory and written back as one ``QuizAttempt`` plus one ``bulk_create`` of
+its ``QuestionAnswer`` rows, inside a single transaction.
+"""
+
+import logging
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from results.models import QuizAttempt, QuestionAnswer
+from .answer_key import get_answer_key
+
+logger = logging.getLogger(__name__)
+
+ANSWER_FIELD_PREFIX = 'question_'
+
+
+class GradingResult(NamedTuple):
+    attempt: QuizAttempt
+    query_count: int
+
+
+class QueryCounter:
+    """Execute wrapper counting the SQL statements sent to the database."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries(using=DEFAULT_DB_ALIAS):
+    """Count the queries executed on the ``using`` connection inside the block."""
+    counter = QueryCounter()
+    with connections[using].execute_wrapper(counter):
+        yield counter
+
+
+def extract_submitted_answers(data):
+    """Return a ``{question_id: answer_id}`` mapping from submitted form data."""
+    submitted = {}
+    for key, value in data.items():
+        if not key.startswith(ANSWER_FIELD_PREFIX):
+            continue
+        try:
+            submitted[int(key[len(ANSWER_FIELD_PREFIX):])] = int(value)
+        except (TypeError, ValueError):
+            continue
+    return submitted
+
+
+def compute_score(correct_answers, total_questions):
+    """Return the percentage score, rounded like ``QuizAttempt.score``."""
+    if not total_questions:
+        return Decimal('0.00')
+    return (Decimal(correct_answers * 100) / Decimal(total_questions)).quantize(Decimal('0.01'))
+
+
+def grade_submission(fiche, student, submitted, time_spent=None):
+    """
+    Grade a submission and record it as a single ``QuizAttempt``.
+
+    ``submitted`` maps question ids to the selected answer ids. Answers that
+    do not belong to the question they were submitted for are ignored.
+    """
+    with count_queries() as counter:
+        key = get_answer_key(fiche)
+
+        rows = []
+        correct_answers = 0
+        for question_id, answer_id in submitted.items():
+            is_correct = key.resolve(question_id, answer_id)
+            if is_correct is None:
+                continue
+            correct_answers += is_correct
+            rows.append(QuestionAnswer(
+                question_id=question_id,
+                selected_answer_id=answer_id,
+                is_correct=is_correct,
+            ))
+        total_questions = len(key)
+
+        with transaction.atomic():
+            attempt = QuizAttempt.objects.create(
+                student=student,
+                fiche=fiche,
+                score=compute_score(correct_answers, total_questions),
+                total_questions=total_questions,
+                correct_answers=correct_answers,
+                time_spent=time_spent,
+            )
+            for row in rows:
+                row.attempt = attempt
+            QuestionAnswer.objects.bulk_create(rows)
+
+    logger.info(
+        'Graded attempt %s on fiche %s: %d/%d correct in %d queries',
+        attempt.pk, fiche.pk, correct_answers, total_questions, counter.count,
+    )
+    return GradingResult(attempt, counter.count)
@@ -43,8 +43,9 @@ class Question(models.Model):
         return f"Q{self.order}: {self.text[:50]}..."
 
     def get_correct_answer(self):
-        """Return the correct answer for this question."""
-        return self.answers.filter(is_correct=True).first()
+        """Return the correct answer for this question, from the fiche's answer key."""
+        from .answer_key import get_answer_key
+        return get_answer_key(self.fiche).correct_answer(self.pk)
 
 
 class Answer(models.Model):
@@ -0,0 +1,43 @@
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Question, Answer
+from .answer_key import bump_quiz_version
+
+
+def _deleted_by_cascade(model, origin):
+    """Return whether a deletion of ``model`` rows comes from deleting a parent."""
+    if origin is None:
+        return False
+    return (origin.model if isinstance(origin, QuerySet) else type(origin)) is not model
+
+
+@receiver(pre_save, sender=Question)
+def remember_question_fiche(sender, instance, **kwargs):
+    """Remember the fiche a question belonged to before it is saved."""
+    if not instance._state.adding:
+        instance._previous_fiche_id = (
+            Question.objects.filter(pk=instance.pk).values_list('fiche_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, origin=None, **kwargs):
+    """Invalidate the answer key of the question's fiche (and its previous one)."""
+    if _deleted_by_cascade(Question, origin):
+        # The fiche itself is being deleted
+        return
+    fiche_ids = {instance.fiche_id, getattr(instance, '_previous_fiche_id', None)}
+    fiche_ids.discard(None)
+    bump_quiz_version(pk__in=fiche_ids)
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def answer_changed(sender, instance, origin=None, **kwargs):
+    """Invalidate the answer key of the answer's fiche."""
+    if _deleted_by_cascade(Answer, origin):
+        # Bumped once by question_changed, or the fiche is being deleted
+        return
+    bump_quiz_version(questions=instance.question_id)
@@ -1,3 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
 from django.test import TestCase
 
-# Create your tests here.
+from fiches.models import Fiche
+from . import answer_key
+from .answer_key import get_answer_key
+from .models import Question, Answer
+
+
+class AnswerKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        answer_key._local_keys.clear()
+        teacher = get_user_model().objects.create_user('teacher', password='x', role='teacher')
+        self.fiche = Fiche.objects.create(title='Fiche', description='d', content='c', author=teacher)
+        self.question = Question.objects.create(fiche=self.fiche, text='Q')
+        self.answer = Answer.objects.create(question=self.question, text='A', is_correct=True)
+
+    def test_full_save_of_a_stale_fiche_keeps_the_quiz_version(self):
+        stale = Fiche.objects.get(pk=self.fiche.pk)
+        self.assertEqual(len(get_answer_key(stale).answers), 1)
+
+        added = Answer.objects.create(question=self.question, text='B')
+        Fiche.objects.filter(pk=stale.pk).update(views_count=F('views_count') + 5)
+        stale.title = 'Renommée'
+        stale.save()
+
+        fiche = Fiche.objects.get(pk=stale.pk)
+        self.assertEqual(fiche.title, 'Renommée')
+        self.assertEqual(fiche.quiz_version, stale.quiz_version + 1)
+        self.assertEqual(fiche.views_count, 5)
+        self.assertIn(added.pk, get_answer_key(fiche).answers)
+
+    def test_cascade_deletes_bump_the_quiz_version_once(self):
+        Answer.objects.create(question=self.question, text='B')
+        Answer.objects.create(question=self.question, text='C')
+        version = Fiche.objects.get(pk=self.fiche.pk).quiz_version
+
+        self.answer.delete()
+        self.assertEqual(Fiche.objects.get(pk=self.fiche.pk).quiz_version, version + 1)
+
+        self.question.delete()
+        self.assertEqual(Fiche.objects.get(pk=self.fiche.pk).quiz_version, version + 2)
@@ -0,0 +1,42 @@
+"""
+Quiz timing without session writes.
+
+The quiz page carries a signed token recording when it was rendered, for
+which fiche and which student; the submission sends it back and the time
+spent is measured from it. Displaying a quiz therefore writes nothing,
+neither to the session nor to the database.
+"""
+
+from datetime import timedelta
+
+from django.core import signing
+from django.utils import timezone
+
+START_FIELD = 'quiz_started'
+
+SALT = 'quizzes.timing'
+
+# Tokens older than this are ignored rather than reporting absurd durations
+MAX_AGE = timedelta(days=1)
+
+
+def start_token(fiche, user):
+    """Return the signed start token of ``user``'s quiz on ``fiche``."""
+    return signing.dumps(
+        {'fiche': fiche.pk, 'user': user.pk, 'started': timezone.now().isoformat()},
+        salt=SALT,
+    )
+
+
+def time_spent_from(data, fiche, user):
+    """Return the time spent on the quiz submitted with ``data``, if its token is valid."""
+    token = data.get(START_FIELD)
+    if not token:
+        return None
+    try:
+        start = signing.loads(token, salt=SALT, max_age=MAX_AGE)
+    except signing.BadSignature:
+        return None
+    if start.get('fiche') != fiche.pk or start.get('user') != user.pk:
+        return None
+    return timezone.now() - timezone.datetime.fromisoformat(start['started'])
@@ -1,83 +1,47 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.utils import timezone
 from fiches.models import Fiche
-from .models import Question, Answer
+from .models import Question
 from .forms import QuestionForm, AnswerFormSet
-from results.models import QuizAttempt, QuestionAnswer
+from .answer_key import get_answer_key
+from .fragments import get_quiz_body
+from .grading import grade_submission, extract_submitted_answers
+from .timing import START_FIELD, start_token, time_spent_from
+from results.intake import enqueue_submission
 
 
 @login_required
 def take_quiz(request, fiche_pk):
     """View for students to take a quiz."""
     fiche = get_object_or_404(Fiche, pk=fiche_pk, is_published=True)
-    questions = fiche.questions.all().prefetch_related('answers').order_by('order')
+    key = get_answer_key(fiche)
 
-    if not questions.exists():
+    if not key:
         messages.warning(request, 'Cette fiche ne contient pas encore de quiz.')
         return redirect('fiches:detail', pk=fiche_pk)
 
     if request.method == 'POST':
-        # Process quiz submission
-        total_questions = questions.count()
-        correct_answers = 0
-        start_time = request.session.get('quiz_start_time')
-
-        # Create quiz attempt
-        attempt = QuizAttempt.objects.create(
-            student=request.user,
-            fiche=fiche,
-            score=0,  # Will be updated
-            total_questions=total_questions,
-            correct_answers=0,  # Will be updated
-        )
-
-        # Calculate time spent if available
-        if start_time:
-            time_spent = timezone.now() - timezone.datetime.fromisoformat(start_time)
-            attempt.time_spent = time_spent
-
-        # Process each answer
-        for question in questions:
-            answer_id = request.POST.get(f'question_{question.id}')
-            if answer_id:
-                try:
-                    selected_answer = Answer.objects.get(id=answer_id, question=question)
-                    is_correct = selected_answer.is_correct
-
-                    if is_correct:
-                        correct_answers += 1
-
-                    # Save the answer
-                    QuestionAnswer.objects.create(
-                        attempt=attempt,
-                        question=question,
-                        selected_answer=selected_answer,
-                        is_correct=is_correct
-                    )
-                except Answer.DoesNotExist:
-                    pass
-
-        # Update attempt with results
-        attempt.correct_answers = correct_answers
-        attempt.score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-        attempt.save()
-
-        # Clear session
-        if 'quiz_start_time' in request.session:
-            del request.session['quiz_start_time']
+        # Process quiz submission, timed from the token of the quiz page
+        time_spent = time_spent_from(request.POST, fiche, request.user)
+        submitted = extract_submitted_answers(request.POST)
+
+        if settings.GRADING_INTAKE:
+            submission = enqueue_submission(fiche, request.user, submitted, time_spent=time_spent)
+            return redirect('results:submission_status', pk=submission.pk)
+
+        attempt, _ = grade_submission(fiche, request.user, submitted, time_spent=time_spent)
 
         messages.success(request, f'Quiz terminé ! Votre score : {attempt.score:.1f}%')
         return redirect('results:attempt_detail', pk=attempt.pk)
 
-    # Store start time in session
-    if 'quiz_start_time' not in request.session:
-        request.session['quiz_start_time'] = timezone.now().isoformat()
-
     context = {
         'fiche': fiche,
-        'questions': questions,
+        'question_count': len(key),
+        'quiz_body': get_quiz_body(fiche),
+        'start_field': START_FIELD,
+        'start_token': start_token(fiche, request.user),
     }
     return render(request, 'quizzes/take_quiz.html', context)
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import QuizAttempt, QuestionAnswer
+from .models import QuizAttempt, QuestionAnswer, QuizSubmission
 
 
 class QuestionAnswerInline(admin.TabularInline):
@@ -8,12 +8,16 @@ class QuestionAnswerInline(admin.TabularInline):
     readonly_fields = ['question', 'selected_answer', 'is_correct', 'answered_at']
     can_delete = False
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('question', 'selected_answer')
+
 
 @admin.register(QuizAttempt)
 class QuizAttemptAdmin(admin.ModelAdmin):
     list_display = ['student', 'fiche', 'score', 'correct_answers', 'total_questions', 'passed', 'completed_at']
     list_filter = ['completed_at', 'fiche', 'student']
     search_fields = ['student__username', 'student__email', 'fiche__title']
+    list_select_related = ['student', 'fiche']
     ordering = ['-completed_at']
     readonly_fields = ['student', 'fiche', 'score', 'total_questions', 'correct_answers', 'time_spent', 'completed_at']
     inlines = [QuestionAnswerInline]
@@ -29,6 +33,7 @@ class QuestionAnswerAdmin(admin.ModelAdmin):
     list_display = ['attempt_short', 'question_short', 'selected_answer_short', 'is_correct', 'answered_at']
     list_filter = ['is_correct', 'answered_at']
     search_fields = ['attempt__student__username', 'question__text']
+    list_select_related = ['attempt__student', 'attempt__fiche', 'question', 'selected_answer']
     ordering = ['-answered_at']
     readonly_fields = ['attempt', 'question', 'selected_answer', 'is_correct', 'answered_at']
 
@@ -43,3 +48,13 @@ class QuestionAnswerAdmin(admin.ModelAdmin):
     def selected_answer_short(self, obj):
         return obj.selected_answer.text[:50] + '...' if len(obj.selected_answer.text) > 50 else obj.selected_answer.text
     selected_answer_short.short_description = 'Réponse'
+
+
+@admin.register(QuizSubmission)
+class QuizSubmissionAdmin(admin.ModelAdmin):
+    list_display = ['pk', 'student', 'fiche', 'status', 'worker', 'received_at', 'processed_at']
+    list_filter = ['status', 'received_at']
+    search_fields = ['student__username', 'fiche__title']
+    list_select_related = ['student', 'fiche']
+    ordering = ['-received_at']
+    readonly_fields = ['student', 'fiche', 'answers', 'time_spent', 'worker', 'attempt', 'error', 'received_at', 'claimed_at', 'processed_at']
@@ -0,0 +1,204 @@
+"""
+Item analysis of quiz questions.
+
+The attempt × question correctness matrix of a fiche is pulled from
+``QuestionAnswer`` in one streaming query straight into NumPy arrays, and
+every statistic is computed on whole columns:
+
+* difficulty: share of attempts answering the question correctly
+  (unanswered questions count as wrong);
+* discrimination: difference of that share between the top and bottom 27%
+  of attempts ranked by total score, plus the correlation between the
+  question and the rest of the quiz (item-rest correlation);
+* distractors: how often each answer was chosen among the attempts that
+  answered the question;
+* Cronbach's alpha of the whole quiz.
+
+Results are cached per fiche, keyed on its attempt count and quiz version,
+so they are only recomputed once new attempts come in.
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from quizzes.answer_key import get_answer_key
+from souklou_project.metrics import record_cache
+from quizzes.models import Question
+from .models import FicheStats, QuestionAnswer
+
+ITEM_ANALYSIS_CACHE_TIMEOUT = getattr(settings, 'ITEM_ANALYSIS_CACHE_TIMEOUT', 60 * 60 * 24)
+
+FETCH_CHUNK_SIZE = 5000
+
+# Share of attempts forming the upper and lower groups of the discrimination index
+GROUP_FRACTION = 0.27
+
+ROW_DTYPE = [('attempt', 'i8'), ('question', 'i8'), ('answer', 'i8'), ('correct', '?')]
+
+
+class AnswerChoice(NamedTuple):
+    answer_id: int
+    text: str
+    is_correct: bool
+    count: int
+    percent: float
+
+
+class ItemStats(NamedTuple):
+    question_id: int
+    order: int
+    text: str
+    answered: int
+    difficulty: float
+    discrimination: Optional[float]
+    item_rest_correlation: Optional[float]
+    choices: list
+
+    @property
+    def difficulty_percent(self):
+        return self.difficulty * 100
+
+    @property
+    def difficulty_label(self):
+        if self.difficulty >= 0.8:
+            return 'Facile'
+        if self.difficulty < 0.3:
+            return 'Difficile'
+        return 'Moyenne'
+
+    @property
+    def discrimination_label(self):
+        if self.discrimination is None:
+            return '—'
+        if self.discrimination >= 0.4:
+            return 'Excellente'
+        if self.discrimination >= 0.3:
+            return 'Bonne'
+        if self.discrimination >= 0.2:
+            return 'À revoir'
+        return 'Faible'
+
+
+class ItemAnalysis(NamedTuple):
+    fiche_id: int
+    attempt_count: int
+    question_count: int
+    mean_score: Optional[float]
+    alpha: Optional[float]
+    items: list
+
+
+def _float(value):
+    """Turn a NumPy scalar into a float, ``None`` when undefined."""
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def _positions(ids, values):
+    """Return the index of each of ``values`` in ``ids`` and whether it was found."""
+    if not len(ids):
+        return np.zeros(len(values), dtype='i8'), np.zeros(len(values), dtype=bool)
+    sorter = np.argsort(ids)
+    found = np.clip(np.searchsorted(ids, values, sorter=sorter), 0, len(ids) - 1)
+    positions = sorter[found]
+    return positions, ids[positions] == values
+
+
+def fetch_answers(fiche):
+    """Load the answers given on ``fiche`` as a structured array, in one streaming query."""
+    rows = (
+        QuestionAnswer.objects.filter(attempt__fiche=fiche)
+        .order_by()
+        .values_list('attempt_id', 'question_id', 'selected_answer_id', 'is_correct')
+    )
+    return np.fromiter(rows.iterator(chunk_size=FETCH_CHUNK_SIZE), dtype=ROW_DTYPE)
+
+
+def analyze_fiche(fiche):
+    """Compute the item analysis of ``fiche``'s quiz."""
+    key = get_answer_key(fiche)
+    question_ids = np.array(key.question_ids, dtype='i8')
+    answer_ids = np.array(list(key.answers), dtype='i8')
+    texts = dict(Question.objects.filter(fiche=fiche).values_list('pk', 'text'))
+
+    rows = fetch_answers(fiche)
+    question_pos, known = _positions(question_ids, rows['question'])
+    rows, question_pos = rows[known], question_pos[known]
+    attempts, attempt_pos = np.unique(rows['attempt'], return_inverse=True)
+    n, k = len(attempts), len(question_ids)
+
+    correct = np.zeros((n, k), dtype='f8')
+    correct[attempt_pos, question_pos] = rows['correct']
+    answered = np.bincount(question_pos, minlength=k)
+    answer_pos, known_answers = _positions(answer_ids, rows['answer'])
+    choice_counts = np.bincount(answer_pos[known_answers], minlength=len(answer_ids))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        difficulty = correct.mean(axis=0) if n else np.zeros(k)
+        totals = correct.sum(axis=1)
+
+        discrimination = np.full(k, np.nan)
+        if n >= 2:
+            group = max(1, int(round(GROUP_FRACTION * n)))
+            ranked = np.argsort(totals, kind='stable')
+            discrimination = correct[ranked[-group:]].mean(axis=0) - correct[ranked[:group]].mean(axis=0)
+
+        rest = totals[:, None] - correct
+        x = correct - correct.mean(axis=0) if n else correct
+        y = rest - rest.mean(axis=0) if n else rest
+        item_rest = (x * y).sum(axis=0) / np.sqrt((x * x).sum(axis=0) * (y * y).sum(axis=0))
+
+        alpha = np.nan
+        if n >= 2 and k >= 2:
+            total_variance = totals.var(ddof=1)
+            if total_variance > 0:
+                alpha = k / (k - 1) * (1 - correct.var(axis=0, ddof=1).sum() / total_variance)
+
+    choices = {question_id: [] for question_id in key.question_ids}
+    for position, (answer_id, (question_id, text, is_correct, _)) in enumerate(key.answers.items()):
+        choices[question_id].append((answer_id, text, is_correct, int(choice_counts[position])))
+
+    items = []
+    for position, (question_id, _, order) in enumerate(key.questions):
+        respondents = int(answered[position])
+        items.append(ItemStats(
+            question_id=question_id,
+            order=order,
+            text=texts.get(question_id, ''),
+            answered=respondents,
+            difficulty=float(difficulty[position]),
+            discrimination=_float(discrimination[position]),
+            item_rest_correlation=_float(item_rest[position]),
+            choices=[
+                AnswerChoice(answer_id, text, is_correct, count, count * 100 / respondents if respondents else 0.0)
+                for answer_id, text, is_correct, count in choices[question_id]
+            ],
+        ))
+
+    return ItemAnalysis(
+        fiche_id=fiche.pk,
+        attempt_count=n,
+        question_count=k,
+        mean_score=_float(totals.mean() * 100 / k) if n and k else None,
+        alpha=_float(alpha),
+        items=items,
+    )
+
+
+def item_analysis_cache_key(fiche, attempt_count):
+    return f'item_analysis:{fiche.pk}:{fiche.quiz_version}:{attempt_count}'
+
+
+def get_item_analysis(fiche):
+    """Return the item analysis of ``fiche``, computed again only when attempts were added."""
+    attempt_count = FicheStats.objects.filter(fiche=fiche).values_list('attempt_count', flat=True).first() or 0
+    cache_key = item_analysis_cache_key(fiche, attempt_count)
+    analysis = cache.get(cache_key)
+    record_cache('item_analysis', analysis is not None)
+    if analysis is None:
+        analysis = analyze_fiche(fiche)
+        cache.set(cache_key, analysis, ITEM_ANALYSIS_CACHE_TIMEOUT)
+    return analysis
@@ -0,0 +1,231 @@
+"""
+Streaming exports of fiche results.
+
+Rows are read with chunked ``.iterator()`` queries over ``values_list()``
+projections and encoded on the fly, so exporting hundreds of thousands of
+attempts keeps memory flat: neither model instances nor the whole file are
+ever held in memory. XLSX files are zipped as they are generated (the zip
+format allows it when sizes are written after each member). Text that a
+spreadsheet would evaluate as a formula (student names are free text) is
+prefixed with a quote.
+"""
+
+import codecs
+import csv
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from quizzes.answer_key import get_answer_key
+from quizzes.models import Question
+from .models import PASS_MARK, QuizAttempt, QuestionAnswer
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Leading characters that make spreadsheet applications read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+ATTEMPT_HEADER = [
+    'Tentative', 'Identifiant', 'Prénom', 'Nom', 'Score (%)', 'Bonnes réponses',
+    'Questions', 'Temps (s)', 'Date', 'Résultat',
+]
+ANSWER_HEADER = [
+    'Tentative', 'Identifiant', 'Date', 'Question', 'Ordre', 'Énoncé', 'Réponse choisie', 'Correcte',
+]
+
+
+def _result(score):
+    return 'Réussi' if score >= PASS_MARK else 'Échoué'
+
+
+def _date(moment):
+    return timezone.localtime(moment).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _seconds(duration):
+    return round(duration.total_seconds(), 3) if duration is not None else None
+
+
+def _text(value):
+    """Quote text a spreadsheet would otherwise evaluate as a formula."""
+    if value and value[0] in FORMULA_PREFIXES:
+        return "'" + value
+    return value
+
+
+def attempt_rows(fiche):
+    """Yield the header and one row per attempt on ``fiche``, oldest first."""
+    yield ATTEMPT_HEADER
+    attempts = (
+        QuizAttempt.objects.filter(fiche=fiche)
+        .order_by('completed_at', 'pk')
+        .values_list(
+            'pk', 'student__username', 'student__first_name', 'student__last_name', 'score',
+            'correct_answers', 'total_questions', 'time_spent', 'completed_at',
+        )
+    )
+    for pk, username, first_name, last_name, score, correct, total, time_spent, completed_at in attempts.iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ):
+        yield [
+            pk, _text(username), _text(first_name), _text(last_name), score, correct, total,
+            _seconds(time_spent), _date(completed_at), _result(score),
+        ]
+
+
+def answer_rows(fiche):
+    """Yield the header and one row per answered question of every attempt on ``fiche``."""
+    yield ANSWER_HEADER
+    questions = dict(
+        Question.objects.filter(fiche=fiche).values_list('pk', 'text')
+    )
+    key = get_answer_key(fiche)
+    answers = (
+        QuestionAnswer.objects.filter(attempt__fiche=fiche)
+        .order_by('attempt__completed_at', 'attempt_id', 'question__order', 'question_id')
+        .values_list(
+            'attempt_id', 'attempt__student__username', 'attempt__completed_at',
+            'question_id', 'question__order', 'selected_answer_id', 'is_correct',
+        )
+    )
+    for attempt_id, username, completed_at, question_id, order, answer_id, is_correct in answers.iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ):
+        answer = key.answer(answer_id)
+        yield [
+            attempt_id, _text(username), _date(completed_at), question_id, order,
+            _text(questions.get(question_id, '')), _text(answer.text) if answer else '',
+            'Oui' if is_correct else 'Non',
+        ]
+
+
+class _Echo:
+    """File-like object handing back what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Encode ``rows`` as CSV, one chunk per row."""
+    writer = csv.writer(_Echo())
+    # BOM so that spreadsheet applications detect UTF-8
+    yield codecs.BOM_UTF8.decode()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class _Sink:
+    """Unseekable byte stream collecting what the zip writer produces until drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+# Characters XML 1.0 does not allow, even escaped
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{sheets}</Types>'
+)
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}</Relationships>'
+)
+_SHEET_RELATIONSHIP = (
+    '<Relationship Id="rId{n}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{n}.xml"/>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+
+def _cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c t="n"><v>{value}</v></c>'
+    text = escape(_ILLEGAL_XML.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def stream_xlsx(sheets):
+    """
+    Encode ``sheets``, a list of ``(name, rows)`` pairs, as an XLSX workbook.
+
+    Cells are written as inline strings, booleans and plain numbers.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        numbers = range(1, len(sheets) + 1)
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+            sheets=''.join(_SHEET_CONTENT_TYPE.format(n=n) for n in numbers),
+        ))
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(sheets=''.join(
+            f'<sheet name="{escape(name[:31])}" sheetId="{n}" r:id="rId{n}"/>'
+            for n, (name, _) in zip(numbers, sheets)
+        )))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(
+            sheets=''.join(_SHEET_RELATIONSHIP.format(n=n) for n in numbers),
+        ))
+        yield sink.drain()
+
+        for n, (_, rows) in zip(numbers, sheets):
+            with archive.open(f'xl/worksheets/sheet{n}.xml', 'w', force_zip64=True) as sheet:
+                sheet.write(_SHEET_START.encode())
+                for count, row in enumerate(rows, 1):
+                    sheet.write(('<row>' + ''.join(_cell(value) for value in row) + '</row>').encode())
+                    if count % EXPORT_CHUNK_SIZE == 0:
+                        yield sink.drain()
+                sheet.write(_SHEET_END.encode())
+            yield sink.drain()
+    yield sink.drain()
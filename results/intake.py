@@ -0,0 +1,121 @@
+"""
+Submission intake queue.
+
+When ``GRADING_INTAKE`` is enabled, ``take_quiz`` only appends the raw
+submission to the ``QuizSubmission`` table and returns. The
+``grade_submissions`` management command runs a pool of workers that claim
+pending submissions in batches and grade them into ``QuizAttempt`` rows.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from quizzes.grading import grade_submission
+from .models import QuizSubmission
+
+logger = logging.getLogger(__name__)
+
+# Submissions claimed for longer than this are considered abandoned by a
+# crashed worker and handed out again.
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+LAG_SAMPLE_SIZE = 100
+
+
+def enqueue_submission(fiche, student, submitted, time_spent=None):
+    """Persist a raw submission for the grading workers."""
+    return QuizSubmission.objects.create(
+        fiche=fiche,
+        student=student,
+        answers={str(question_id): answer_id for question_id, answer_id in submitted.items()},
+        time_spent=time_spent,
+    )
+
+
+def claim_batch(worker, batch_size):
+    """Claim up to ``batch_size`` pending submissions, oldest first, for ``worker``."""
+    ids = list(
+        QuizSubmission.objects.filter(status=QuizSubmission.STATUS_PENDING)
+        .order_by('received_at')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    # Another worker may claim the same rows first: only the rows this
+    # update actually flipped belong to us.
+    QuizSubmission.objects.filter(pk__in=ids, status=QuizSubmission.STATUS_PENDING).update(
+        status=QuizSubmission.STATUS_PROCESSING,
+        worker=worker,
+        claimed_at=timezone.now(),
+    )
+    return list(
+        QuizSubmission.objects.filter(
+            pk__in=ids, status=QuizSubmission.STATUS_PROCESSING, worker=worker,
+        ).select_related('fiche', 'student')
+    )
+
+
+def process_batch(submissions):
+    """Grade claimed submissions, committing the whole batch at once."""
+    with transaction.atomic():
+        for submission in submissions:
+            try:
+                with transaction.atomic():
+                    attempt, _ = grade_submission(
+                        submission.fiche,
+                        submission.student,
+                        submission.submitted_answers,
+                        time_spent=submission.time_spent,
+                    )
+            except Exception as exc:
+                logger.exception('Grading of submission %s failed', submission.pk)
+                submission.status = QuizSubmission.STATUS_FAILED
+                submission.error = str(exc)
+            else:
+                submission.status = QuizSubmission.STATUS_GRADED
+                submission.attempt = attempt
+            submission.processed_at = timezone.now()
+
+        QuizSubmission.objects.bulk_update(
+            submissions, ['status', 'attempt', 'error', 'processed_at'],
+        )
+    return len(submissions)
+
+
+def release_stale_claims(timeout=CLAIM_TIMEOUT):
+    """Hand submissions claimed by a crashed worker back to the queue."""
+    return QuizSubmission.objects.filter(
+        status=QuizSubmission.STATUS_PROCESSING,
+        claimed_at__lt=timezone.now() - timeout,
+    ).update(status=QuizSubmission.STATUS_PENDING, worker='', claimed_at=None)
+
+
+def intake_metrics():
+    """
+    Return backpressure metrics of the intake queue.
+
+    ``queue_depth`` counts submissions waiting for a worker, ``oldest_pending_age``
+    is how long the oldest of them has been waiting and ``grading_lag`` is the
+    average time between reception and grading over the last graded submissions.
+    All durations are in seconds.
+    """
+    now = timezone.now()
+    pending = QuizSubmission.objects.filter(status=QuizSubmission.STATUS_PENDING)
+    oldest = pending.aggregate(oldest=Min('received_at'))['oldest']
+    recent = (
+        QuizSubmission.objects.filter(status=QuizSubmission.STATUS_GRADED)
+        .order_by('-processed_at')
+        .values_list('received_at', 'processed_at')[:LAG_SAMPLE_SIZE]
+    )
+    lags = [(processed_at - received_at).total_seconds() for received_at, processed_at in recent]
+    return {
+        'queue_depth': pending.count(),
+        'processing': QuizSubmission.objects.filter(status=QuizSubmission.STATUS_PROCESSING).count(),
+        'failed': QuizSubmission.objects.filter(status=QuizSubmission.STATUS_FAILED).count(),
+        'oldest_pending_age': (now - oldest).total_seconds() if oldest else 0.0,
+        'grading_lag': sum(lags) / len(lags) if lags else 0.0,
+    }
@@ -0,0 +1,371 @@
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from fiches.counters import flush_view_counts
+from fiches.facets import refresh_category_facets
+from fiches.models import Fiche, normalize_category, DIFFICULTY_CHOICES
+from fiches.search import get_search_backend, reset_search_backends
+from quizzes.grading import count_queries, compute_score
+from quizzes.models import Question, Answer
+from results.models import QuizAttempt, QuestionAnswer
+from results.stats import rebuild_fiche_stats, rebuild_student_stats, rebuild_teacher_stats
+from souklou_project.benchmarking import throwaway_database, summarize, timed
+
+WORDS = (
+    'algèbre équation fonction dérivée intégrale géométrie théorème probabilité statistique '
+    'électricité énergie mécanique optique chimie molécule réaction atome cellule génétique '
+    'évolution écosystème histoire révolution empire république guerre traité géographie '
+    'climat population économie littérature poésie roman théâtre grammaire conjugaison '
+    'vocabulaire philosophie morale liberté vérité conscience élève méthode exercice résumé'
+).split()
+
+CATEGORIES = ['Mathématiques', 'Physique', 'Chimie', 'SVT', 'Histoire', 'Géographie', 'Français', 'Philosophie']
+
+# Relative weights of the replayed scenarios
+MIX = {
+    'fiche_list': 30,
+    'fiche_detail': 30,
+    'take_quiz': 15,
+    'my_results': 15,
+    'fiche_results': 10,
+}
+
+BATCH_SIZE = 1000
+
+
+def git_revision():
+    """Return the commit the tree is at, if it is a git checkout."""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic school into a throwaway database, replay a realistic mix of "
+        "student and teacher requests through the test client and report latency, "
+        "throughput and queries per endpoint as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=10, help='Number of teachers to seed.')
+        parser.add_argument('--fiches', type=int, default=20, help='Published fiches per teacher.')
+        parser.add_argument('--questions', type=int, default=10, help='Questions per fiche.')
+        parser.add_argument('--answers', type=int, default=4, help='Answers per question.')
+        parser.add_argument('--students', type=int, default=200, help='Number of students to seed.')
+        parser.add_argument('--attempts', type=int, default=5000, help='Historical attempts to seed.')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests to replay.')
+        parser.add_argument('--warmup', type=int, default=100, help='Requests replayed before measuring.')
+        parser.add_argument('--sessions', type=int, default=20, help='Logged in students replaying requests.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the data and the request mix.')
+        parser.add_argument('--output', help='Also write the report to this file.')
+        parser.add_argument('--compare', help='Report of an earlier run to compare against.')
+
+    def handle(self, *args, **options):
+        if options['teachers'] < 1 or options['fiches'] < 1 or options['students'] < 1:
+            raise CommandError('At least one teacher, fiche and student is needed.')
+        if options['questions'] < 1 or options['answers'] < 2:
+            raise CommandError('Quizzes need at least one question and two answers.')
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+
+        with throwaway_database():
+            reset_search_backends()
+            try:
+                report = self._run(options)
+            finally:
+                # Buffered views belong to the throwaway database
+                flush_view_counts()
+                reset_search_backends()
+
+        if baseline is not None:
+            report['comparison'] = self._compare(baseline, report)
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
+
+    def _run(self, options):
+        rng = random.Random(options['seed'])
+        seed_time, school = timed(self._seed, rng, options)
+        report = {
+            'revision': git_revision(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            'options': {
+                name: options[name]
+                for name in ('teachers', 'fiches', 'questions', 'answers', 'students', 'attempts',
+                             'requests', 'warmup', 'sessions', 'seed')
+            },
+            'seed_s': round(seed_time, 3),
+        }
+        # The test client talks to the full middleware and handler stack
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            replay = Replay(rng, school, options['sessions'])
+            replay.run(options['warmup'])
+            replay.reset()
+            start = time.perf_counter()
+            replay.run(options['requests'])
+            wall_time = time.perf_counter() - start
+
+        report['wall_s'] = round(wall_time, 3)
+        report['throughput_rps'] = round(options['requests'] / wall_time, 1) if wall_time else 0.0
+        report['endpoints'] = replay.summary()
+        return report
+
+    def _seed(self, rng, options):
+        User = get_user_model()
+
+        def text(words):
+            return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+        unusable_password = make_password(None)
+        teachers = User.objects.bulk_create(
+            User(username=f'teacher{index}', role='teacher', password=unusable_password)
+            for index in range(options['teachers'])
+        )
+        students = User.objects.bulk_create(
+            (
+                User(username=f'student{index}', role='student', password=unusable_password)
+                for index in range(options['students'])
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        fiches = []
+        for teacher in teachers:
+            for _ in range(options['fiches']):
+                category = rng.choice(CATEGORIES)
+                fiches.append(Fiche(
+                    title=text(4).capitalize(),
+                    description=text(20),
+                    content=text(200),
+                    category=category,
+                    category_key=normalize_category(category),
+                    difficulty_level=rng.choice(DIFFICULTY_CHOICES)[0],
+                    author=teacher,
+                ))
+        fiches = Fiche.objects.bulk_create(fiches, batch_size=BATCH_SIZE)
+
+        questions = Question.objects.bulk_create(
+            (
+                Question(fiche=fiche, text=text(12).capitalize() + ' ?', order=order)
+                for fiche in fiches
+                for order in range(options['questions'])
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        answers = []
+        for question in questions:
+            correct = rng.randrange(options['answers'])
+            answers.extend(
+                Answer(question=question, text=text(3), is_correct=order == correct, order=order)
+                for order in range(options['answers'])
+            )
+        answers = Answer.objects.bulk_create(answers, batch_size=BATCH_SIZE)
+
+        # {fiche_id: [(question_id, [(answer_id, is_correct), ...]), ...]}
+        quizzes = defaultdict(list)
+        choices = defaultdict(list)
+        for answer in answers:
+            choices[answer.question_id].append((answer.pk, answer.is_correct))
+        for question in questions:
+            quizzes[question.fiche_id].append((question.pk, choices[question.pk]))
+
+        self._seed_attempts(rng, options['attempts'], students, fiches, quizzes)
+
+        rebuild_fiche_stats()
+        rebuild_student_stats()
+        rebuild_teacher_stats()
+        refresh_category_facets()
+        get_search_backend().rebuild()
+        return School(teachers, students, fiches, quizzes)
+
+    def _seed_attempts(self, rng, count, students, fiches, quizzes):
+        """Seed ``count`` graded attempts spread over the last 90 days."""
+        now = timezone.now()
+        for start in range(0, count, BATCH_SIZE):
+            attempts, selections = [], []
+            for _ in range(min(BATCH_SIZE, count - start)):
+                fiche = rng.choice(fiches)
+                # Stronger students pick the correct answer more often
+                skill = rng.random()
+                selected = [
+                    (question_id, next(pk for pk, correct in answers if correct)
+                     if rng.random() < skill else rng.choice(answers)[0])
+                    for question_id, answers in quizzes[fiche.pk]
+                ]
+                correct_ids = {
+                    pk for _, answers in quizzes[fiche.pk] for pk, correct in answers if correct
+                }
+                correct_answers = sum(answer_id in correct_ids for _, answer_id in selected)
+                attempts.append(QuizAttempt(
+                    student=rng.choice(students),
+                    fiche=fiche,
+                    score=compute_score(correct_answers, len(selected)),
+                    total_questions=len(selected),
+                    correct_answers=correct_answers,
+                    time_spent=timedelta(seconds=rng.randint(60, 1800)),
+                ))
+                selections.append([(q, a, a in correct_ids) for q, a in selected])
+
+            attempts = QuizAttempt.objects.bulk_create(attempts)
+            # completed_at is auto_now_add: spread the history afterwards
+            for attempt in attempts:
+                attempt.completed_at = now - timedelta(seconds=rng.randint(0, 90 * 24 * 3600))
+            QuizAttempt.objects.bulk_update(attempts, ['completed_at'])
+            QuestionAnswer.objects.bulk_create(
+                (
+                    QuestionAnswer(
+                        attempt=attempt, question_id=question_id,
+                        selected_answer_id=answer_id, is_correct=is_correct,
+                    )
+                    for attempt, selected in zip(attempts, selections)
+                    for question_id, answer_id, is_correct in selected
+                ),
+                batch_size=BATCH_SIZE,
+            )
+
+    def _compare(self, baseline, report):
+        """Return the relative change of the latencies and query counts against ``baseline``."""
+        comparison = {'baseline_revision': baseline.get('revision')}
+        for name, current in report['endpoints'].items():
+            previous = baseline.get('endpoints', {}).get(name)
+            if not previous:
+                continue
+            comparison[name] = {
+                metric: _change(previous.get(metric), current[metric])
+                for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean')
+            }
+        comparison['throughput_rps'] = _change(baseline.get('throughput_rps'), report['throughput_rps'])
+        return comparison
+
+
+def _change(before, after):
+    """Return ``after`` relative to ``before`` as a signed percentage."""
+    if not before:
+        return None
+    return f'{(after - before) * 100 / before:+.1f}%'
+
+
+class School:
+    """The seeded users and fiches the replay picks from."""
+
+    def __init__(self, teachers, students, fiches, quizzes):
+        self.teachers = teachers
+        self.students = students
+        self.fiches = fiches
+        self.quizzes = quizzes
+        self.fiches_by_teacher = defaultdict(list)
+        for fiche in fiches:
+            self.fiches_by_teacher[fiche.author_id].append(fiche)
+
+
+class Replay:
+    """Replays the scenarios of ``MIX`` and records each request."""
+
+    def __init__(self, rng, school, sessions):
+        self.rng = rng
+        self.school = school
+        self.students = [
+            self._login(student) for student in rng.sample(school.students, min(sessions, len(school.students)))
+        ]
+        self.teachers = [(teacher, self._login(teacher)) for teacher in school.teachers]
+        self.scenarios = list(MIX)
+        self.weights = list(MIX.values())
+        self.reset()
+
+    @staticmethod
+    def _login(user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def reset(self):
+        self.samples = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def run(self, count):
+        for _ in range(count):
+            scenario = self.rng.choices(self.scenarios, self.weights)[0]
+            getattr(self, scenario)()
+
+    def request(self, endpoint, client, method, path, data=None):
+        with count_queries() as counter:
+            elapsed, response = timed(getattr(client, method), path, data)
+        self.samples[endpoint].append(elapsed)
+        self.queries[endpoint].append(counter.count)
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+        return response
+
+    def summary(self):
+        summary = {}
+        for endpoint in sorted(self.samples):
+            samples, queries = self.samples[endpoint], self.queries[endpoint]
+            summary[endpoint] = {
+                **summarize(samples),
+                'throughput_rps': round(len(samples) / sum(samples), 1) if sum(samples) else 0.0,
+                'queries_mean': round(sum(queries) / len(queries), 2),
+                'queries_max': max(queries),
+                'errors': self.errors[endpoint],
+            }
+        return summary
+
+    def fiche_list(self):
+        roll = self.rng.random()
+        if roll < 0.2:
+            data = {'search': self.rng.choice(WORDS)}
+        elif roll < 0.5:
+            data = {'category': self.rng.choice(CATEGORIES)}
+        else:
+            data = {}
+        self.request('fiche_list', self.rng.choice(self.students), 'get', reverse('fiches:list'), data)
+
+    def fiche_detail(self):
+        fiche = self.rng.choice(self.school.fiches)
+        self.request('fiche_detail', self.rng.choice(self.students), 'get', reverse('fiches:detail', args=[fiche.pk]))
+
+    def take_quiz(self):
+        client = self.rng.choice(self.students)
+        fiche = self.rng.choice(self.school.fiches)
+        path = reverse('quizzes:take_quiz', args=[fiche.pk])
+        self.request('take_quiz', client, 'get', path)
+        data = {
+            f'question_{question_id}': self.rng.choice(answers)[0]
+            for question_id, answers in self.school.quizzes[fiche.pk]
+        }
+        self.request('take_quiz_submit', client, 'post', path, data)
+
+    def my_results(self):
+        self.request('my_results', self.rng.choice(self.students), 'get', reverse('results:my_results'))
+
+    def fiche_results(self):
+        teacher, client = self.rng.choice(self.teachers)
+        fiche = self.rng.choice(self.school.fiches_by_teacher[teacher.pk])
+        self.request('fiche_results', client, 'get', reverse('results:fiche_results', args=[fiche.pk]))
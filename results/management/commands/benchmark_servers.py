@@ -0,0 +1,232 @@
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from fiches.facets import refresh_category_facets
+from fiches.models import Fiche, normalize_category
+from quizzes.models import Question
+from souklou_project.benchmarking import summarize
+
+HOST = '127.0.0.1'
+
+# Server module needed by each mode
+SERVERS = {
+    'wsgi': 'gunicorn',
+    'asgi': 'uvicorn',
+}
+
+# Seconds a server is given to answer its first request
+STARTUP_TIMEOUT = 30.0
+
+# Seconds of slow traffic before the probes start
+SETTLE_DELAY = 1.0
+
+# Slow clients send their request in pieces this many seconds apart
+TRICKLE_STEP = 0.25
+
+
+def server_command(mode, workers, port):
+    if mode == 'wsgi':
+        return [
+            sys.executable, '-m', 'gunicorn', 'souklou_project.wsgi:application',
+            '--workers', str(workers), '--bind', f'{HOST}:{port}',
+            '--timeout', '120', '--log-level', 'warning',
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', 'souklou_project.asgi:application',
+        '--workers', str(workers), '--host', HOST, '--port', str(port),
+        '--no-access-log', '--log-level', 'warning',
+    ]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+async def fetch(port, path, trickle=0.0):
+    """GET ``path`` over a new connection, sending the request over ``trickle`` seconds, and return the status."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        request = (
+            f'GET {path} HTTP/1.1\r\nHost: {HOST}\r\n'
+            'User-Agent: benchmark_servers\r\nConnection: close\r\n\r\n'
+        ).encode()
+        pieces = max(1, round(trickle / TRICKLE_STEP))
+        size = -(-len(request) // pieces)
+        for start in range(0, len(request), size):
+            writer.write(request[start:start + size])
+            await writer.drain()
+            if trickle:
+                await asyncio.sleep(trickle / pieces)
+        response = await reader.read()
+    finally:
+        writer.close()
+    try:
+        return int(response.split(b' ', 2)[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a throwaway SQLite database with gunicorn sync workers (WSGI) and with "
+        "uvicorn (ASGI), hold slow client connections open against the public pages and "
+        "report how the probe requests sent meanwhile fare, as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes.')
+        parser.add_argument(
+            '--clients', type=int, action='append',
+            help='Concurrent slow clients (repeat to measure several levels; 10, 50 and 200 by default).',
+        )
+        parser.add_argument('--slow-seconds', type=float, default=5.0, help='Seconds a slow client takes to send its request.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds each level is run.')
+        parser.add_argument('--probes', type=int, default=40, help='Probe requests sent during each level.')
+        parser.add_argument('--probe-timeout', type=float, default=5.0, help='Seconds after which a probe counts as failed.')
+        parser.add_argument('--fiches', type=int, default=50, help='Fiches to seed.')
+        parser.add_argument(
+            '--mode', choices=sorted(SERVERS), action='append',
+            help='Server to run (both by default).',
+        )
+        # Internal mode of the spawned process
+        parser.add_argument('--prepare', action='store_true', help='(internal) Create the database.')
+
+    def handle(self, *args, **options):
+        if options['prepare']:
+            return self._prepare(options)
+        modes = options['mode'] or list(SERVERS)
+        missing = [SERVERS[mode] for mode in modes if importlib.util.find_spec(SERVERS[mode]) is None]
+        if missing:
+            raise CommandError(f'Install {" and ".join(missing)} to run this benchmark.')
+        levels = options['clients'] or [10, 50, 200]
+
+        report = {
+            name: options[name] for name in ('workers', 'slow_seconds', 'duration', 'probes', 'probe_timeout')
+        }
+        with tempfile.TemporaryDirectory(prefix='souklou-servers-') as directory:
+            env = {
+                **os.environ,
+                'DATABASE_URL': f'sqlite:///{Path(directory) / "servers.sqlite3"}',
+                'DEBUG': 'False',
+                'ALLOWED_HOSTS': HOST,
+                'QUERY_BUDGET_ENABLED': 'False',
+                'METRICS_DIR': '',
+            }
+            command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_servers', '--prepare']
+            if subprocess.run([*command, '--fiches', str(options['fiches'])], env=env).returncode:
+                raise CommandError('Preparing the database failed.')
+            paths = ['/', '/fiches/', *(f'/fiches/{pk}/' for pk in range(1, min(options['fiches'], 10) + 1))]
+
+            for mode in modes:
+                report[mode] = {}
+                port = free_port()
+                server = subprocess.Popen(server_command(mode, options['workers'], port), env=env, cwd=settings.BASE_DIR)
+                try:
+                    asyncio.run(self._wait_for(server, port))
+                    for clients in levels:
+                        report[mode][str(clients)] = asyncio.run(self._measure(port, paths, clients, options))
+                finally:
+                    server.terminate()
+                    try:
+                        server.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        server.kill()
+                        server.wait()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    async def _wait_for(self, server, port):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'The server exited with status {server.returncode}.')
+            try:
+                if await fetch(port, '/') == 200:
+                    return
+            except OSError:
+                pass
+            await asyncio.sleep(0.2)
+        raise CommandError('The server did not start in time.')
+
+    async def _measure(self, port, paths, clients, options):
+        """Keep ``clients`` slow connections busy and time the probes sent meanwhile."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + options['duration']
+        slow = {'completed': 0, 'failed': 0}
+
+        async def slow_client(index):
+            while loop.time() < deadline:
+                try:
+                    status = await fetch(port, paths[index % len(paths)], trickle=options['slow_seconds'])
+                except OSError:
+                    status = 0
+                slow['completed' if status == 200 else 'failed'] += 1
+
+        probe = {'samples': [], 'timeouts': 0, 'errors': 0}
+
+        async def probe_request(index):
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(fetch(port, paths[index % len(paths)]), options['probe_timeout'])
+            except asyncio.TimeoutError:
+                probe['timeouts'] += 1
+                return
+            except OSError:
+                status = 0
+            if status == 200:
+                probe['samples'].append(time.perf_counter() - start)
+            else:
+                probe['errors'] += 1
+
+        tasks = [asyncio.create_task(slow_client(index)) for index in range(clients)]
+        await asyncio.sleep(SETTLE_DELAY)
+        interval = max(0.0, options['duration'] - SETTLE_DELAY - options['probe_timeout']) / max(1, options['probes'])
+        probes = []
+        for index in range(options['probes']):
+            probes.append(asyncio.create_task(probe_request(index)))
+            await asyncio.sleep(interval)
+        await asyncio.gather(*probes)
+        await asyncio.gather(*tasks)
+
+        return {
+            'probe_latency': summarize(probe['samples']),
+            'probe_success_rate': round(len(probe['samples']) / options['probes'], 3) if options['probes'] else 0.0,
+            'probe_timeouts': probe['timeouts'],
+            'probe_errors': probe['errors'],
+            'slow_requests_completed': slow['completed'],
+            'slow_requests_failed': slow['failed'],
+        }
+
+    def _prepare(self, options):
+        """Migrate the throwaway database and seed published fiches with a few questions each."""
+        call_command('migrate', verbosity=0)
+        teacher = get_user_model().objects.create(username='teacher', role='teacher', password=make_password(None))
+        fiches = Fiche.objects.bulk_create(
+            Fiche(
+                title=f'Fiche {index}', description='Une fiche de révision.', content='Contenu ' * 200,
+                category=f'Catégorie {index % 5}', category_key=normalize_category(f'Catégorie {index % 5}'),
+                author=teacher, is_published=True,
+            )
+            for index in range(options['fiches'])
+        )
+        Question.objects.bulk_create(
+            Question(fiche=fiche, text=f'Question {order}', order=order)
+            for fiche in fiches
+            for order in range(5)
+        )
+        refresh_category_facets()
@@ -0,0 +1,119 @@
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from fiches.counters import flush_view_counts
+from fiches.models import Fiche, normalize_category
+from quizzes.models import Question
+from results.models import FicheStats
+from souklou_project import metrics
+from souklou_project.benchmarking import throwaway_database, summarize
+
+# page: (URL, user)
+PAGES = {
+    'home': ('/', None),
+    'fiche_list': ('/fiches/', None),
+    'dashboard_student': ('/dashboard/', 'student'),
+    'dashboard_teacher': ('/dashboard/', 'teacher'),
+}
+
+
+def render_time():
+    """Return the seconds spent rendering templates so far, cards (rendered by the views) included."""
+    return sum(
+        samples[-2]
+        for (name, _), samples in metrics.registry.histograms.items()
+        if name == 'template_render_duration_seconds'
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the pages listing fiche cards (home, fiche list, student and teacher "
+        "dashboards) with and without the card fragment cache and report request and "
+        "template render times per page as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fiches', type=int, default=200, help='Published fiches to seed.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests measured per page and mode.')
+        parser.add_argument('--warmup', type=int, default=10, help='Requests per page and mode before measuring.')
+
+    def handle(self, *args, **options):
+        report = {
+            'debug': settings.DEBUG,
+            'cached_template_loader': not settings.DEBUG,
+            'fiches': options['fiches'],
+            'requests': options['requests'],
+        }
+        with throwaway_database():
+            try:
+                users = self._seed(options)
+                # The page cache would answer the anonymous pages without rendering them.
+                with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], PAGE_CACHE_SECONDS=0):
+                    for mode, enabled in (('uncached', False), ('cached', True)):
+                        cache.clear()
+                        with override_settings(FICHE_CARD_CACHE=enabled):
+                            report[mode] = {
+                                page: self._measure(page, users, options) for page in PAGES
+                            }
+            finally:
+                flush_view_counts()
+
+        for page in PAGES:
+            before, after = report['uncached'][page]['render'], report['cached'][page]['render']
+            if before['mean_ms']:
+                report.setdefault('render_speedup', {})[page] = round(before['mean_ms'] / after['mean_ms'], 2)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _seed(self, options):
+        User = get_user_model()
+        teacher = User.objects.create(username='teacher', role='teacher', password=make_password(None))
+        student = User.objects.create(username='student', role='student', password=make_password(None))
+        fiches = Fiche.objects.bulk_create(
+            Fiche(
+                title=f'Fiche {index}',
+                description=' '.join(['Une fiche de révision sur un chapitre du programme.'] * 4),
+                content='Contenu',
+                category=f'Catégorie {index % 8}',
+                category_key=normalize_category(f'Catégorie {index % 8}'),
+                difficulty_level=('beginner', 'intermediate', 'advanced')[index % 3],
+                views_count=index * 7,
+                author=teacher,
+                is_published=True,
+            )
+            for index in range(options['fiches'])
+        )
+        Question.objects.bulk_create(
+            Question(fiche=fiche, text=f'Question {order}', order=order)
+            for fiche in fiches
+            for order in range(5)
+        )
+        FicheStats.objects.bulk_create(FicheStats(fiche=fiche, attempt_count=fiche.pk % 50) for fiche in fiches)
+        return {'teacher': teacher, 'student': student}
+
+    def _measure(self, page, users, options):
+        url, user = PAGES[page]
+        client = Client()
+        if user:
+            client.force_login(users[user])
+        for _ in range(options['warmup']):
+            client.get(url)
+
+        requests, renders = [], []
+        for _ in range(options['requests']):
+            rendered = render_time()
+            start = time.perf_counter()
+            response = client.get(url)
+            requests.append(time.perf_counter() - start)
+            renders.append(render_time() - rendered)
+            if response.status_code != 200:
+                raise CommandError(f'{url} answered {response.status_code}.')
+        return {'request': summarize(requests), 'render': summarize(renders)}
@@ -0,0 +1,105 @@
+from datetime import date
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+
+def probe_value(field):
+    """Return a value of the type of ``field`` to build probe queries with."""
+    if isinstance(field, models.ForeignKey):
+        field = field.target_field
+    if isinstance(field, models.BooleanField):
+        return False
+    if isinstance(field, models.DateTimeField):
+        return timezone.now()
+    if isinstance(field, models.DateField):
+        return date.today()
+    if isinstance(field, (models.IntegerField, models.AutoField, models.DecimalField, models.FloatField)):
+        return 0
+    return ''
+
+
+def probe_queryset(model, index, using):
+    """
+    Return the query ``index`` is meant to serve: equality on its leading
+    fields, ordered by its last field.
+    """
+    *leading, (last, order) = index.fields_orders
+    queryset = model._default_manager.using(using).filter(**{
+        name: probe_value(model._meta.get_field(name)) for name, _ in leading
+    })
+    return queryset.order_by(('-' if order == 'DESC' else '') + last)[:1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that migrations are applied, that every Meta.indexes index exists in the "
+        "database and that the query planner uses it for the query it was declared for."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database to check.')
+        parser.add_argument(
+            '--usage', action='store_true',
+            help='Also report how often each index was scanned (PostgreSQL statistics).',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        connection = connections[using]
+        problems = []
+
+        executor = MigrationExecutor(connection)
+        pending = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if pending:
+            names = ', '.join(f'{migration.app_label}.{migration.name}' for migration, _ in pending)
+            problems.append(f'Unapplied migrations: {names}')
+
+        usage = self._index_usage(connection) if options['usage'] else {}
+        for model in apps.get_models():
+            indexes = [index for index in model._meta.indexes if index.fields and not index.condition]
+            if not indexes:
+                continue
+            table = model._meta.db_table
+            with connection.cursor() as cursor:
+                existing = set(connection.introspection.get_constraints(cursor, table))
+            for index in indexes:
+                label = f'{model._meta.label} {index.name} ({", ".join(index.fields)})'
+                if index.name not in existing:
+                    problems.append(f'{label}: missing from {table}')
+                    continue
+                plan = self._plan(connection, probe_queryset(model, index, using))
+                if index.name not in plan:
+                    problems.append(f'{label}: not used by the planner\n    {plan}')
+                    continue
+                line = f'OK {label}'
+                if index.name in usage:
+                    line += f': {usage[index.name]} scans'
+                self.stdout.write(line)
+
+        if problems:
+            for problem in problems:
+                self.stderr.write(problem)
+            raise CommandError(f'{len(problems)} index problem(s) found.')
+        self.stdout.write(self.style.SUCCESS('All declared indexes exist and are used.'))
+
+    def _plan(self, connection, queryset):
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+        with transaction.atomic(using=connection.alias):
+            # Tables small enough to be read in one go are scanned
+            # sequentially whatever their indexes: only ask whether the
+            # index can serve the query.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+
+    def _index_usage(self, connection):
+        if connection.vendor != 'postgresql':
+            return {}
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT indexrelname, idx_scan FROM pg_stat_user_indexes')
+            return dict(cursor.fetchall())
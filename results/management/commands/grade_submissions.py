@@ -0,0 +1,68 @@
+import json
+import os
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from results.intake import claim_batch, process_batch, release_stale_claims, intake_metrics
+
+
+class Command(BaseCommand):
+    help = "Grade the quiz submissions waiting in the intake queue with a pool of workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker threads.')
+        parser.add_argument('--batch-size', type=int, default=50, help='Submissions claimed per batch.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once, then exit.')
+        parser.add_argument('--stats', action='store_true', help='Print the queue metrics as JSON and exit.')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(intake_metrics(), indent=2))
+            return
+
+        released = release_stale_claims()
+        if released:
+            self.stdout.write(f"{released} soumission(s) abandonnée(s) remise(s) en file.")
+
+        stop = threading.Event()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f"{prefix}:{index}", options, stop),
+                name=f"grader-{index}",
+                daemon=True,
+            )
+            for index in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS(json.dumps(intake_metrics())))
+
+    def work(self, worker, options, stop):
+        """Claim and grade batches until stopped, or until the queue is empty with --once."""
+        try:
+            while not stop.is_set():
+                batch = claim_batch(worker, options['batch_size'])
+                if batch:
+                    process_batch(batch)
+                    self.stdout.write(f"[{worker}] {len(batch)} soumission(s) corrigée(s)")
+                elif options['once']:
+                    break
+                else:
+                    stop.wait(options['interval'])
+        finally:
+            connection.close()
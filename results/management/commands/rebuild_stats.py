@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from results.stats import rebuild_fiche_stats, rebuild_student_stats, rebuild_teacher_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the incrementally maintained statistics from the attempts table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fiche', type=int, action='append', dest='fiches', help='Only rebuild this fiche (repeatable).')
+        parser.add_argument('--student', type=int, action='append', dest='students', help='Only rebuild this student (repeatable).')
+        parser.add_argument('--teacher', type=int, action='append', dest='teachers', help='Only rebuild this teacher (repeatable).')
+
+    def handle(self, *args, **options):
+        fiches, students, teachers = options['fiches'], options['students'], options['teachers']
+        everything = not (fiches or students or teachers)
+        if fiches or everything:
+            count = rebuild_fiche_stats(fiches)
+            self.stdout.write(self.style.SUCCESS(f"Statistiques recalculées pour {count} fiche(s)."))
+        if students or everything:
+            count = rebuild_student_stats(students)
+            self.stdout.write(self.style.SUCCESS(f"Statistiques recalculées pour {count} élève(s)."))
+        if teachers or everything:
+            count = rebuild_teacher_stats(teachers)
+            self.stdout.write(self.style.SUCCESS(f"Statistiques recalculées pour {count} enseignant(s)."))
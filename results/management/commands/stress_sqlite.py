@@ -0,0 +1,180 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, transaction
+
+from fiches.models import Fiche
+from quizzes.grading import grade_submission
+from quizzes.models import Question, Answer
+from results.models import FicheStats, QuizAttempt
+from souklou_project.benchmarking import summarize
+
+PROFILES = {
+    'stock': '0',
+    'tuned': '1',
+}
+
+# Seconds the workers are given to start before the run begins together
+STARTUP_DELAY = 5.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a throwaway SQLite file with concurrent quiz submissions from several "
+        "processes, with Django's stock SQLite settings and with the tuned profile, and "
+        "report submit throughput and lock error rates as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent worker processes.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds each profile is run.')
+        parser.add_argument('--reads', type=int, default=2, help='Result page reads between submissions.')
+        parser.add_argument('--fiches', type=int, default=20, help='Fiches to seed.')
+        parser.add_argument('--questions', type=int, default=10, help='Questions per fiche.')
+        parser.add_argument(
+            '--atomic-requests', action='store_true',
+            help='Run each submission in one transaction with its reads, like ATOMIC_REQUESTS does.',
+        )
+        parser.add_argument(
+            '--profile', choices=sorted(PROFILES), action='append',
+            help='Profile to run (both by default).',
+        )
+        # Internal modes of the spawned processes
+        parser.add_argument('--prepare', action='store_true', help='(internal) Create the database.')
+        parser.add_argument('--worker', type=int, help='(internal) Run as the worker of this index.')
+        parser.add_argument('--start-at', type=float, help='(internal) Time the workers start at.')
+
+    def handle(self, *args, **options):
+        if options['prepare']:
+            return self._prepare(options)
+        if options['worker'] is not None:
+            return self._work(options)
+        if options['workers'] < 1:
+            raise CommandError('At least one worker is needed.')
+
+        report = {
+            name: options[name] for name in ('workers', 'duration', 'reads', 'fiches', 'questions', 'atomic_requests')
+        }
+        for profile in options['profile'] or PROFILES:
+            with tempfile.TemporaryDirectory(prefix='souklou-stress-') as directory:
+                report[profile] = self._run(profile, Path(directory) / 'stress.sqlite3', options)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _spawn(self, env, *arguments, **kwargs):
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'stress_sqlite', *arguments]
+        return subprocess.Popen(command, env=env, **kwargs)
+
+    def _run(self, profile, path, options):
+        env = {
+            **os.environ,
+            'DATABASE_URL': f'sqlite:///{path}',
+            'DATABASE_SQLITE_TUNING': PROFILES[profile],
+            'DATABASE_ROLE': 'worker',
+            'QUERY_BUDGET_ENABLED': 'False',
+        }
+        shared = ['--fiches', str(options['fiches']), '--questions', str(options['questions'])]
+        if self._spawn(env, '--prepare', *shared).wait():
+            raise CommandError(f'Preparing the {profile} database failed.')
+
+        start_at = time.time() + STARTUP_DELAY
+        workers = [
+            self._spawn(
+                env, '--worker', str(index), '--start-at', str(start_at),
+                '--duration', str(options['duration']), '--reads', str(options['reads']), *shared,
+                *(['--atomic-requests'] if options['atomic_requests'] else []),
+                stdout=subprocess.PIPE,
+            )
+            for index in range(options['workers'])
+        ]
+        results = [json.loads(worker.communicate()[0]) for worker in workers]
+
+        submitted = sum(result['submitted'] for result in results)
+        attempted = submitted + sum(result['failed'] for result in results)
+        locked = sum(result['locked'] for result in results)
+        operations = attempted + sum(result['reads'] for result in results)
+        return {
+            'submits': submitted,
+            'submits_per_s': round(submitted / options['duration'], 1),
+            'failed_submits': attempted - submitted,
+            'lock_errors': locked,
+            'lock_error_rate': round(locked / operations, 4) if operations else 0.0,
+            'submit_latency': summarize([sample for result in results for sample in result['samples']]),
+        }
+
+    def _prepare(self, options):
+        """Migrate the throwaway database and seed one teacher's fiches and one student per worker."""
+        call_command('migrate', verbosity=0)
+        rng = random.Random(0)
+        User = get_user_model()
+        teacher = User.objects.create(username='teacher', role='teacher', password=make_password(None))
+        fiches = Fiche.objects.bulk_create(
+            Fiche(title=f'Fiche {index}', description='', content='', category='Stress', author=teacher)
+            for index in range(options['fiches'])
+        )
+        questions = Question.objects.bulk_create(
+            Question(fiche=fiche, text=f'Question {order}', order=order)
+            for fiche in fiches
+            for order in range(options['questions'])
+        )
+        answers = []
+        for question in questions:
+            correct = rng.randrange(4)
+            answers.extend(
+                Answer(question=question, text=f'Réponse {order}', is_correct=order == correct, order=order)
+                for order in range(4)
+            )
+        Answer.objects.bulk_create(answers)
+
+    def _work(self, options):
+        """Submit quizzes until the run is over and print what happened as JSON."""
+        rng = random.Random(options['worker'])
+        student = get_user_model().objects.create(
+            username=f'student{options["worker"]}', role='student', password=make_password(None),
+        )
+        fiches = list(Fiche.objects.all())
+        choices = {}
+        for question_id, answer_id in Answer.objects.values_list('question_id', 'pk'):
+            choices.setdefault(question_id, []).append(answer_id)
+        quizzes = {}
+        for fiche_id, question_id in Question.objects.values_list('fiche_id', 'pk'):
+            quizzes.setdefault(fiche_id, []).append(question_id)
+
+        result = {'submitted': 0, 'failed': 0, 'reads': 0, 'locked': 0, 'samples': []}
+        time.sleep(max(0.0, options['start_at'] - time.time()))
+        deadline = options['start_at'] + options['duration']
+        while time.time() < deadline:
+            for _ in range(options['reads']):
+                try:
+                    list(QuizAttempt.objects.filter(student=student).order_by('-completed_at')[:10])
+                    list(FicheStats.objects.filter(fiche__in=rng.sample(fiches, min(5, len(fiches)))))
+                except OperationalError as exc:
+                    result['locked'] += 'locked' in str(exc)
+                result['reads'] += 1
+
+            fiche_id = rng.choice(fiches).pk
+            submitted = {question_id: rng.choice(choices[question_id]) for question_id in quizzes[fiche_id]}
+            start = time.perf_counter()
+            try:
+                with transaction.atomic() if options['atomic_requests'] else nullcontext():
+                    # Like take_quiz: look the fiche up, then grade
+                    fiche = Fiche.objects.get(pk=fiche_id)
+                    grade_submission(fiche, student, submitted)
+            except OperationalError as exc:
+                result['failed'] += 1
+                result['locked'] += 'locked' in str(exc)
+            else:
+                result['submitted'] += 1
+                result['samples'].append(time.perf_counter() - start)
+        self.stdout.write(json.dumps(result))
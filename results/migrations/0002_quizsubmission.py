@@ -0,0 +1,124 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fiches", "0002_fiche_quiz_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("results", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuizSubmission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "answers",
+                    models.JSONField(
+                        default=dict,
+                        help_text="Identifiant de la réponse choisie pour chaque question",
+                        verbose_name="Réponses soumises",
+                    ),
+                ),
+                (
+                    "time_spent",
+                    models.DurationField(
+                        blank=True, null=True, verbose_name="Temps passé"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("processing", "En cours de correction"),
+                            ("graded", "Corrigée"),
+                            ("failed", "Échec"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "worker",
+                    models.CharField(
+                        blank=True, max_length=100, verbose_name="Correcteur"
+                    ),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Erreur")),
+                (
+                    "received_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date de réception"
+                    ),
+                ),
+                (
+                    "claimed_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Date de prise en charge"
+                    ),
+                ),
+                (
+                    "processed_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Date de correction"
+                    ),
+                ),
+                (
+                    "attempt",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="submission",
+                        to="results.quizattempt",
+                        verbose_name="Tentative",
+                    ),
+                ),
+                (
+                    "fiche",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="submissions",
+                        to="fiches.fiche",
+                        verbose_name="Fiche",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="quiz_submissions",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Élève",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Soumission de quiz",
+                "verbose_name_plural": "Soumissions de quiz",
+                "ordering": ["received_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "received_at"],
+                        name="results_qui_status_37a9fc_idx",
+                    )
+                ],
+            },
+        ),
+    ]
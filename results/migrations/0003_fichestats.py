@@ -0,0 +1,108 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_fiche_stats(apps, schema_editor):
+    QuizAttempt = apps.get_model("results", "QuizAttempt")
+    FicheStats = apps.get_model("results", "FicheStats")
+    rows = (
+        QuizAttempt.objects.order_by()
+        .values("fiche_id")
+        .annotate(
+            attempt_count=models.Count("id"),
+            student_count=models.Count("student", distinct=True),
+            score_sum=models.Sum("score"),
+            pass_count=models.Count("id", filter=models.Q(score__gte=50)),
+            min_score=models.Min("score"),
+            max_score=models.Max("score"),
+            last_attempt_at=models.Max("completed_at"),
+        )
+    )
+    FicheStats.objects.bulk_create([FicheStats(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fiches", "0002_fiche_quiz_version"),
+        ("results", "0002_quizsubmission"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FicheStats",
+            fields=[
+                (
+                    "fiche",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="fiches.fiche",
+                        verbose_name="Fiche",
+                    ),
+                ),
+                (
+                    "attempt_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre de tentatives"
+                    ),
+                ),
+                (
+                    "student_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre d'élèves"
+                    ),
+                ),
+                (
+                    "score_sum",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Somme des scores",
+                    ),
+                ),
+                (
+                    "pass_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Tentatives réussies"
+                    ),
+                ),
+                (
+                    "min_score",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=5,
+                        null=True,
+                        verbose_name="Score minimum (%)",
+                    ),
+                ),
+                (
+                    "max_score",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=5,
+                        null=True,
+                        verbose_name="Score maximum (%)",
+                    ),
+                ),
+                (
+                    "last_attempt_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Dernière tentative"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Statistiques de fiche",
+                "verbose_name_plural": "Statistiques des fiches",
+            },
+        ),
+        migrations.RunPython(backfill_fiche_stats, migrations.RunPython.noop),
+    ]
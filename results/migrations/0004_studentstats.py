@@ -0,0 +1,157 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_student_stats(apps, schema_editor):
+    QuizAttempt = apps.get_model("results", "QuizAttempt")
+    StudentStats = apps.get_model("results", "StudentStats")
+    StudentFicheStats = apps.get_model("results", "StudentFicheStats")
+    attempts = QuizAttempt.objects.order_by()
+    StudentStats.objects.bulk_create(
+        [
+            StudentStats(**row)
+            for row in attempts.values("student_id").annotate(
+                attempt_count=models.Count("id"),
+                score_sum=models.Sum("score"),
+                pass_count=models.Count("id", filter=models.Q(score__gte=50)),
+                last_activity_at=models.Max("completed_at"),
+            )
+        ],
+        batch_size=500,
+    )
+    StudentFicheStats.objects.bulk_create(
+        [
+            StudentFicheStats(**row)
+            for row in attempts.values("student_id", "fiche_id").annotate(
+                attempt_count=models.Count("id"),
+                best_score=models.Max("score"),
+                last_attempt_at=models.Max("completed_at"),
+            )
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("fiches", "0002_fiche_quiz_version"),
+        ("results", "0003_fichestats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StudentStats",
+            fields=[
+                (
+                    "student",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="quiz_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Élève",
+                    ),
+                ),
+                (
+                    "attempt_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre de tentatives"
+                    ),
+                ),
+                (
+                    "score_sum",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Somme des scores",
+                    ),
+                ),
+                (
+                    "pass_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Tentatives réussies"
+                    ),
+                ),
+                (
+                    "last_activity_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Dernière activité"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Statistiques d'élève",
+                "verbose_name_plural": "Statistiques des élèves",
+            },
+        ),
+        migrations.CreateModel(
+            name="StudentFicheStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "attempt_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre de tentatives"
+                    ),
+                ),
+                (
+                    "best_score",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=5,
+                        verbose_name="Meilleur score (%)",
+                    ),
+                ),
+                (
+                    "last_attempt_at",
+                    models.DateTimeField(verbose_name="Dernière tentative"),
+                ),
+                (
+                    "fiche",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="student_stats",
+                        to="fiches.fiche",
+                        verbose_name="Fiche",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fiche_stats",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Élève",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Statistiques d'élève par fiche",
+                "verbose_name_plural": "Statistiques d'élèves par fiche",
+                "indexes": [
+                    models.Index(
+                        fields=["student", "-last_attempt_at"],
+                        name="results_stu_student_150668_idx",
+                    )
+                ],
+                "unique_together": {("student", "fiche")},
+            },
+        ),
+        migrations.RunPython(backfill_student_stats, migrations.RunPython.noop),
+    ]
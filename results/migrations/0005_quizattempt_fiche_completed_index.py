@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("results", "0004_studentstats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="quizattempt",
+            index=models.Index(
+                fields=["fiche", "-completed_at"], name="results_qui_fiche_i_1b2870_idx"
+            ),
+        ),
+    ]
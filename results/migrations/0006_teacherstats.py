@@ -0,0 +1,177 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:28
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def backfill_teacher_stats(apps, schema_editor):
+    Fiche = apps.get_model("fiches", "Fiche")
+    Question = apps.get_model("quizzes", "Question")
+    QuizAttempt = apps.get_model("results", "QuizAttempt")
+    TeacherStats = apps.get_model("results", "TeacherStats")
+    TeacherDailyStats = apps.get_model("results", "TeacherDailyStats")
+    rows = {}
+    for teacher_id, fiche_count in (
+        Fiche.objects.order_by().values_list("author_id").annotate(models.Count("id"))
+    ):
+        rows[teacher_id] = TeacherStats(teacher_id=teacher_id, fiche_count=fiche_count)
+    for teacher_id, question_count in (
+        Question.objects.order_by()
+        .values_list("fiche__author_id")
+        .annotate(models.Count("id"))
+    ):
+        rows.setdefault(
+            teacher_id, TeacherStats(teacher_id=teacher_id)
+        ).question_count = question_count
+    attempts = QuizAttempt.objects.order_by()
+    for row in attempts.values("fiche__author_id").annotate(
+        attempt_count=models.Count("id"),
+        score_sum=models.Sum("score"),
+        pass_count=models.Count("id", filter=models.Q(score__gte=50)),
+        last_attempt_at=models.Max("completed_at"),
+    ):
+        teacher_id = row.pop("fiche__author_id")
+        stats = rows.setdefault(teacher_id, TeacherStats(teacher_id=teacher_id))
+        for field, value in row.items():
+            setattr(stats, field, value)
+    TeacherStats.objects.bulk_create(rows.values(), batch_size=500)
+    TeacherDailyStats.objects.bulk_create(
+        [
+            TeacherDailyStats(**row)
+            for row in attempts.values(
+                teacher_id=models.F("fiche__author_id"),
+                day=TruncDate("completed_at"),
+            ).annotate(
+                attempt_count=models.Count("id"),
+                score_sum=models.Sum("score"),
+                pass_count=models.Count("id", filter=models.Q(score__gte=50)),
+            )
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("accounts", "0001_initial"),
+        ("fiches", "0002_fiche_quiz_version"),
+        ("quizzes", "0001_initial"),
+        ("results", "0005_quizattempt_fiche_completed_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TeacherStats",
+            fields=[
+                (
+                    "teacher",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="teaching_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Enseignant",
+                    ),
+                ),
+                (
+                    "fiche_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre de fiches"
+                    ),
+                ),
+                (
+                    "question_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre de questions"
+                    ),
+                ),
+                (
+                    "attempt_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre de tentatives"
+                    ),
+                ),
+                (
+                    "score_sum",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Somme des scores",
+                    ),
+                ),
+                (
+                    "pass_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Tentatives réussies"
+                    ),
+                ),
+                (
+                    "last_attempt_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Dernière tentative"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Statistiques d'enseignant",
+                "verbose_name_plural": "Statistiques des enseignants",
+            },
+        ),
+        migrations.CreateModel(
+            name="TeacherDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="Jour")),
+                (
+                    "attempt_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre de tentatives"
+                    ),
+                ),
+                (
+                    "score_sum",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Somme des scores",
+                    ),
+                ),
+                (
+                    "pass_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Tentatives réussies"
+                    ),
+                ),
+                (
+                    "teacher",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="teaching_daily_stats",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Enseignant",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Statistiques journalières d'enseignant",
+                "verbose_name_plural": "Statistiques journalières des enseignants",
+                "unique_together": {("teacher", "day")},
+            },
+        ),
+        migrations.RunPython(backfill_teacher_stats, migrations.RunPython.noop),
+    ]
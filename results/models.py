@@ -3,6 +3,9 @@ from django.conf import settings
 from fiches.models import Fiche
 from quizzes.models import Question, Answer
 
+# Minimum score (%) for an attempt to count as passed
+PASS_MARK = 50
+
 
 class QuizAttempt(models.Model):
     """Model representing a student's attempt at a quiz."""
@@ -47,6 +50,7 @@ class QuizAttempt(models.Model):
         indexes = [
             models.Index(fields=['student', '-completed_at']),
             models.Index(fields=['fiche', '-score']),
+            models.Index(fields=['fiche', '-completed_at']),
         ]
 
     def __str__(self):
@@ -55,7 +59,7 @@ class QuizAttempt(models.Model):
     @property
     def passed(self):
         """Check if the student passed (score >= 50%)."""
-        return self.score >= 50
+        return self.score >= PASS_MARK
 
 
 class QuestionAnswer(models.Model):
@@ -93,3 +97,330 @@ class QuestionAnswer(models.Model):
     def __str__(self):
         status = "✓" if self.is_correct else "✗"
         return f"{status} {self.question.text[:30]}..."
+
+
+class QuizSubmission(models.Model):
+    """Model representing a raw quiz submission waiting to be graded."""
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_GRADED = 'graded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'En attente'),
+        (STATUS_PROCESSING, 'En cours de correction'),
+        (STATUS_GRADED, 'Corrigée'),
+        (STATUS_FAILED, 'Échec'),
+    ]
+
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='quiz_submissions',
+        verbose_name='Élève'
+    )
+    fiche = models.ForeignKey(
+        Fiche,
+        on_delete=models.CASCADE,
+        related_name='submissions',
+        verbose_name='Fiche'
+    )
+    answers = models.JSONField(
+        default=dict,
+        verbose_name='Réponses soumises',
+        help_text='Identifiant de la réponse choisie pour chaque question'
+    )
+    time_spent = models.DurationField(
+        null=True,
+        blank=True,
+        verbose_name='Temps passé'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name='Statut'
+    )
+    worker = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Correcteur'
+    )
+    attempt = models.OneToOneField(
+        QuizAttempt,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='submission',
+        verbose_name='Tentative'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Erreur'
+    )
+    received_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de réception'
+    )
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Date de prise en charge'
+    )
+    processed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Date de correction'
+    )
+
+    class Meta:
+        verbose_name = 'Soumission de quiz'
+        verbose_name_plural = 'Soumissions de quiz'
+        ordering = ['received_at']
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} - {self.get_status_display()}"
+
+    @property
+    def submitted_answers(self):
+        """Return the submitted answers as a ``{question_id: answer_id}`` mapping."""
+        return {int(question_id): int(answer_id) for question_id, answer_id in self.answers.items()}
+
+
+class FicheStats(models.Model):
+    """Model holding the attempt statistics of a fiche, maintained incrementally."""
+
+    fiche = models.OneToOneField(
+        Fiche,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Fiche'
+    )
+    attempt_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Nombre de tentatives'
+    )
+    student_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Nombre d'élèves"
+    )
+    score_sum = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='Somme des scores'
+    )
+    pass_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Tentatives réussies'
+    )
+    min_score = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name='Score minimum (%)'
+    )
+    max_score = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name='Score maximum (%)'
+    )
+    last_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Dernière tentative'
+    )
+
+    class Meta:
+        verbose_name = 'Statistiques de fiche'
+        verbose_name_plural = 'Statistiques des fiches'
+
+    def __str__(self):
+        return f"{self.fiche_id} - {self.attempt_count} tentative(s)"
+
+    @property
+    def average_score(self):
+        return self.score_sum / self.attempt_count if self.attempt_count else 0
+
+    @property
+    def pass_rate(self):
+        return self.pass_count / self.attempt_count * 100 if self.attempt_count else 0
+
+
+class StudentStats(models.Model):
+    """Model holding the quiz statistics of a student, maintained incrementally."""
+
+    student = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='quiz_stats',
+        verbose_name='Élève'
+    )
+    attempt_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Nombre de tentatives'
+    )
+    score_sum = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='Somme des scores'
+    )
+    pass_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Tentatives réussies'
+    )
+    last_activity_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Dernière activité'
+    )
+
+    class Meta:
+        verbose_name = "Statistiques d'élève"
+        verbose_name_plural = 'Statistiques des élèves'
+
+    def __str__(self):
+        return f"{self.student_id} - {self.attempt_count} tentative(s)"
+
+    @property
+    def average_score(self):
+        return self.score_sum / self.attempt_count if self.attempt_count else 0
+
+
+class StudentFicheStats(models.Model):
+    """Model holding the best score of a student on a fiche, maintained incrementally."""
+
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='fiche_stats',
+        verbose_name='Élève'
+    )
+    fiche = models.ForeignKey(
+        Fiche,
+        on_delete=models.CASCADE,
+        related_name='student_stats',
+        verbose_name='Fiche'
+    )
+    attempt_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Nombre de tentatives'
+    )
+    best_score = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        verbose_name='Meilleur score (%)'
+    )
+    last_attempt_at = models.DateTimeField(
+        verbose_name='Dernière tentative'
+    )
+
+    class Meta:
+        verbose_name = "Statistiques d'élève par fiche"
+        verbose_name_plural = "Statistiques d'élèves par fiche"
+        unique_together = ['student', 'fiche']
+        indexes = [
+            models.Index(fields=['student', '-last_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.fiche_id} - {self.best_score}%"
+
+    @property
+    def passed(self):
+        return self.best_score >= PASS_MARK
+
+
+class TeacherStats(models.Model):
+    """Model holding the analytics of a teacher's fiches, maintained incrementally."""
+
+    teacher = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='teaching_stats',
+        verbose_name='Enseignant'
+    )
+    fiche_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Nombre de fiches'
+    )
+    question_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Nombre de questions'
+    )
+    attempt_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Nombre de tentatives'
+    )
+    score_sum = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='Somme des scores'
+    )
+    pass_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Tentatives réussies'
+    )
+    last_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Dernière tentative'
+    )
+
+    class Meta:
+        verbose_name = "Statistiques d'enseignant"
+        verbose_name_plural = 'Statistiques des enseignants'
+
+    def __str__(self):
+        return f"{self.teacher_id} - {self.fiche_count} fiche(s)"
+
+    @property
+    def average_score(self):
+        return self.score_sum / self.attempt_count if self.attempt_count else 0
+
+
+class TeacherDailyStats(models.Model):
+    """Model holding the attempts made on a teacher's fiches per day, for rolling windows."""
+
+    teacher = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='teaching_daily_stats',
+        verbose_name='Enseignant'
+    )
+    day = models.DateField(
+        verbose_name='Jour'
+    )
+    attempt_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Nombre de tentatives'
+    )
+    score_sum = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='Somme des scores'
+    )
+    pass_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Tentatives réussies'
+    )
+
+    class Meta:
+        verbose_name = "Statistiques journalières d'enseignant"
+        verbose_name_plural = 'Statistiques journalières des enseignants'
+        unique_together = ['teacher', 'day']
+
+    def __str__(self):
+        return f"{self.teacher_id} - {self.day} - {self.attempt_count} tentative(s)"
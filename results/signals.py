@@ -0,0 +1,55 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from fiches.models import Fiche
+from quizzes.models import Question
+from .models import QuizAttempt
+from .stats import (
+    record_attempt, record_fiche_created, record_question_created, record_question_deleted, record_question_moved,
+    schedule_rebuild,
+)
+
+
+@receiver(post_save, sender=QuizAttempt)
+def attempt_created(sender, instance, created, raw=False, **kwargs):
+    """Fold a new attempt into the statistics, in the attempt's transaction."""
+    if created and not raw:
+        record_attempt(instance)
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def attempt_deleted(sender, instance, using=None, **kwargs):
+    """Recompute the statistics touched by the attempt once the deletion is committed."""
+    schedule_rebuild(fiche_ids=[instance.fiche_id], student_ids=[instance.student_id], using=using)
+
+
+@receiver(post_save, sender=Fiche)
+def fiche_created(sender, instance, created, raw=False, **kwargs):
+    """Count a new fiche in its author's rollup."""
+    if created and not raw:
+        record_fiche_created(instance)
+
+
+@receiver(post_delete, sender=Fiche)
+def fiche_deleted(sender, instance, using=None, **kwargs):
+    """Recompute the author's rollup once the deletion is committed."""
+    schedule_rebuild(teacher_ids=[instance.author_id], using=using)
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, raw=False, **kwargs):
+    """Count a new question, or a question moved to another fiche, in its fiche author's rollup."""
+    if raw:
+        return
+    if created:
+        record_question_created(instance)
+        return
+    # Remembered by quizzes.signals.remember_question_fiche
+    previous_fiche_id = getattr(instance, '_previous_fiche_id', None)
+    if previous_fiche_id is not None and previous_fiche_id != instance.fiche_id:
+        record_question_moved(instance, previous_fiche_id)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    """Uncount a deleted question from its fiche author's rollup."""
+    record_question_deleted(instance)
@@ -0,0 +1,404 @@
+"""
+Incrementally maintained attempt statistics.
+
+Every new ``QuizAttempt`` is folded into the ``FicheStats`` row of its fiche,
+into the ``StudentStats``/``StudentFicheStats`` rollups of its student and
+into the ``TeacherStats``/``TeacherDailyStats`` rollups of the fiche's
+author, in the same transaction, so statistics headers and dashboards are
+primary-key lookups however many attempts accumulate. New fiches and
+questions, and questions moved to another author's fiche, are counted in
+``TeacherStats`` the same way. Deleted attempts (one by one, or in cascade
+with their fiche or student) are collected per transaction, and the
+affected rows are recomputed once, when the deletion commits;
+``manage.py rebuild_stats`` rebuilds everything from the attempts table.
+"""
+
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, FloatField, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least, TruncDate
+from django.utils import timezone
+
+from fiches.models import Fiche
+from quizzes.models import Question
+from .models import (
+    PASS_MARK, QuizAttempt, FicheStats, StudentStats, StudentFicheStats, TeacherStats, TeacherDailyStats,
+)
+
+MOST_FAILED_LIMIT = 5
+
+
+def _decimal(value):
+    return Value(value, output_field=DecimalField(max_digits=5, decimal_places=2))
+
+
+def _latest(field, moment):
+    return Greatest(Coalesce(field, Value(moment)), Value(moment))
+
+
+def _fold(model, lookup, updates, initial):
+    """
+    Apply ``updates`` to the row matching ``lookup``, creating it from
+    ``initial`` if it does not exist yet. Return whether it was created.
+    """
+    if model.objects.filter(**lookup).update(**updates):
+        return False
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **initial)
+        return True
+    except IntegrityError:
+        # A concurrent attempt created the row in the meantime.
+        model.objects.filter(**lookup).update(**updates)
+        return False
+
+
+def record_fiche_attempt(attempt, new_student):
+    """Fold a newly created attempt into its fiche's statistics."""
+    score = _decimal(attempt.score)
+    _fold(
+        FicheStats,
+        {'fiche_id': attempt.fiche_id},
+        {
+            'attempt_count': F('attempt_count') + 1,
+            'student_count': F('student_count') + int(new_student),
+            'score_sum': F('score_sum') + score,
+            'pass_count': F('pass_count') + int(attempt.passed),
+            'min_score': Least(Coalesce('min_score', score), score),
+            'max_score': Greatest(Coalesce('max_score', score), score),
+            'last_attempt_at': _latest('last_attempt_at', attempt.completed_at),
+        },
+        {
+            'attempt_count': 1,
+            'student_count': 1,
+            'score_sum': attempt.score,
+            'pass_count': int(attempt.passed),
+            'min_score': attempt.score,
+            'max_score': attempt.score,
+            'last_attempt_at': attempt.completed_at,
+        },
+    )
+
+
+def record_student_attempt(attempt):
+    """
+    Fold a newly created attempt into its student's rollups.
+
+    Return whether it is the student's first attempt on the fiche.
+    """
+    score = _decimal(attempt.score)
+    _fold(
+        StudentStats,
+        {'student_id': attempt.student_id},
+        {
+            'attempt_count': F('attempt_count') + 1,
+            'score_sum': F('score_sum') + score,
+            'pass_count': F('pass_count') + int(attempt.passed),
+            'last_activity_at': _latest('last_activity_at', attempt.completed_at),
+        },
+        {
+            'attempt_count': 1,
+            'score_sum': attempt.score,
+            'pass_count': int(attempt.passed),
+            'last_activity_at': attempt.completed_at,
+        },
+    )
+    return _fold(
+        StudentFicheStats,
+        {'student_id': attempt.student_id, 'fiche_id': attempt.fiche_id},
+        {
+            'attempt_count': F('attempt_count') + 1,
+            'best_score': Greatest('best_score', score),
+            'last_attempt_at': _latest('last_attempt_at', attempt.completed_at),
+        },
+        {
+            'attempt_count': 1,
+            'best_score': attempt.score,
+            'last_attempt_at': attempt.completed_at,
+        },
+    )
+
+
+def record_teacher_attempt(attempt):
+    """Fold a newly created attempt into the rollups of its fiche's author."""
+    teacher_id = attempt.fiche.author_id
+    score = _decimal(attempt.score)
+    _fold(
+        TeacherStats,
+        {'teacher_id': teacher_id},
+        {
+            'attempt_count': F('attempt_count') + 1,
+            'score_sum': F('score_sum') + score,
+            'pass_count': F('pass_count') + int(attempt.passed),
+            'last_attempt_at': _latest('last_attempt_at', attempt.completed_at),
+        },
+        {
+            'attempt_count': 1,
+            'score_sum': attempt.score,
+            'pass_count': int(attempt.passed),
+            'last_attempt_at': attempt.completed_at,
+        },
+    )
+    _fold(
+        TeacherDailyStats,
+        {'teacher_id': teacher_id, 'day': timezone.localdate(attempt.completed_at)},
+        {
+            'attempt_count': F('attempt_count') + 1,
+            'score_sum': F('score_sum') + score,
+            'pass_count': F('pass_count') + int(attempt.passed),
+        },
+        {
+            'attempt_count': 1,
+            'score_sum': attempt.score,
+            'pass_count': int(attempt.passed),
+        },
+    )
+
+
+def record_attempt(attempt):
+    """Fold a newly created attempt into every statistics table."""
+    new_student = record_student_attempt(attempt)
+    record_fiche_attempt(attempt, new_student)
+    record_teacher_attempt(attempt)
+
+
+def record_fiche_created(fiche):
+    """Count a newly created fiche in its author's rollup."""
+    _fold(TeacherStats, {'teacher_id': fiche.author_id}, {'fiche_count': F('fiche_count') + 1}, {'fiche_count': 1})
+
+
+def record_question_created(question):
+    """Count a newly created question in its fiche author's rollup."""
+    _fold(
+        TeacherStats,
+        {'teacher_id': question.fiche.author_id},
+        {'question_count': F('question_count') + 1},
+        {'question_count': 1},
+    )
+
+
+def record_question_moved(question, previous_fiche_id):
+    """Move the count of a question moved to another fiche to that fiche's author."""
+    previous_author_id = Fiche.objects.filter(pk=previous_fiche_id).values_list('author_id', flat=True).first()
+    if previous_author_id == question.fiche.author_id:
+        return
+    TeacherStats.objects.filter(teacher_id=previous_author_id).update(
+        question_count=Greatest(F('question_count') - 1, Value(0)),
+    )
+    record_question_created(question)
+
+
+def record_question_deleted(question):
+    """Uncount a deleted question from its fiche author's rollup."""
+    TeacherStats.objects.filter(teacher__fiches=question.fiche_id).update(
+        question_count=Greatest(F('question_count') - 1, Value(0)),
+    )
+
+
+def _lock(model, lookups):
+    """
+    Lock the rows of ``model`` matching ``lookups`` until the transaction
+    ends, so that no attempt is folded into them between the aggregates
+    being read and the rows being replaced. SQLite transactions already
+    hold the database write lock (``BEGIN IMMEDIATE``).
+    """
+    list(model.objects.filter(**lookups).select_for_update().order_by('pk').values_list('pk', flat=True))
+
+
+def _rebuild(model, group_by, aggregates, attempts, lookups=None):
+    """Replace the rows of ``model`` matching ``lookups`` by aggregates of ``attempts``."""
+    lookups = lookups or {}
+    with transaction.atomic():
+        _lock(model, lookups)
+        rows = [
+            model(**row)
+            for row in attempts.order_by().values(*group_by).annotate(**aggregates)
+        ]
+        model.objects.filter(**lookups).delete()
+        model.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def rebuild_fiche_stats(fiche_ids=None):
+    """Recompute the statistics of the given fiches (all of them by default)."""
+    attempts = QuizAttempt.objects.all()
+    lookups = {}
+    if fiche_ids is not None:
+        attempts = attempts.filter(fiche_id__in=fiche_ids)
+        lookups = {'fiche_id__in': fiche_ids}
+    return _rebuild(
+        FicheStats,
+        ['fiche_id'],
+        {
+            'attempt_count': Count('id'),
+            'student_count': Count('student', distinct=True),
+            'score_sum': Sum('score'),
+            'pass_count': Count('id', filter=Q(score__gte=PASS_MARK)),
+            'min_score': Min('score'),
+            'max_score': Max('score'),
+            'last_attempt_at': Max('completed_at'),
+        },
+        attempts,
+        lookups,
+    )
+
+
+def rebuild_student_stats(student_ids=None):
+    """Recompute the rollups of the given students (all of them by default)."""
+    attempts = QuizAttempt.objects.all()
+    lookups = {}
+    if student_ids is not None:
+        attempts = attempts.filter(student_id__in=student_ids)
+        lookups = {'student_id__in': student_ids}
+    count = _rebuild(
+        StudentStats,
+        ['student_id'],
+        {
+            'attempt_count': Count('id'),
+            'score_sum': Sum('score'),
+            'pass_count': Count('id', filter=Q(score__gte=PASS_MARK)),
+            'last_activity_at': Max('completed_at'),
+        },
+        attempts,
+        lookups,
+    )
+    _rebuild(
+        StudentFicheStats,
+        ['student_id', 'fiche_id'],
+        {
+            'attempt_count': Count('id'),
+            'best_score': Max('score'),
+            'last_attempt_at': Max('completed_at'),
+        },
+        attempts,
+        lookups,
+    )
+    return count
+
+
+def rebuild_teacher_stats(teacher_ids=None):
+    """Recompute the rollups of the given teachers (all of them by default)."""
+    fiches = Fiche.objects.all()
+    questions = Question.objects.all()
+    attempts = QuizAttempt.objects.all()
+    lookups = {}
+    if teacher_ids is not None:
+        fiches = fiches.filter(author_id__in=teacher_ids)
+        questions = questions.filter(fiche__author_id__in=teacher_ids)
+        attempts = attempts.filter(fiche__author_id__in=teacher_ids)
+        lookups = {'teacher_id__in': teacher_ids}
+
+    with transaction.atomic():
+        _lock(TeacherStats, lookups)
+        _lock(TeacherDailyStats, lookups)
+        # One aggregate per table: counting questions and attempts over the
+        # same join would multiply them by each other.
+        rows = {}
+        for teacher_id, fiche_count in fiches.order_by().values_list('author_id').annotate(Count('id')):
+            rows[teacher_id] = TeacherStats(teacher_id=teacher_id, fiche_count=fiche_count)
+        for teacher_id, question_count in questions.order_by().values_list('fiche__author_id').annotate(Count('id')):
+            rows.setdefault(teacher_id, TeacherStats(teacher_id=teacher_id)).question_count = question_count
+        totals = attempts.order_by().values('fiche__author_id').annotate(
+            attempt_count=Count('id'),
+            score_sum=Sum('score'),
+            pass_count=Count('id', filter=Q(score__gte=PASS_MARK)),
+            last_attempt_at=Max('completed_at'),
+        )
+        for row in totals:
+            teacher_id = row.pop('fiche__author_id')
+            stats = rows.setdefault(teacher_id, TeacherStats(teacher_id=teacher_id))
+            for field, value in row.items():
+                setattr(stats, field, value)
+        daily = [
+            TeacherDailyStats(**row)
+            for row in attempts.order_by().values(
+                teacher_id=F('fiche__author_id'), day=TruncDate('completed_at'),
+            ).annotate(
+                attempt_count=Count('id'),
+                score_sum=Sum('score'),
+                pass_count=Count('id', filter=Q(score__gte=PASS_MARK)),
+            )
+        ]
+
+        TeacherStats.objects.filter(**lookups).delete()
+        TeacherStats.objects.bulk_create(rows.values(), batch_size=500)
+        TeacherDailyStats.objects.filter(**lookups).delete()
+        TeacherDailyStats.objects.bulk_create(daily, batch_size=500)
+    return len(rows)
+
+
+class _PendingRebuild:
+    """The fiches, students and teachers whose statistics a transaction invalidated."""
+
+    def __init__(self, using):
+        self.using = using
+        self.fiche_ids, self.student_ids, self.teacher_ids = set(), set(), set()
+
+    def run(self):
+        # Fiches deleted in the transaction took their statistics with them;
+        # their authors were scheduled by the fiche deletion.
+        fiches = dict(Fiche.objects.filter(pk__in=self.fiche_ids).values_list('pk', 'author_id'))
+        if fiches:
+            rebuild_fiche_stats(list(fiches))
+        if self.student_ids:
+            rebuild_student_stats(list(self.student_ids))
+        teacher_ids = self.teacher_ids | set(fiches.values())
+        if teacher_ids:
+            rebuild_teacher_stats(list(teacher_ids))
+
+
+def schedule_rebuild(fiche_ids=(), student_ids=(), teacher_ids=(), using=None):
+    """
+    Recompute the statistics of the given fiches (and their authors),
+    students and teachers once the current transaction commits, each of them
+    once however many times it is scheduled.
+    """
+    connection = transaction.get_connection(using)
+    pending = getattr(connection, 'pending_stats_rebuild', None)
+    # A rollback discards the callback along with the ids collected so far.
+    if pending is None or not any(entry[1] == pending.run for entry in connection.run_on_commit):
+        pending = connection.pending_stats_rebuild = _PendingRebuild(using)
+        scheduled = False
+    else:
+        scheduled = True
+    pending.fiche_ids.update(fiche_ids)
+    pending.student_ids.update(student_ids)
+    pending.teacher_ids.update(teacher_ids)
+    if not scheduled:
+        transaction.on_commit(pending.run, using)
+
+
+def teacher_analytics(teacher, most_failed_limit=MOST_FAILED_LIMIT):
+    """
+    Return the dashboard analytics of ``teacher``, read from the rollups in
+    three queries.
+    """
+    today = timezone.localdate()
+    stats = TeacherStats.objects.filter(teacher=teacher).first() or TeacherStats(teacher=teacher)
+    windows = TeacherDailyStats.objects.filter(teacher=teacher, day__gt=today - timedelta(days=30)).aggregate(
+        attempts_7=Sum('attempt_count', filter=Q(day__gt=today - timedelta(days=7))),
+        attempts_30=Sum('attempt_count'),
+        score_sum_30=Sum('score_sum'),
+    )
+    attempts_30 = windows['attempts_30'] or 0
+    most_failed = (
+        FicheStats.objects.filter(fiche__author=teacher, pass_count__lt=F('attempt_count'))
+        .annotate(fail_rate=ExpressionWrapper(
+            (F('attempt_count') - F('pass_count')) * 100.0 / F('attempt_count'), output_field=FloatField(),
+        ))
+        .select_related('fiche')
+        .order_by('-fail_rate', '-attempt_count')[:most_failed_limit]
+    )
+    return {
+        'total_fiches': stats.fiche_count,
+        'total_questions': stats.question_count,
+        'total_attempts': stats.attempt_count,
+        'average_score': stats.average_score,
+        'pass_rate': stats.pass_count * 100 / stats.attempt_count if stats.attempt_count else 0,
+        'last_attempt_at': stats.last_attempt_at,
+        'attempts_7_days': windows['attempts_7'] or 0,
+        'attempts_30_days': attempts_30,
+        'average_score_30_days': windows['score_sum_30'] / attempts_30 if attempts_30 else 0,
+        'most_failed_fiches': list(most_failed),
+    }
@@ -1,3 +1,31 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from fiches.models import Fiche
+from quizzes.models import Question
+from .models import TeacherStats
+
+
+class TeacherStatsTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create_user('alice', password='x', role='teacher')
+        self.bob = User.objects.create_user('bob', password='x', role='teacher')
+        self.alice_fiche = Fiche.objects.create(title='A', description='d', content='c', author=self.alice)
+        self.bob_fiche = Fiche.objects.create(title='B', description='d', content='c', author=self.bob)
+
+    def question_count(self, teacher):
+        return TeacherStats.objects.get(teacher=teacher).question_count
+
+    def test_moving_a_question_moves_its_count(self):
+        question = Question.objects.create(fiche=self.alice_fiche, text='Q')
+        self.assertEqual(self.question_count(self.alice), 1)
+
+        question.fiche = self.bob_fiche
+        question.save()
+        self.assertEqual(self.question_count(self.alice), 0)
+        self.assertEqual(self.question_count(self.bob), 1)
+
+        question.text = 'Q modifiée'
+        question.save()
+        self.assertEqual(self.question_count(self.bob), 1)
@@ -7,4 +7,7 @@ urlpatterns = [
     path('attempt/<int:pk>/', views.attempt_detail, name='attempt_detail'),
     path('my-results/', views.my_results, name='my_results'),
     path('fiche/<int:fiche_pk>/', views.fiche_results, name='fiche_results'),
+    path('fiche/<int:fiche_pk>/analysis/', views.item_analysis, name='item_analysis'),
+    path('fiche/<int:fiche_pk>/export/', views.fiche_results_export, name='fiche_results_export'),
+    path('submission/<int:pk>/', views.submission_status, name='submission_status'),
 ]
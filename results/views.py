@@ -1,25 +1,38 @@
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Count
-from .models import QuizAttempt, QuestionAnswer
+from fiches.models import CONTENT_FIELDS
+from quizzes.answer_key import get_answer_key
+from souklou_project.pagination import paginate
+from .analysis import get_item_analysis
+from .export import (
+    attempt_rows, answer_rows, stream_csv, stream_xlsx, CSV_CONTENT_TYPE, XLSX_CONTENT_TYPE,
+)
+from .models import QuizAttempt, QuizSubmission, FicheStats, StudentStats, StudentFicheStats
 
 
 @login_required
 def attempt_detail(request, pk):
     """View to display detailed results of a quiz attempt."""
-    attempt = get_object_or_404(QuizAttempt, pk=pk)
+    attempt = get_object_or_404(QuizAttempt.objects.select_related('fiche'), pk=pk)
 
     # Only allow viewing own attempts or teacher viewing their fiche attempts
-    if attempt.student != request.user and attempt.fiche.author != request.user and not request.user.is_superuser:
+    if attempt.student_id != request.user.pk and attempt.fiche.author_id != request.user.pk and not request.user.is_superuser:
         from django.contrib import messages
         from django.shortcuts import redirect
         messages.error(request, 'Vous n\'avez pas accès à ces résultats.')
         return redirect('dashboard')
 
-    # Get all question answers with details
-    question_answers = attempt.question_answers.select_related(
-        'question', 'selected_answer'
-    ).prefetch_related('question__answers').order_by('question__order')
+    # Get all question answers with details, answers come from the answer key
+    question_answers = list(
+        attempt.question_answers.select_related('question').order_by('question__order')
+    )
+    key = get_answer_key(attempt.fiche)
+    for qa in question_answers:
+        selected_answer = key.answer(qa.selected_answer_id)
+        if selected_answer is not None:
+            qa.selected_answer = selected_answer
+        qa.correct_answer = key.correct_answer(qa.question_id)
 
     context = {
         'attempt': attempt,
@@ -31,20 +44,33 @@ def attempt_detail(request, pk):
 @login_required
 def my_results(request):
     """View for students to see their quiz history."""
-    attempts = QuizAttempt.objects.filter(
-        student=request.user
-    ).select_related('fiche').order_by('-completed_at')
+    fiche_content = [f'fiche__{name}' for name in CONTENT_FIELDS]
+    attempts = paginate(
+        QuizAttempt.objects.filter(student=request.user).select_related('fiche').defer(*fiche_content),
+        request,
+        ('-completed_at', '-pk'),
+    )
 
-    # Statistics
+    # Statistics, maintained incrementally on each new attempt
+    student_stats = StudentStats.objects.filter(student=request.user).first() or StudentStats()
     stats = {
-        'total_attempts': attempts.count(),
-        'average_score': attempts.aggregate(Avg('score'))['score__avg'] or 0,
-        'passed_attempts': attempts.filter(score__gte=50).count(),
+        'total_attempts': student_stats.attempt_count,
+        'average_score': student_stats.average_score,
+        'passed_attempts': student_stats.pass_count,
+        'last_activity': student_stats.last_activity_at,
     }
+    best_scores = paginate(
+        StudentFicheStats.objects.filter(student=request.user).select_related('fiche').defer(*fiche_content),
+        request,
+        ('-last_attempt_at', '-pk'),
+        param='best_cursor',
+    )
 
     context = {
         'attempts': attempts,
+        'page': attempts,
         'stats': stats,
+        'best_scores': best_scores,
     }
     return render(request, 'results/my_results.html', context)
 
@@ -61,21 +87,96 @@ def fiche_results(request, fiche_pk):
         messages.error(request, 'Vous ne pouvez voir que les résultats de vos propres fiches.')
         return redirect('fiches:detail', pk=fiche_pk)
 
-    attempts = QuizAttempt.objects.filter(
-        fiche=fiche
-    ).select_related('student').order_by('-completed_at')
+    attempts = paginate(
+        QuizAttempt.objects.filter(fiche=fiche).select_related('student'),
+        request,
+        ('-completed_at', '-pk'),
+    )
 
-    # Statistics
+    # Statistics, maintained incrementally on each new attempt
+    fiche_stats = FicheStats.objects.filter(fiche=fiche).first() or FicheStats(fiche=fiche)
     stats = {
-        'total_attempts': attempts.count(),
-        'unique_students': attempts.values('student').distinct().count(),
-        'average_score': attempts.aggregate(Avg('score'))['score__avg'] or 0,
-        'pass_rate': (attempts.filter(score__gte=50).count() / attempts.count() * 100) if attempts.count() > 0 else 0,
+        'total_attempts': fiche_stats.attempt_count,
+        'unique_students': fiche_stats.student_count,
+        'average_score': fiche_stats.average_score,
+        'pass_rate': fiche_stats.pass_rate,
     }
 
     context = {
         'fiche': fiche,
         'attempts': attempts,
+        'page': attempts,
         'stats': stats,
     }
     return render(request, 'results/fiche_results.html', context)
+
+
+@login_required
+def item_analysis(request, fiche_pk):
+    """View for teachers to see the item analysis of their fiche's quiz."""
+    from fiches.models import Fiche
+    fiche = get_object_or_404(Fiche, pk=fiche_pk)
+
+    if fiche.author != request.user and not request.user.is_superuser:
+        from django.contrib import messages
+        from django.shortcuts import redirect
+        messages.error(request, 'Vous ne pouvez voir que les résultats de vos propres fiches.')
+        return redirect('fiches:detail', pk=fiche_pk)
+
+    context = {
+        'fiche': fiche,
+        'analysis': get_item_analysis(fiche),
+    }
+    return render(request, 'results/item_analysis.html', context)
+
+
+@login_required
+def fiche_results_export(request, fiche_pk):
+    """View for teachers to download the results of their fiche as CSV or XLSX."""
+    from fiches.models import Fiche
+    fiche = get_object_or_404(Fiche, pk=fiche_pk)
+
+    if fiche.author != request.user and not request.user.is_superuser:
+        from django.contrib import messages
+        from django.shortcuts import redirect
+        messages.error(request, 'Vous ne pouvez exporter que les résultats de vos propres fiches.')
+        return redirect('fiches:detail', pk=fiche_pk)
+
+    detail = request.GET.get('detail') == '1'
+    filename = f'resultats-fiche-{fiche.pk}{"-detail" if detail else ""}'
+    if request.GET.get('format') == 'xlsx':
+        sheets = [('Tentatives', attempt_rows(fiche))]
+        if detail:
+            sheets.append(('Réponses', answer_rows(fiche)))
+        response = StreamingHttpResponse(stream_xlsx(sheets), content_type=XLSX_CONTENT_TYPE)
+        filename += '.xlsx'
+    else:
+        # A CSV file holds a single table: the detail replaces the attempts.
+        rows = answer_rows(fiche) if detail else attempt_rows(fiche)
+        response = StreamingHttpResponse(stream_csv(rows), content_type=CSV_CONTENT_TYPE)
+        filename += '.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def submission_status(request, pk):
+    """View shown while a queued quiz submission is being graded."""
+    submission = get_object_or_404(QuizSubmission.objects.select_related('fiche'), pk=pk)
+
+    if submission.student_id != request.user.pk and not request.user.is_superuser:
+        from django.contrib import messages
+        from django.shortcuts import redirect
+        messages.error(request, 'Vous n\'avez pas accès à cette soumission.')
+        return redirect('dashboard')
+
+    if submission.status == QuizSubmission.STATUS_GRADED and submission.attempt_id:
+        from django.contrib import messages
+        from django.shortcuts import redirect
+        messages.success(request, 'Quiz corrigé ! Voici vos résultats.')
+        return redirect('results:attempt_detail', pk=submission.attempt_id)
+
+    context = {
+        'submission': submission,
+    }
+    return render(request, 'results/submission_status.html', context)
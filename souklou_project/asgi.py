@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "souklou_project.settings")
+os.environ.setdefault("DATABASE_ROLE", "web")
+# Each request runs its ORM calls in a thread of its own: connections kept
+# open after the request would never be reused.
+os.environ.setdefault("DATABASE_CONN_MAX_AGE", "0")
 
 application = get_asgi_application()
@@ -0,0 +1,32 @@
+"""
+Helpers for the async views.
+
+Async views must not touch the database from the event loop: the lazy
+``request.user`` and the session behind the ``messages`` context
+processor both would. ``aget_user`` resolves the user up front (without
+any query when the client has no session cookie), and ``arender`` renders
+in the request's sync thread once the view has fetched its data.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.models import AnonymousUser
+from django.shortcuts import render
+
+
+async def aget_user(request):
+    """Return the user of ``request`` and make ``request.user`` that user."""
+    if hasattr(request, 'auser'):
+        user = await request.auser()
+    elif settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        user = AnonymousUser()
+    else:
+        user = await sync_to_async(get_user)(request)
+    request.user = user
+    return user
+
+
+async def arender(request, template_name, context=None):
+    """Like ``render``, for async views."""
+    return await sync_to_async(render)(request, template_name, context)
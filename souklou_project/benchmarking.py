@@ -0,0 +1,51 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Benchmarks seed their data into a throwaway copy of the configured
+databases (the same ones the test runner would create), never into the
+real database.
+"""
+
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.test.utils import setup_databases, teardown_databases
+
+
+@contextmanager
+def throwaway_database(verbosity=0, keepdb=False):
+    """Run the block against freshly created test databases."""
+    old_config = setup_databases(verbosity, interactive=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity, keepdb=keepdb)
+
+
+def percentile(sorted_samples, fraction):
+    """Return the ``fraction`` percentile of already sorted samples (nearest rank)."""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples):
+    """Return the latency summary of ``samples`` (in seconds) in milliseconds."""
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+def timed(function, *args, **kwargs):
+    """Call ``function`` and return ``(elapsed seconds, result)``."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
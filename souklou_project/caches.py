@@ -0,0 +1,72 @@
+"""
+Cache and session configuration from the environment.
+
+``CACHE_URL`` selects the cache shared by the processes of a deployment:
+
+* ``locmem://`` (the default): per-process memory, for development;
+* ``redis://host:6379/0`` (or ``rediss://``, several URLs separated by
+  commas for a primary and its replicas): Django's Redis backend;
+* ``memcached://host:11211`` (several servers separated by commas):
+  pymemcache;
+* ``file:///var/tmp/souklou-cache``, ``db://cache_table`` and ``dummy://``.
+
+``SESSION_BACKEND`` selects where sessions live: ``db``, ``cached_db`` (the
+default: read from the cache, written through to the database), ``cache``
+or ``signed_cookies``.
+"""
+
+from urllib.parse import unquote, urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+def parse_cache_url(url):
+    """Return the ``CACHES`` entry described by ``url``."""
+    parts = urlsplit(url)
+    if parts.scheme == 'locmem':
+        return {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': parts.netloc,
+        }
+    if parts.scheme in ('redis', 'rediss'):
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': url.split(','),
+        }
+    if parts.scheme == 'memcached':
+        return {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': url[len('memcached://'):].split(','),
+        }
+    if parts.scheme == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': unquote(parts.path),
+        }
+    if parts.scheme == 'db':
+        return {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': parts.netloc,
+        }
+    if parts.scheme == 'dummy':
+        return {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }
+    raise ImproperlyConfigured(f'Unsupported CACHE_URL scheme: {parts.scheme!r}')
+
+
+def session_engine(backend):
+    """Return the ``SESSION_ENGINE`` of a ``SESSION_BACKEND`` name."""
+    try:
+        return SESSION_ENGINES[backend]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f'SESSION_BACKEND must be one of {", ".join(SESSION_ENGINES)}, not {backend!r}'
+        ) from None
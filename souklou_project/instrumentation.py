@@ -0,0 +1,56 @@
+"""
+Per-request query observers that follow the request across threads.
+
+``connection.execute_wrapper()`` only applies to the connection object of
+the thread that installs it. Async views run their ORM calls through
+``sync_to_async`` in another thread, with their own connection objects, so
+wrappers installed by a middleware in the event loop would never see them.
+Instead every connection gets one permanent wrapper dispatching to the
+observers registered with ``observe_queries()`` in the current context:
+context variables follow the request into ``sync_to_async`` threads.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_observers = ContextVar('query_observers', default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    observers = _observers.get()
+    for observer in reversed(observers):
+        execute = partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def install(connection):
+    """Route the queries of ``connection`` to the observers of the current context."""
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _dispatch)
+
+
+def _connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+connection_created.connect(_connection_created)
+
+
+@contextmanager
+def observe_queries(observer):
+    """
+    Call ``observer`` like an execute wrapper for every query of the block,
+    on any database and in any thread the block's context reaches.
+    """
+    # Connections of this thread may predate this module
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+    token = _observers.set((*_observers.get(), observer))
+    try:
+        yield observer
+    finally:
+        _observers.reset(token)
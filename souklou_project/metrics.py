@@ -0,0 +1,415 @@
+"""
+Prometheus metrics.
+
+Each process accumulates its samples in memory. When ``METRICS_DIR`` is
+set, which it should be under a multi-worker server, a background thread of
+every process also writes a snapshot of its samples to
+``METRICS_DIR/metrics-<pid>.json`` every ``METRICS_FLUSH_INTERVAL`` seconds
+when they changed, off the request path. ``/metrics`` merges the
+snapshots of all workers: counters and histograms are summed, including
+those of exited workers, and gauges are summed over live workers only.
+``mark_process_dead`` (called from the gunicorn ``child_exit`` hook) folds
+an exited worker's counters into an archive file so the directory does
+not grow with restarts.
+
+Without ``METRICS_DIR`` the endpoint only reports the process serving it.
+Outside ``DEBUG``, the endpoint is only served when ``METRICS_TOKEN`` or
+``METRICS_ALLOWED_IPS`` restricts it.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+from .instrumentation import observe_queries
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = getattr(settings, 'METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+
+PREFIX = 'souklou_'
+ARCHIVE_FILE = 'metrics-archive.json'
+LOCK_FILE = 'metrics.lock'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RENDER_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP responses per URL name, method and status.', None),
+    'http_request_duration_seconds': ('histogram', 'Request latency per URL name.', LATENCY_BUCKETS),
+    'http_requests_active': ('gauge', 'Requests being processed.', None),
+    'db_queries_total': ('counter', 'SQL queries per URL name.', None),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in SQL queries per URL name.', None),
+    'template_render_duration_seconds': ('histogram', 'Template render time per template.', RENDER_BUCKETS),
+    'cache_requests_total': ('counter', 'Cache lookups per cache and result (hit or miss).', None),
+}
+
+
+class Registry:
+    """In-memory samples of this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+        # (name, labels): [bucket counts..., sum, count]
+        self.histograms = {}
+        # Whether samples changed since the last flush
+        self.dirty = False
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            self.values[name, labels] += amount
+            self.dirty = True
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        with self.lock:
+            samples = self.histograms.get((name, labels))
+            if samples is None:
+                samples = self.histograms[name, labels] = [0] * (len(buckets) + 2)
+            for position, bound in enumerate(buckets):
+                if value <= bound:
+                    samples[position] += 1
+                    break
+            samples[-2] += value
+            samples[-1] += 1
+            self.dirty = True
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'values': [[name, list(labels), value] for (name, labels), value in self.values.items()],
+                'histograms': [[name, list(labels), list(samples)] for (name, labels), samples in self.histograms.items()],
+            }
+
+
+registry = Registry()
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, _labels(labels), amount)
+    _ensure_flusher()
+
+
+def observe(name, value, **labels):
+    registry.observe(name, _labels(labels), value)
+    _ensure_flusher()
+
+
+def record_cache(cache_name, hit):
+    """Count a lookup in one of the application caches."""
+    inc('cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+@contextmanager
+def active_request():
+    registry.inc('http_requests_active', (), 1)
+    try:
+        yield
+    finally:
+        registry.inc('http_requests_active', (), -1)
+
+
+def _path(name):
+    return os.path.join(METRICS_DIR, name)
+
+
+def _write(path, snapshot):
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as stream:
+        json.dump(snapshot, stream)
+    os.replace(temporary, path)
+
+
+def flush():
+    """Write this process's snapshot to the metrics directory."""
+    if not METRICS_DIR:
+        return
+    with registry.lock:
+        registry.dirty = False
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    _write(_path(f'metrics-{os.getpid()}.json'), registry.snapshot())
+
+
+def reset():
+    """Drop the samples of this process, e.g. before forking workers."""
+    with registry.lock:
+        registry.values.clear()
+        registry.histograms.clear()
+        registry.dirty = False
+    if METRICS_DIR:
+        try:
+            os.remove(_path(f'metrics-{os.getpid()}.json'))
+        except FileNotFoundError:
+            pass
+
+
+_flusher = None
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        if registry.dirty:
+            try:
+                flush()
+            except Exception:
+                logger.exception('Writing the metrics snapshot failed')
+
+
+def _ensure_flusher():
+    """Start this process's background flusher, once per process (forks included)."""
+    global _flusher, _flusher_pid
+    if not METRICS_DIR:
+        return
+    pid = os.getpid()
+    if _flusher_pid == pid and _flusher.is_alive():
+        return
+    with _flusher_lock:
+        if _flusher_pid == pid and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(target=_flush_periodically, name='metrics-flusher', daemon=True)
+        _flusher_pid = pid
+        _flusher.start()
+
+
+# Write the last samples when the process exits cleanly.
+atexit.register(flush)
+
+
+def _read(path):
+    try:
+        with open(path) as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge(into, snapshot, with_gauges=True):
+    values, histograms = into
+    for name, labels, value in snapshot['values']:
+        if with_gauges or METRICS.get(name, ('',))[0] != 'gauge':
+            values[name, tuple(map(tuple, labels))] += value
+    for name, labels, samples in snapshot['histograms']:
+        key = name, tuple(map(tuple, labels))
+        merged = histograms.setdefault(key, [0] * len(samples))
+        for position, sample in enumerate(samples):
+            merged[position] += sample
+
+
+@contextmanager
+def _locked():
+    import fcntl
+
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with open(_path(LOCK_FILE), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def mark_process_dead(pid):
+    """Fold the counters of an exited worker into the archive and drop its snapshot."""
+    if not METRICS_DIR:
+        return
+    path = _path(f'metrics-{pid}.json')
+    with _locked():
+        snapshot = _read(path)
+        if snapshot is None:
+            return
+        merged = (defaultdict(float), {})
+        archive = _read(_path(ARCHIVE_FILE))
+        if archive:
+            _merge(merged, archive)
+        _merge(merged, snapshot, with_gauges=False)
+        _write(_path(ARCHIVE_FILE), _snapshot_of(merged))
+        os.remove(path)
+
+
+def _snapshot_of(merged):
+    values, histograms = merged
+    return {
+        'values': [[name, list(labels), value] for (name, labels), value in values.items()],
+        'histograms': [[name, list(labels), samples] for (name, labels), samples in histograms.items()],
+    }
+
+
+def collect():
+    """Return the merged ``(values, histograms)`` of every worker."""
+    merged = (defaultdict(float), {})
+    if not METRICS_DIR:
+        _merge(merged, registry.snapshot())
+        return merged
+    flush()
+    with _locked():
+        for filename in os.listdir(METRICS_DIR):
+            if filename == ARCHIVE_FILE:
+                snapshot = _read(_path(filename))
+                if snapshot:
+                    _merge(merged, snapshot)
+            elif filename.startswith('metrics-') and filename.endswith('.json'):
+                snapshot = _read(_path(filename))
+                if snapshot:
+                    pid = int(filename[len('metrics-'):-len('.json')])
+                    _merge(merged, snapshot, with_gauges=_alive(pid))
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    values, histograms = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {PREFIX}{name} {help_text}')
+        lines.append(f'# TYPE {PREFIX}{name} {kind}')
+        if kind == 'histogram':
+            for (metric, labels), samples in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, samples):
+                    cumulative += count
+                    lines.append(f'{PREFIX}{name}_bucket{_format_labels(labels, [("le", _number(bound))])} {cumulative}')
+                lines.append(f'{PREFIX}{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {int(samples[-1])}')
+                lines.append(f'{PREFIX}{name}_sum{_format_labels(labels)} {_number(samples[-2])}')
+                lines.append(f'{PREFIX}{name}_count{_format_labels(labels)} {int(samples[-1])}')
+        else:
+            samples = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+            if kind == 'gauge' and not samples:
+                samples = [((), 0)]
+            for labels, value in samples:
+                lines.append(f'{PREFIX}{name}{_format_labels(labels)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class QueryTimer:
+    """Execute wrapper counting and timing the queries of a request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """Record latency, status and SQL usage of every request per URL name."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with active_request(), observe_queries(QueryTimer()) as timer:
+            response = self.get_response(request)
+        self._record(request, response, timer, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with active_request(), observe_queries(QueryTimer()) as timer:
+            response = await self.get_response(request)
+        self._record(request, response, timer, time.perf_counter() - start)
+        return response
+
+    def _record(self, request, response, timer, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        inc('http_requests_total', view=view, method=method, status=str(response.status_code))
+        observe('http_request_duration_seconds', elapsed, view=view)
+        if timer.count:
+            inc('db_queries_total', timer.count, view=view)
+            inc('db_query_duration_seconds_total', timer.duration, view=view)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            observe(
+                'template_render_duration_seconds',
+                time.perf_counter() - start,
+                template=self.origin.template_name or 'string',
+            )
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Django template backend timing every template render."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,123 @@
+"""
+Conditional GET and full-page cache for anonymous visitors.
+
+``public_page(validator)`` decorates an async view. ``validator`` is an
+async function of the view's arguments returning ``(tag, last_modified)``
+for the content the view would render, from a cheap query (typically the
+``updated_at`` of the fiches shown), or ``None`` to let the view answer
+(for instance with a 404).
+
+For anonymous requests (no session nor messages cookie) the decorator then:
+
+* answers ``304 Not Modified`` to ``If-None-Match``/``If-Modified-Since``
+  requests still matching;
+* serves the page from the cache, under a key made of the validator, the
+  URL and the active language, or renders it and caches it for
+  ``PAGE_CACHE_SECONDS``.
+
+Validators also change every ``PAGE_CACHE_SECONDS`` (``0`` disables the
+page cache): view counts are
+written back without touching ``updated_at``, and this bounds how stale
+the counts shown on a cached page can be. Responses carry ``Vary: Cookie,
+Accept-Language``; those of logged in users are marked private. ``on_hit``
+is awaited with the view's arguments when the view is skipped, for side
+effects the view would have had, such as counting a view.
+"""
+
+import hashlib
+import time
+from calendar import timegm
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+
+from .metrics import record_cache
+
+CACHEABLE_METHODS = ('GET', 'HEAD')
+
+
+def page_cache_seconds():
+    return getattr(settings, 'PAGE_CACHE_SECONDS', 60)
+
+
+def is_anonymous_request(request):
+    """Return whether ``request`` can only be from an anonymous visitor without pending messages."""
+    return (
+        request.method in CACHEABLE_METHODS
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and getattr(settings, 'MESSAGE_COOKIE_NAME', 'messages') not in request.COOKIES
+    )
+
+
+def _validators(view_name, tag, last_modified):
+    """Return the ETag and the Last-Modified timestamp of ``tag`` in the current period."""
+    seconds = page_cache_seconds()
+    period = int(time.time() // seconds) if seconds > 0 else 0
+    modified = last_modified.isoformat() if last_modified is not None else ''
+    digest = hashlib.md5(f'{view_name}:{tag}:{modified}:{period}'.encode()).hexdigest()
+    timestamp = period * seconds
+    if last_modified is not None:
+        timestamp = max(timestamp, timegm(last_modified.utctimetuple()))
+    return quote_etag(digest), timestamp
+
+
+def _patch(response, etag, last_modified):
+    response.headers.setdefault('ETag', etag)
+    response.headers.setdefault('Last-Modified', http_date(last_modified))
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+    return response
+
+
+def page_cache_key(request, etag):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    version = etag.strip('"')
+    return f'page:{get_language()}:{url}:{version}'
+
+
+def public_page(validator, on_hit=None):
+    """Serve an async view with conditional GET and a page cache to anonymous visitors."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not is_anonymous_request(request):
+                response = await view(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+                return response
+
+            validated = await validator(request, *args, **kwargs)
+            if validated is None:
+                return await view(request, *args, **kwargs)
+            etag, last_modified = _validators(view.__name__, *validated)
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                if on_hit is not None:
+                    await on_hit(request, *args, **kwargs)
+                return _patch(response, etag, last_modified)
+
+            seconds = page_cache_seconds()
+            if seconds <= 0:
+                return _patch(await view(request, *args, **kwargs), etag, last_modified)
+
+            key = page_cache_key(request, etag)
+            response = await cache.aget(key)
+            record_cache('page', response is not None)
+            if response is not None:
+                if on_hit is not None:
+                    await on_hit(request, *args, **kwargs)
+                return response
+
+            response = await view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming or response.cookies:
+                return response
+            _patch(response, etag, last_modified)
+            await cache.aset(key, response, seconds)
+            return response
+        return wrapper
+    return decorator
+
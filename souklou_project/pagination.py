@@ -0,0 +1,263 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are read with ``WHERE (ordering columns) < (last row seen) ... LIMIT
+n + 1`` instead of ``OFFSET``/``COUNT(*)``, so every page costs the same
+index range scan however deep it is, and rows inserted meanwhile neither
+shift nor repeat entries across pages. The ordering must end with a unique
+column (the primary key) for cursors to be stable.
+
+Cursors are opaque, URL-safe strings encoding the direction and the
+ordering values of the row the page starts after.
+
+Rows that can only be read in rank order, such as search hits, are paged
+with ``RankedPaginator`` instead: its cursors hold the position of the row
+the page starts after, in the same format.
+"""
+
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+
+PAGE_SIZE = getattr(settings, 'PAGINATION_PAGE_SIZE', 25)
+MAX_PAGE_SIZE = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 100)
+
+CURSOR_PARAM = 'cursor'
+PAGE_SIZE_PARAM = 'per_page'
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, values = json.loads(payload)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor(cursor) from exc
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+def _page_size(request, default):
+    try:
+        size = int(request.GET[PAGE_SIZE_PARAM])
+    except (KeyError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+class KeysetPage:
+    """One page of rows, iterable like the queryset it replaces."""
+
+    def __init__(self, object_list, request, param, has_next, has_previous, next_values, previous_values):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self._request = request
+        self._param = param
+        self._next_values = next_values
+        self._previous_values = previous_values
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(NEXT, self._next_values) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(PREVIOUS, self._previous_values) if self.has_previous else None
+
+    def _url(self, cursor):
+        query = self._request.GET.copy()
+        query.pop(self._param, None)
+        if cursor:
+            query[self._param] = cursor
+        return f'?{query.urlencode()}' if query else self._request.path
+
+    @property
+    def next_url(self):
+        return self._url(self.next_cursor) if self.has_next else None
+
+    @property
+    def previous_url(self):
+        return self._url(self.previous_cursor) if self.has_previous else None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on ``ordering``, e.g. ``('-created_at', '-pk')``.
+
+    The ordering should match an index of the table, so that each page is
+    an index range scan.
+    """
+
+    def __init__(self, ordering, page_size=None, param=CURSOR_PARAM):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size or PAGE_SIZE
+        self.param = param
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+    def get_page_size(self, request):
+        return _page_size(request, self.page_size)
+
+    def _field(self, queryset, name):
+        model = queryset.model
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+    def _dump(self, queryset, row):
+        return [self._field(queryset, name).value_to_string(row) for name in self.fields]
+
+    def _load(self, queryset, values):
+        if len(values) != len(self.fields):
+            raise InvalidCursor(values)
+        try:
+            return [
+                self._field(queryset, name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except Exception as exc:
+            raise InvalidCursor(values) from exc
+
+    def _after(self, values, forward):
+        """Rows strictly after ``values`` when walking the ordering forward (or backward)."""
+        condition = Q()
+        for position, ordering in enumerate(self.ordering):
+            name = self.fields[position]
+            descending = ordering.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[position]})
+            for previous, value in zip(self.fields[:position], values):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def _prepare(self, queryset, request):
+        """Return the page's query (one row more than the page size), the size, the cursor values and direction."""
+        size = self.get_page_size(request)
+        direction, values = NEXT, None
+        cursor = request.GET.get(self.param)
+        if cursor:
+            try:
+                direction, raw_values = decode_cursor(cursor)
+                values = self._load(queryset, raw_values)
+            except InvalidCursor:
+                # Unreadable cursors (edited by hand, stale format) restart at the first page.
+                direction, values = NEXT, None
+
+        forward = direction == NEXT
+        if values is not None:
+            queryset = queryset.filter(self._after(values, forward))
+        if forward:
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            queryset = queryset.order_by(*self._reversed())
+        return queryset[:size + 1], size, values, forward
+
+    def _page(self, queryset, request, rows, size, values, forward):
+        more = len(rows) > size
+        rows = rows[:size]
+        if forward:
+            has_next, has_previous = more, values is not None
+        else:
+            rows.reverse()
+            has_next, has_previous = True, more
+
+        return KeysetPage(
+            rows,
+            request,
+            self.param,
+            has_next=has_next and bool(rows),
+            has_previous=has_previous and bool(rows),
+            next_values=self._dump(queryset, rows[-1]) if rows else None,
+            previous_values=self._dump(queryset, rows[0]) if rows else None,
+        )
+
+    def paginate(self, queryset, request):
+        query, size, values, forward = self._prepare(queryset, request)
+        return self._page(queryset, request, list(query), size, values, forward)
+
+    async def apaginate(self, queryset, request):
+        query, size, values, forward = self._prepare(queryset, request)
+        return self._page(queryset, request, [row async for row in query], size, values, forward)
+
+    def _reversed(self):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering)
+
+
+class RankedPaginator:
+    """
+    Paginate rows read in rank order from their first one, e.g. search hits::
+
+        start, limit = paginator.window(request)
+        page = paginator.page(request, search(query, limit=limit), start)
+
+    Page n costs reading the n first pages, which suits result lists that
+    are rarely browsed deep.
+    """
+
+    def __init__(self, page_size=None, param=CURSOR_PARAM):
+        self.page_size = page_size or PAGE_SIZE
+        self.param = param
+
+    def window(self, request):
+        """Return the position of the page's first row and the number of rows to read."""
+        size = _page_size(request, self.page_size)
+        start = 0
+        cursor = request.GET.get(self.param)
+        if cursor:
+            try:
+                direction, values = decode_cursor(cursor)
+                position = int(values[0])
+            except (InvalidCursor, IndexError, TypeError, ValueError):
+                # Unreadable cursors restart at the first page.
+                direction, position = NEXT, -1
+            start = max(0, position + 1 if direction == NEXT else position - size)
+        return start, start + size + 1
+
+    def page(self, request, rows, start):
+        """Return the page of ``rows`` (as read for ``window``) starting at ``start``."""
+        size = _page_size(request, self.page_size)
+        object_list = rows[start:start + size]
+        return KeysetPage(
+            object_list,
+            request,
+            self.param,
+            has_next=len(rows) > start + size,
+            has_previous=start > 0 and bool(object_list),
+            next_values=[start + len(object_list) - 1],
+            previous_values=[start],
+        )
+
+
+def paginate(queryset, request, ordering, page_size=None, param=CURSOR_PARAM):
+    """Return the page of ``queryset`` designated by the cursor in ``request``."""
+    return KeysetPaginator(ordering, page_size, param).paginate(queryset, request)
+
+
+async def apaginate(queryset, request, ordering, page_size=None, param=CURSOR_PARAM):
+    """Async version of ``paginate``."""
+    return await KeysetPaginator(ordering, page_size, param).apaginate(queryset, request)
@@ -0,0 +1,209 @@
+"""
+Per-request SQL budget and N+1 detector.
+
+``QueryBudgetMiddleware`` records every query a request sends to any
+database: its duration, a fingerprint of the statement (literals and
+``IN`` lists collapsed) and the first frame of project code that issued it.
+At the end of the request it checks the query count against the budget of
+the URL name (``QUERY_BUDGETS``, e.g. ``{'fiches:list': 8, 'admin:*': 15}``,
+falling back to ``QUERY_BUDGET_DEFAULT``) and flags statements repeated at
+least ``QUERY_BUDGET_DUPLICATE_THRESHOLD`` times as N+1 patterns.
+
+Violations are logged, or raised as ``QueryBudgetExceeded`` when
+``QUERY_BUDGET_ACTION`` is ``'raise'`` (meant for tests). The middleware is
+opt-in: it removes itself unless ``QUERY_BUDGET_ENABLED`` is set. Queries
+run while a streaming response is consumed are not recorded.
+"""
+
+import logging
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from typing import NamedTuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = str(settings.BASE_DIR)
+# Frames of the recording machinery itself
+INTERNAL_FILES = {os.path.abspath(__file__), os.path.abspath(instrumentation.__file__)}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RecordedQuery(NamedTuple):
+    alias: str
+    sql: str
+    duration: float
+    fingerprint: str
+    frame: str
+
+
+def fingerprint(sql):
+    """Return ``sql`` with its literals and ``IN`` lists collapsed, to group repeated statements."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def issuing_frame():
+    """
+    Return where the innermost project code on the stack issued a query:
+    ``file:line in function`` for Python code, ``template:line`` for a
+    template tag or variable.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        filename = os.path.abspath(code.co_filename)
+        if (
+            filename.startswith(PROJECT_DIR)
+            and filename not in INTERNAL_FILES
+            and 'site-packages' not in filename
+            and os.sep + 'venv' + os.sep not in filename
+        ):
+            return f'{os.path.relpath(filename, PROJECT_DIR)}:{frame.f_lineno} in {code.co_name}'
+        if code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name or origin.name}:{token.lineno} (template)'
+        frame = frame.f_back
+    return '?'
+
+
+class QueryRecorder:
+    """Execute wrapper recording queries with the alias of their connection."""
+
+    def __init__(self, queries):
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(RecordedQuery(
+                context['connection'].alias, sql, time.perf_counter() - start, fingerprint(sql), issuing_frame(),
+            ))
+
+
+class QueryReport:
+    """Summary of the queries of a request."""
+
+    def __init__(self, url_name, queries, budget, duplicate_threshold):
+        self.url_name = url_name
+        self.queries = queries
+        self.budget = budget
+        self.count = len(queries)
+        self.duration = sum(query.duration for query in queries)
+        by_fingerprint = defaultdict(list)
+        for query in queries:
+            by_fingerprint[query.fingerprint].append(query)
+        # [(fingerprint, repetitions, issuing frames)], most repeated first
+        self.duplicates = sorted(
+            (
+                (statement, len(repeated), sorted({query.frame for query in repeated}))
+                for statement, repeated in by_fingerprint.items()
+                if len(repeated) >= duplicate_threshold
+            ),
+            key=lambda duplicate: -duplicate[1],
+        )
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+    @property
+    def violated(self):
+        return self.over_budget or bool(self.duplicates)
+
+    def format(self):
+        lines = [
+            f'{self.url_name or "?"}: {self.count} queries in {self.duration * 1000:.1f} ms'
+            + (f' (budget {self.budget})' if self.budget is not None else '')
+        ]
+        for statement, repetitions, frames in self.duplicates:
+            lines.append(f'  N+1: {repetitions}x {statement[:200]}')
+            lines.extend(f'    from {frame}' for frame in frames)
+        return '\n'.join(lines)
+
+
+def get_budget(url_name, budgets, default=None):
+    """Return the query budget of ``url_name``: its own, its namespace's (``'ns:*'``) or ``default``."""
+    if url_name in budgets:
+        return budgets[url_name]
+    namespace = url_name.rpartition(':')[0] if url_name else ''
+    while namespace:
+        if f'{namespace}:*' in budgets:
+            return budgets[f'{namespace}:*']
+        namespace = namespace.rpartition(':')[0]
+    return default
+
+
+class QueryBudgetMiddleware:
+    """Record the queries of each request and enforce the per-URL-name budgets."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        self.default_budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+        self.duplicate_threshold = getattr(settings, 'QUERY_BUDGET_DUPLICATE_THRESHOLD', 3)
+        self.action = getattr(settings, 'QUERY_BUDGET_ACTION', 'log')
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = []
+        with instrumentation.observe_queries(QueryRecorder(queries)):
+            response = self.get_response(request)
+        return self._check(request, response, queries)
+
+    async def __acall__(self, request):
+        queries = []
+        with instrumentation.observe_queries(QueryRecorder(queries)):
+            response = await self.get_response(request)
+        return self._check(request, response, queries)
+
+    def _check(self, request, response, queries):
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.view_name if match else None
+        report = QueryReport(
+            url_name,
+            queries,
+            get_budget(url_name, self.budgets, self.default_budget),
+            self.duplicate_threshold,
+        )
+        response['Server-Timing'] = f'db;dur={report.duration * 1000:.1f};desc="{report.count} queries"'
+        request.query_report = report
+
+        if report.violated:
+            if self.action == 'raise':
+                raise QueryBudgetExceeded(report.format())
+            logger.warning('Query budget exceeded for %s %s\n%s', request.method, request.path, report.format())
+        else:
+            logger.debug('%s', report.format())
+        return response
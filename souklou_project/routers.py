@@ -0,0 +1,154 @@
+"""
+Read replica routing.
+
+Reads go to the primary database unless ``ReplicaMiddleware`` marked the
+current request as replica-safe: then they go to one of the
+``DATABASE_REPLICAS``, picked once per request. A request is replica-safe
+when its method is safe (GET, HEAD, OPTIONS) and the client has not written
+anything in the last ``REPLICA_PIN_SECONDS``: any write pins the rest of the
+request and, through a cookie, the client's next requests to the primary,
+so that for instance the redirect from ``take_quiz`` to ``attempt_detail``
+reads the attempt it just created. Sessions are always read from the
+primary, and so is everything inside a transaction. Writes carrying the
+``counter`` hint (``Model.objects.db_manager(hints={'counter': True})``),
+such as view counts, which no read depends on, do not pin.
+
+Management commands, signal handlers run outside requests and background
+threads always use the primary.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICAS = getattr(settings, 'DATABASE_REPLICAS', [])
+PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+PIN_COOKIE = getattr(settings, 'REPLICA_PIN_COOKIE', 'primary_pin')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Models whose reads must see their own writes immediately
+PRIMARY_APPS = {'sessions'}
+
+
+class RoutingState:
+    """Where the reads of the current request go."""
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+_state = ContextVar('replica_routing', default=None)
+
+
+def current_replica():
+    """Return the replica the current reads go to, ``None`` for the primary."""
+    state = _state.get()
+    if state is None or state.replica is None:
+        return None
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return None
+    return state.replica
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block."""
+    token = _state.set(None)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return current_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_APPS and not hints.get('counter'):
+            state.replica = None
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return db not in REPLICAS
+
+
+class ReplicaMiddleware:
+    """Route the reads of replica-safe requests to a read replica."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self._state_for(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(response, state)
+
+    async def __acall__(self, request):
+        state = self._state_for(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(response, state)
+
+    @staticmethod
+    def _state_for(request):
+        replica = None
+        if request.method in SAFE_METHODS and not request.COOKIES.get(PIN_COOKIE):
+            replica = random.choice(REPLICAS)
+        return RoutingState(replica)
+
+    def _finish(self, response, state):
+        if response.streaming and not response.is_async:
+            # Streamed rows are read after the view has returned
+            response.streaming_content = self._stream(response.streaming_content, state)
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def _stream(content, state):
+        iterator = iter(content)
+        while True:
+            token = _state.set(state)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _state.reset(token)
+            yield chunk
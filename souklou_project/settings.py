@@ -13,6 +13,10 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from decouple import config
 import os
+import sys
+
+from .caches import parse_cache_url, session_engine
+from .database import database_config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -47,8 +51,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "souklou_project.metrics.MetricsMiddleware",
+    "souklou_project.querybudget.QueryBudgetMiddleware",
+    "souklou_project.routers.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "souklou_project.staticfiles.AsyncWhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -59,11 +66,17 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "souklou_project.urls"
 
+# Compiled templates are kept for the life of the process in production;
+# in development they are read again on every render.
+template_loaders = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "souklou_project.metrics.InstrumentedDjangoTemplates",
         "DIRS": [BASE_DIR / 'templates'],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.debug",
@@ -71,6 +84,9 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
             ],
+            "loaders": template_loaders if DEBUG else [
+                ("django.template.loaders.cached.Loader", template_loaders),
+            ],
         },
     },
 ]
@@ -81,13 +97,75 @@ WSGI_APPLICATION = "souklou_project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DATABASE_URL selects the database (see souklou_project/database.py).
+# PostgreSQL connections persist for DATABASE_CONN_MAX_AGE seconds and are
+# pooled according to DATABASE_POOL ('none', 'pgbouncer' or 'psycopg').
+# Web processes (DATABASE_ROLE=web, set by wsgi.py/asgi.py) and workers
+# (management commands) have their own statement timeouts, in milliseconds.
+# SQLite runs in WAL mode with BEGIN IMMEDIATE transactions unless
+# DATABASE_SQLITE_TUNING is off (busy timeout in ms, cache size in KiB).
+DATABASE_ROLE = config('DATABASE_ROLE', default='worker')
+DATABASE_STATEMENT_TIMEOUTS = {
+    'web': config('DATABASE_STATEMENT_TIMEOUT_WEB', default=5000, cast=int),
+    'worker': config('DATABASE_STATEMENT_TIMEOUT_WORKER', default=0, cast=int),
+}
+
+DATABASE_URL = config('DATABASE_URL', default='sqlite:///db.sqlite3')
+
+# Read replicas: the reads of GET requests go to one of DATABASE_REPLICA_URLS
+# (comma-separated) unless the client wrote something in the last
+# REPLICA_PIN_SECONDS (see souklou_project/routers.py).
+DATABASE_REPLICA_URLS = [url for url in config('DATABASE_REPLICA_URLS', default='').split(',') if url]
+DATABASE_REPLICAS = [f'replica{index}' for index in range(1, len(DATABASE_REPLICA_URLS) + 1)]
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+
 DATABASES = {
+    alias: database_config(
+        url,
+        base_dir=BASE_DIR,
+        conn_max_age=config('DATABASE_CONN_MAX_AGE', default=60, cast=int),
+        health_checks=config('DATABASE_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        pool=config('DATABASE_POOL', default='none'),
+        pool_min_size=config('DATABASE_POOL_MIN_SIZE', default=2, cast=int),
+        pool_max_size=config('DATABASE_POOL_MAX_SIZE', default=10, cast=int),
+        statement_timeout=DATABASE_STATEMENT_TIMEOUTS.get(DATABASE_ROLE, 0),
+        sqlite={
+            'busy_timeout': config('DATABASE_SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+            'mmap_size': config('DATABASE_SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int),
+            'cache_size': config('DATABASE_SQLITE_CACHE_SIZE', default=20000, cast=int),
+        } if config('DATABASE_SQLITE_TUNING', default=True, cast=bool) else None,
+    )
+    for alias, url in zip(['default', *DATABASE_REPLICAS], [DATABASE_URL, *DATABASE_REPLICA_URLS])
+}
+for alias in DATABASE_REPLICAS:
+    # Tests read the replicas' rows from the test primary
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['souklou_project.routers.ReplicaRouter']
+
+
+# Cache and sessions
+# CACHE_URL selects the cache shared by the workers (see
+# souklou_project/caches.py): locmem:// for development, redis:// or
+# memcached:// in production. Tests always use local memory: set
+# DJANGO_TESTING=1 when running them other than with `manage.py test`.
+# SESSION_BACKEND is 'db', 'cached_db', 'cache' or 'signed_cookies'.
+
+TESTING = config('DJANGO_TESTING', default=sys.argv[1:2] == ['test'], cast=bool)
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        **parse_cache_url('locmem://' if TESTING else config('CACHE_URL', default='locmem://')),
+        "KEY_PREFIX": config('CACHE_KEY_PREFIX', default='souklou'),
     }
 }
 
+SESSION_ENGINE = session_engine(config('SESSION_BACKEND', default='cached_db'))
+
+# Anonymous visitors get the public pages (home, fiche list and fiche pages)
+# from the page cache, and 304 responses, for up to this many seconds
+PAGE_CACHE_SECONDS = config('PAGE_CACHE_SECONDS', default=60, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,3 +222,88 @@ AUTH_USER_MODEL = 'accounts.User'
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
+
+# Quiz grading
+# When enabled, take_quiz only queues submissions; run
+# `python manage.py grade_submissions` to grade them.
+GRADING_INTAKE = config('GRADING_INTAKE', default=False, cast=bool)
+
+# Fiche view counter
+# Views are buffered in the cache and written back every
+# VIEW_COUNT_FLUSH_INTERVAL seconds (0 leaves it to `manage.py flush_view_counts`).
+# The buffer needs a shared CACHE_URL (redis:// or memcached://): with
+# locmem:// or dummy:// every view is written directly to the database.
+VIEW_COUNT_BUFFER = config('VIEW_COUNT_BUFFER', default=True, cast=bool)
+VIEW_COUNT_FLUSH_INTERVAL = config('VIEW_COUNT_FLUSH_INTERVAL', default=30, cast=int)
+
+# Pagination
+# Lists are paginated with opaque cursors; ?per_page= may ask for up to
+# PAGINATION_MAX_PAGE_SIZE rows.
+PAGINATION_PAGE_SIZE = config('PAGINATION_PAGE_SIZE', default=25, cast=int)
+PAGINATION_MAX_PAGE_SIZE = config('PAGINATION_MAX_PAGE_SIZE', default=100, cast=int)
+
+# SQL budget
+# When enabled, every request's queries are recorded and checked against
+# the budget of its URL name ('namespace:*' covers a whole namespace);
+# statements repeated QUERY_BUDGET_DUPLICATE_THRESHOLD times are reported
+# as N+1 patterns. QUERY_BUDGET_ACTION is 'log' or 'raise' (for tests).
+QUERY_BUDGET_ENABLED = config('QUERY_BUDGET_ENABLED', default=False, cast=bool)
+QUERY_BUDGET_ACTION = config('QUERY_BUDGET_ACTION', default='log')
+QUERY_BUDGET_DUPLICATE_THRESHOLD = config('QUERY_BUDGET_DUPLICATE_THRESHOLD', default=3, cast=int)
+QUERY_BUDGET_DEFAULT = 12
+QUERY_BUDGETS = {
+    'home': 6,
+    'dashboard': 8,
+    'accounts:*': 8,
+    'fiches:list': 6,
+    'fiches:detail': 8,
+    'fiches:*': 10,
+    'quizzes:take_quiz': 25,
+    'quizzes:*': 20,
+    'results:attempt_detail': 6,
+    'results:*': 8,
+    'admin:*': 15,
+}
+
+# Metrics
+# /metrics serves Prometheus metrics, restricted to METRICS_ALLOWED_IPS and
+# to requests bearing METRICS_TOKEN when they are set. Unless DEBUG is on, it
+# answers 404 until at least one of them is set. Under several worker
+# processes, set METRICS_DIR to a directory shared by the workers (ideally
+# a tmpfs) and emptied when the server starts.
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=1.0, cast=float)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = [ip for ip in config('METRICS_ALLOWED_IPS', default='').split(',') if ip]
+
+# Logging
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'fiches': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
+        },
+        'quizzes': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
+        },
+        'results': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
+        },
+        'souklou_project': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
+        },
+    },
+}
@@ -0,0 +1,34 @@
+"""
+SQLite backend tuned for concurrent writers.
+
+Every new connection applies the ``pragmas`` of the database ``OPTIONS``
+(WAL journaling, ``synchronous=NORMAL``, memory-mapped I/O, page cache...),
+and transactions open with ``BEGIN <transaction_mode>``: with ``IMMEDIATE``
+a writer takes the write lock up front, waiting for it up to the busy
+timeout, instead of failing with "database is locked" when its read
+transaction cannot be upgraded.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # Handled here, not by sqlite3.connect()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode:
+            self.cursor().execute(f'BEGIN {mode}')
+        else:
+            super()._start_transaction_under_autocommit()
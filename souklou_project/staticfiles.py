@@ -0,0 +1,39 @@
+"""
+Static file serving that does not break the async middleware chain.
+
+``WhiteNoiseMiddleware`` only declares itself sync-capable: under ASGI,
+Django would run it in a thread and every view below it, async ones
+included, through ``async_to_sync``. Looking a static file up is a
+dictionary access and serving it only builds a ``FileResponse``, which
+the ASGI handler reads in a thread like any other, so the middleware can
+run in either mode unchanged.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        static_file = self._static_file(request)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+    def _static_file(self, request):
+        if self.autorefresh:
+            return self.find_file(request.path_info)
+        return self.files.get(request.path_info)
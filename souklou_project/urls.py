@@ -12,6 +12,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.home, name='home'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('metrics', views.metrics, name='metrics'),
     path('accounts/', include('accounts.urls')),
     path('fiches/', include('fiches.urls')),
     path('quiz/', include('quizzes.urls')),
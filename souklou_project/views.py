@@ -1,22 +1,38 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render, redirect
+from django.utils.crypto import constant_time_compare
 from django.contrib.auth.decorators import login_required
 from django.db.models import Count
-from fiches.models import Fiche
-from results.models import QuizAttempt
+from django.db.models.functions import Coalesce
+from fiches.cards import aattach_cards, attach_cards
+from fiches.freshness import published_fiches_state
+from fiches.models import CONTENT_FIELDS, Fiche
+from results.models import QuizAttempt, StudentStats
+from results.stats import teacher_analytics
+from . import metrics as metrics_registry
+from .asyncutils import aget_user, arender
+from .pagecache import public_page
+from .pagination import paginate
 
 
-def home(request):
+@public_page(published_fiches_state)
+async def home(request):
     """Home page view."""
-    if request.user.is_authenticated:
+    if (await aget_user(request)).is_authenticated:
         return redirect('dashboard')
 
     # Get some featured fiches
-    featured_fiches = Fiche.objects.filter(is_published=True).order_by('-views_count')[:6]
+    featured_fiches = [
+        fiche async for fiche in
+        Fiche.objects.filter(is_published=True).defer(*CONTENT_FIELDS).order_by('-views_count')[:6]
+    ]
+    await aattach_cards(featured_fiches, 'card')
 
     context = {
         'featured_fiches': featured_fiches,
     }
-    return render(request, 'home.html', context)
+    return await arender(request, 'home.html', context)
 
 
 @login_required
@@ -26,42 +42,68 @@ def dashboard(request):
 
     if user.is_teacher:
         # Teacher dashboard
-        my_fiches = Fiche.objects.filter(author=user).annotate(
-            question_count=Count('questions'),
-            attempt_count=Count('attempts')
-        ).order_by('-created_at')[:10]
+        # Attempts come from the maintained statistics: counting questions
+        # and attempts over the same join would multiply them.
+        my_fiches = paginate(
+            Fiche.objects.filter(author=user).defer(*CONTENT_FIELDS).annotate(
+                question_count=Count('questions'),
+                attempt_count=Coalesce('stats__attempt_count', 0),
+            ),
+            request,
+            ('-created_at', '-pk'),
+            page_size=10,
+        )
+        attach_cards(my_fiches, 'row')
 
         # Recent quiz attempts on teacher's fiches
-        recent_attempts = QuizAttempt.objects.filter(
+        recent_attempts = list(QuizAttempt.objects.filter(
             fiche__author=user
-        ).select_related('student', 'fiche').order_by('-completed_at')[:10]
+        ).select_related('student', 'fiche').order_by('-completed_at')[:10])
 
         context = {
             'my_fiches': my_fiches,
+            'page': my_fiches,
             'recent_attempts': recent_attempts,
-            'total_fiches': my_fiches.count(),
+            **teacher_analytics(user),
         }
         return render(request, 'dashboard_teacher.html', context)
     else:
         # Student dashboard
-        recent_fiches = Fiche.objects.filter(is_published=True).order_by('-created_at')[:10]
+        recent_fiches = attach_cards(
+            list(Fiche.objects.filter(is_published=True).defer(*CONTENT_FIELDS).order_by('-created_at')[:10]), 'compact'
+        )
 
         # Student's recent quiz attempts
         my_attempts = QuizAttempt.objects.filter(
             student=user
         ).select_related('fiche').order_by('-completed_at')[:10]
 
-        # Statistics
-        total_attempts = my_attempts.count()
-        if total_attempts > 0:
-            average_score = sum(a.score for a in my_attempts) / total_attempts
-        else:
-            average_score = 0
+        # Statistics, maintained incrementally on each new attempt
+        student_stats = StudentStats.objects.filter(student=user).first() or StudentStats()
 
         context = {
             'recent_fiches': recent_fiches,
             'my_attempts': my_attempts,
-            'total_attempts': total_attempts,
-            'average_score': average_score,
+            'total_attempts': student_stats.attempt_count,
+            'average_score': student_stats.average_score,
+            'last_activity': student_stats.last_activity_at,
         }
         return render(request, 'dashboard_student.html', context)
+
+
+def metrics(request):
+    """Prometheus metrics endpoint."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    # Unrestricted metrics are only served in development
+    if not (settings.DEBUG or settings.METRICS_TOKEN or settings.METRICS_ALLOWED_IPS):
+        raise Http404
+    if settings.METRICS_ALLOWED_IPS and request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponse(status=403)
+    if settings.METRICS_TOKEN:
+        authorization = request.META.get('HTTP_AUTHORIZATION', '')
+        if not constant_time_compare(authorization, f'Bearer {settings.METRICS_TOKEN}'):
+            response = HttpResponse(status=401)
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+    return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
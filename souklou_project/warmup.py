@@ -0,0 +1,115 @@
+"""
+Process warm-up before serving traffic.
+
+A fresh process compiles each template, builds the URL resolvers and
+fills its caches on its first requests, which then pay for it. ``warm_up``
+does that work up front: it compiles every template of the template
+directories and of the installed apps (kept by the cached template loader),
+populates the resolvers of every URL namespace, loads the category facets
+and the answer keys of the ``WARMUP_HOT_FICHES`` most viewed fiches into the
+caches, and opens the database connections.
+
+Under gunicorn with ``preload_app`` it runs once in the master before the
+workers are forked, so they inherit the result; the master's database and
+cache connections are closed before forking and each worker opens its own
+database connections with ``open_connections``.
+"""
+
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.template.exceptions import TemplateDoesNotExist, TemplateSyntaxError
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+WARMUP_HOT_FICHES = getattr(settings, 'WARMUP_HOT_FICHES', 100)
+
+
+def _template_dirs(engine):
+    """Return the directories the loaders of ``engine`` search, app directories included."""
+    dirs = list(engine.template_dirs)
+    # Django engines with explicit loaders (app_directories without APP_DIRS)
+    for loader in getattr(getattr(engine, 'engine', None), 'template_loaders', ()):
+        if hasattr(loader, 'get_dirs'):
+            dirs.extend(loader.get_dirs())
+    return list(dict.fromkeys(str(directory) for directory in dirs))
+
+
+def compile_templates():
+    """Compile every template of every engine and return how many were compiled."""
+    compiled = 0
+    for engine in engines.all():
+        names = set()
+        for directory in _template_dirs(engine):
+            for root, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    names.add(os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/'))
+        for name in sorted(names):
+            try:
+                engine.get_template(name)
+            except (TemplateDoesNotExist, TemplateSyntaxError, UnicodeDecodeError) as exc:
+                logger.debug('Skipping template %s: %s', name, exc)
+            else:
+                compiled += 1
+    return compiled
+
+
+def build_url_resolvers():
+    """Populate the reverse lookups of the root URLconf and of every namespace, and return the URL names."""
+    names = 0
+    resolvers = [get_resolver()]
+    while resolvers:
+        resolver = resolvers.pop()
+        names += sum(isinstance(key, str) for key in resolver.reverse_dict)
+        resolvers.extend(sub for _, sub in resolver.namespace_dict.values())
+    return names
+
+
+def open_connections():
+    """Connect to every configured database."""
+    for connection in connections.all():
+        connection.ensure_connection()
+    return len(connections.all())
+
+
+def preload_caches(hot_fiches=None):
+    """Load the category facets and the answer keys of the most viewed fiches, and return how many keys were loaded."""
+    from fiches.facets import get_category_facets
+    from fiches.models import Fiche
+    from quizzes.answer_key import get_answer_key
+
+    get_category_facets()
+    fiches = (
+        Fiche.objects.filter(is_published=True, questions__isnull=False)
+        .distinct()
+        .order_by('-views_count')
+        .only('pk', 'quiz_version')[:WARMUP_HOT_FICHES if hot_fiches is None else hot_fiches]
+    )
+    loaded = 0
+    for fiche in fiches:
+        get_answer_key(fiche)
+        loaded += 1
+    return loaded
+
+
+def warm_up(database=True):
+    """Run every warm-up step and return what each did and how long it took."""
+    steps = [('templates', compile_templates), ('url_names', build_url_resolvers)]
+    if database:
+        steps += [('connections', open_connections), ('answer_keys', preload_caches)]
+    report = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            report[name] = step()
+        except Exception:
+            # A cold start is slower, not broken
+            logger.exception('Warm-up step %s failed', name)
+            report[name] = None
+        report[f'{name}_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return report
@@ -12,5 +12,6 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "souklou_project.settings")
+os.environ.setdefault("DATABASE_ROLE", "web")
 
 application = get_wsgi_application()